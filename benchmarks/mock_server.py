@@ -0,0 +1,245 @@
+"""
+本地OpenAI兼容模拟服务
+用于性能测试，可配置首token延迟、输出速率和错误注入
+
+用法:
+    python -m benchmarks.mock_server --port 9100 --ttft-ms 300 --tokens-per-second 200
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+from typing import Any, Dict, List
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+try:
+    from prompt.compliance_checker_prompt import CHECKPOINTS
+    from prompt.readability_checker_prompt import DIMENSIONS
+except ImportError:
+    from ..prompt.compliance_checker_prompt import CHECKPOINTS
+    from ..prompt.readability_checker_prompt import DIMENSIONS
+
+# 默认模拟参数，可通过命令行或 POST /mock/config 修改
+DEFAULT_SETTINGS: Dict[str, Any] = {
+    "ttft_ms": 300.0,            # 首token平均延迟
+    "ttft_jitter": 0.3,          # 首token延迟的对数正态抖动
+    "tokens_per_second": 200.0,  # 输出速率
+    "completion_tokens": 400,    # 文本回复的token数
+    "chars_per_token": 2,        # 每个token对应的字符数
+    "error_rate": 0.0,           # 返回500的概率
+    "rate_limit_rate": 0.0,      # 返回429的概率
+    "slow_rate": 0.0,            # 慢请求概率（模拟长尾）
+    "slow_factor": 10.0,         # 慢请求首token延迟倍数
+}
+
+_FILLER = "我们会按照法律法规的要求收集和使用您的个人信息并采取安全措施保护您的数据"
+
+
+def _estimate_tokens(messages: List[Dict[str, Any]], chars_per_token: int) -> int:
+    """粗略估算输入token数"""
+    return sum(len(str(item.get("content", ""))) for item in messages) // max(chars_per_token, 1) + 1
+
+
+def _clause_body(system_message: str, user_message: str) -> str:
+    """按条款编号构造条款级检测结果"""
+    indexes = [int(value) for value in re.findall(r"【条款(\d+)】", user_message)]
+    if '"checkpoints"' in system_message.split("【条款级检测】")[-1]:
+        clauses = [{"index": index, "checkpoints": [{"id": random.choice(CHECKPOINTS)["id"], "quote": _FILLER[:20]}]}
+                   for index in indexes]
+    else:
+        clauses = [{"index": index, "issues": [{"dimension": random.choice(DIMENSIONS)["id"], "violation_type": "模糊用词",
+                                                "description": _FILLER[:24], "advice": _FILLER[:12],
+                                                "suggestion": _FILLER[:12]}]}
+                   for index in indexes]
+    return json.dumps({"clauses": clauses}, ensure_ascii=False)
+
+
+def _structured_body(system_message: str) -> str:
+    """按系统提示词构造结构化检测报告"""
+    if "checkpoints" in system_message:
+        # 地区规则包的提示词只列出该地区的检测要点
+        region_ids = [int(item) for item in re.findall(r"^### (\d+)\. ", system_message, re.M)]
+        catalog = ([{"id": item_id, "legal_basis": []} for item_id in region_ids]
+                   if "合规整体评估意见" in system_message else CHECKPOINTS)
+        return json.dumps({
+            "checkpoints": [
+                {"id": entry["id"], "result": random.choice(["是", "否"]),
+                 "quotes": [_FILLER[:20]], "legal_basis": entry["legal_basis"], "suggestion": _FILLER[:16]}
+                for entry in catalog
+            ],
+            "summary": _FILLER
+        }, ensure_ascii=False)
+    return json.dumps({
+        "dimensions": [
+            {"id": entry["id"], "score": random.randint(50, 95),
+             "issues": [{"violation_type": entry["name"], "description": _FILLER[:24],
+                         "advice": _FILLER[:12], "suggestion": _FILLER[:12], "legal_basis": entry["legal_basis"]}]}
+            for entry in DIMENSIONS
+        ],
+        "overall_score": random.randint(50, 95),
+        "summary": _FILLER
+    }, ensure_ascii=False)
+
+
+def _tool_call_response(body: Dict[str, Any], user_message: str) -> Dict[str, Any]:
+    """对提供的每个工具各发起一次调用（模拟同一轮中的并行工具调用）"""
+    calls = []
+    for index, tool in enumerate(body["tools"]):
+        function = tool.get("function", {})
+        properties = function.get("parameters", {}).get("properties", {})
+        arguments = {
+            name: ["G17"] if properties.get(name, {}).get("type") == "array" else user_message[:200]
+            for name in function.get("parameters", {}).get("required", [])
+        }
+        calls.append({"id": f"call_{index}", "type": "function",
+                      "function": {"name": function.get("name"), "arguments": json.dumps(arguments, ensure_ascii=False)}})
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "mock"),
+        "choices": [{"index": 0, "finish_reason": "tool_calls",
+                     "message": {"role": "assistant", "content": None, "tool_calls": calls}}],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 10, "total_tokens": 20}
+    }
+
+
+def _text_body(tokens: int, chars_per_token: int) -> str:
+    """构造指定长度的文本回复"""
+    length = tokens * chars_per_token
+    repeats = length // len(_FILLER) + 1
+    return (_FILLER * repeats)[:length]
+
+
+def create_app(settings: Dict[str, Any] = None) -> FastAPI:
+    """
+    创建模拟服务应用
+    Args:
+        settings: 模拟参数，缺省项使用DEFAULT_SETTINGS
+    Returns:
+        FastAPI应用
+    """
+    app = FastAPI(title="OpenAI兼容模拟服务")
+    app.state.settings = dict(DEFAULT_SETTINGS, **(settings or {}))
+    app.state.stats = {"requests": 0, "errors": 0, "completion_tokens": 0}
+
+    @app.get("/mock/config")
+    async def get_settings():
+        """获取当前模拟参数和统计"""
+        return {"settings": app.state.settings, "stats": app.state.stats}
+
+    @app.post("/mock/config")
+    async def update_settings(request: Request):
+        """修改模拟参数"""
+        app.state.settings.update(await request.json())
+        return {"settings": app.state.settings}
+
+    @app.post("/v1/chat/completions")
+    @app.post("/chat/completions")
+    async def chat_completions(request: Request):
+        """模拟 /chat/completions 接口"""
+        cfg = app.state.settings
+        body = await request.json()
+        app.state.stats["requests"] += 1
+
+        roll = random.random()
+        if roll < cfg["error_rate"]:
+            app.state.stats["errors"] += 1
+            return JSONResponse(status_code=500, content={"error": {"message": "injected error"}})
+        if roll < cfg["error_rate"] + cfg["rate_limit_rate"]:
+            app.state.stats["errors"] += 1
+            return JSONResponse(status_code=429, content={"error": {"message": "injected rate limit"}},
+                                headers={"Retry-After": "1"})
+
+        messages = body.get("messages", [])
+        system_message = next((m.get("content", "") for m in messages if m.get("role") == "system"), "")
+        chars_per_token = int(cfg["chars_per_token"])
+        user_message = next((m.get("content", "") for m in messages if m.get("role") == "user"), "")
+        if body.get("tools") and not body.get("stream") and not any(m.get("role") == "tool" for m in messages):
+            return _tool_call_response(body, user_message)
+        if (body.get("response_format") or {}).get("type") == "json_object":
+            if "【条款级检测】" in system_message:
+                text = _clause_body(system_message, user_message)
+            else:
+                text = _structured_body(system_message)
+        else:
+            tokens = min(int(cfg["completion_tokens"]), int(body.get("max_tokens") or cfg["completion_tokens"]))
+            text = _text_body(tokens, chars_per_token)
+        prompt_tokens = _estimate_tokens(messages, chars_per_token)
+        completion_tokens = len(text) // chars_per_token + 1
+        app.state.stats["completion_tokens"] += completion_tokens
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                 "total_tokens": prompt_tokens + completion_tokens}
+
+        ttft = cfg["ttft_ms"] / 1000 * random.lognormvariate(0, cfg["ttft_jitter"])
+        if random.random() < cfg["slow_rate"]:
+            ttft *= cfg["slow_factor"]
+        token_interval = 1 / max(cfg["tokens_per_second"], 1e-6)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        model = body.get("model", "mock")
+
+        if not body.get("stream"):
+            await asyncio.sleep(ttft + completion_tokens * token_interval)
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": text}}],
+                "usage": usage
+            }
+
+        include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+
+        def chunk(delta: Dict[str, Any], finish_reason=None, with_usage=False) -> str:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}] if not with_usage else [],
+            }
+            if with_usage:
+                payload["usage"] = usage
+            return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+        async def event_stream():
+            await asyncio.sleep(ttft)
+            yield chunk({"role": "assistant", "content": ""})
+            for start in range(0, len(text), chars_per_token):
+                yield chunk({"content": text[start:start + chars_per_token]})
+                await asyncio.sleep(token_interval)
+            yield chunk({}, finish_reason="stop")
+            if include_usage:
+                yield chunk({}, with_usage=True)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地OpenAI兼容模拟服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--seed", type=int, default=None, help="随机种子，便于复现")
+    for key, value in DEFAULT_SETTINGS.items():
+        parser.add_argument(f"--{key.replace('_', '-')}", type=type(value), default=value)
+    args = parser.parse_args()
+    if args.seed is not None:
+        random.seed(args.seed)
+    settings = {key: getattr(args, key) for key in DEFAULT_SETTINGS}
+    uvicorn.run(create_app(settings), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,364 @@
+"""
+性能测试工具
+启动本地模拟上游服务和API服务，运行负载场景并与基线对比
+
+用法:
+    python -m benchmarks.run_benchmark                      # 运行全部场景
+    python -m benchmarks.run_benchmark --quick              # 缩小请求量快速运行
+    python -m benchmarks.run_benchmark --scenario chat_concurrent
+    python -m benchmarks.run_benchmark --save-baseline      # 将本次结果写入基线文件
+    python -m benchmarks.run_benchmark --target http://localhost:8000   # 压测已启动的服务
+    python -m benchmarks.run_benchmark --replay data/cassettes/upstream.jsonl.gz   # 以录制的生产流量作为上游
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+MEMORY_FILE_NAME = "benchmark_memory.json"
+
+_POLICY_PARAGRAPH = (
+    "我们会收集您的手机号码、设备标识符和位置信息，用于账号注册、安全风控和个性化推荐。"
+    "未经您的同意，我们不会向第三方共享您的个人信息，法律法规另有规定的除外。"
+)
+
+# 负载场景定义
+SCENARIOS: List[Dict[str, Any]] = [
+    {
+        "name": "chat_concurrent",
+        "description": "并发短消息 /chat",
+        "path": "/api/v1/chat",
+        "payload": {"agent_type": "readability_checker", "message": _POLICY_PARAGRAPH},
+        "requests": 200,
+        "concurrency": 32,
+    },
+    {
+        "name": "large_policy",
+        "description": "超长隐私政策结构化合规检测（流式）",
+        "path": "/api/v1/chat/structured",
+        "payload": {"agent_type": "compliance_checker", "message": _POLICY_PARAGRAPH * 600, "stream": True},
+        "requests": 40,
+        "concurrency": 8,
+        "stream": "structured",
+    },
+    {
+        "name": "batch",
+        "description": "批量突发合规检测（全部请求同时提交）",
+        "path": "/api/v1/chat",
+        "payload": {"agent_type": "compliance_checker", "message": _POLICY_PARAGRAPH * 20},
+        "requests": 100,
+        "concurrency": 100,
+    },
+    {
+        "name": "pipeline",
+        "description": "生成→检测→修订流水线（流式）",
+        "path": "/api/v1/pipeline",
+        "payload": {"message": "为一个社交应用生成隐私政策", "revise": True},
+        "requests": 20,
+        "concurrency": 8,
+        "stream": "pipeline",
+    },
+    {
+        "name": "memory_heavy",
+        "description": "携带大型内存文件的 /chat",
+        "path": "/api/v1/chat",
+        "payload": {"agent_type": "privacy_policy_generator", "message": "为一个购物应用生成隐私政策",
+                    "context": {"memory_files": [MEMORY_FILE_NAME]}},
+        "requests": 100,
+        "concurrency": 16,
+        "memory_items": 5000,
+    },
+]
+
+
+# 流式接口的事件协议（NDJSON，每行一个事件）：
+# content 为首个携带结果内容的事件（首字节时间以此计时，不计"已开始"等进度事件），
+# done 为成功结束的终止事件，failed 为错误事件；流中出现错误或缺少成功终止事件时请求计为失败
+STREAM_PROTOCOLS: Dict[str, Dict[str, Callable[[Dict[str, Any]], bool]]] = {
+    "structured": {
+        "content": lambda event: event.get("type") in ("item", "report"),
+        "done": lambda event: event.get("type") == "report",
+        "failed": lambda event: event.get("type") == "error",
+    },
+    "pipeline": {
+        "content": lambda event: event.get("stage") == "generate" and event.get("status") == "completed",
+        "done": lambda event: event.get("stage") == "done" and event.get("status") == "completed",
+        "failed": lambda event: event.get("status") == "failed",
+    },
+}
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """
+    计算百分位数（线性插值）
+    Args:
+        values: 样本
+        pct: 百分位，0-100
+    Returns:
+        百分位数值，无样本时返回None
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low, high = math.floor(rank), math.ceil(rank)
+    if low == high:
+        return ordered[low]
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def _ms(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value * 1000, 1)
+
+
+async def _one_request(client: httpx.AsyncClient, scenario: Dict[str, Any]) -> Dict[str, Any]:
+    """发送单个请求，记录延迟和首字节时间"""
+    start = time.perf_counter()
+    ttft = None
+    try:
+        if scenario.get("stream"):
+            protocol = STREAM_PROTOCOLS[scenario["stream"]]
+            async with client.stream("POST", scenario["path"], json=scenario["payload"]) as response:
+                done = failed = False
+                async for line in response.aiter_lines():
+                    if not line.strip():
+                        continue
+                    try:
+                        event = json.loads(line)
+                    except json.JSONDecodeError:
+                        failed = True
+                        continue
+                    if ttft is None and protocol["content"](event):
+                        ttft = time.perf_counter() - start
+                    failed = failed or protocol["failed"](event)
+                    done = protocol["done"](event)
+                ok = response.status_code == 200 and done and not failed
+        else:
+            response = await client.post(scenario["path"], json=scenario["payload"])
+            ok = response.status_code == 200 and response.json().get("success", True)
+    except httpx.HTTPError:
+        ok = False
+    return {"latency": time.perf_counter() - start, "ttft": ttft, "ok": ok}
+
+
+async def run_scenario(base_url: str, scenario: Dict[str, Any], scale: float = 1.0) -> Dict[str, Any]:
+    """
+    运行单个负载场景
+    Args:
+        base_url: API服务地址
+        scenario: 场景定义
+        scale: 请求量缩放系数
+    Returns:
+        场景统计结果
+    """
+    total = max(1, int(scenario["requests"] * scale))
+    concurrency = max(1, min(scenario["concurrency"], total))
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=600, limits=limits) as client:
+        async def worker():
+            async with semaphore:
+                return await _one_request(client, scenario)
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(worker() for _ in range(total)))
+        elapsed = time.perf_counter() - start
+
+    latencies = [item["latency"] for item in results if item["ok"]]
+    ttfts = [item["ttft"] for item in results if item["ok"] and item["ttft"] is not None]
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "errors": sum(1 for item in results if not item["ok"]),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": _ms(percentile(latencies, 50)),
+        "p95_ms": _ms(percentile(latencies, 95)),
+        "p99_ms": _ms(percentile(latencies, 99)),
+        "ttft_p50_ms": _ms(percentile(ttfts, 50)),
+        "ttft_p95_ms": _ms(percentile(ttfts, 95)),
+    }
+
+
+def incomparable_scenarios(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]]) -> List[str]:
+    """
+    请求量或并发与基线不一致的场景（如 --quick 结果对比完整运行的基线），
+    吞吐量和尾延迟随请求量变化，这类场景不能与基线直接对比
+    """
+    return [
+        f"{name}: requests/concurrency {current['requests']}/{current['concurrency']}，"
+        f"基线 {baseline[name].get('requests')}/{baseline[name].get('concurrency')}"
+        for name, current in results.items()
+        if name in baseline and (current["requests"], current["concurrency"])
+        != (baseline[name].get("requests"), baseline[name].get("concurrency"))
+    ]
+
+
+def compare_with_baseline(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]],
+                          tolerance: float) -> List[str]:
+    """
+    与基线对比，返回回归项说明
+    Args:
+        results: 本次结果
+        baseline: 基线结果
+        tolerance: 允许的相对退化比例
+    Returns:
+        回归项列表，为空表示无回归；请求量或并发与基线不一致的场景不参与对比
+    """
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if not base or (current["requests"], current["concurrency"]) != (base.get("requests"), base.get("concurrency")):
+            continue
+        for key in ("p50_ms", "p95_ms", "p99_ms", "ttft_p50_ms"):
+            if base.get(key) and current.get(key) and current[key] > base[key] * (1 + tolerance):
+                regressions.append(f"{name}.{key}: {current[key]} > 基线 {base[key]}")
+        if base.get("throughput_rps") and current["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{name}.throughput_rps: {current['throughput_rps']} < 基线 {base['throughput_rps']}")
+        if current["errors"] > base.get("errors", 0):
+            regressions.append(f"{name}.errors: {current['errors']} > 基线 {base.get('errors', 0)}")
+    return regressions
+
+
+def _prepare_memory_file(items: int) -> str:
+    """生成内存压力场景使用的大型内存文件"""
+    memory_dir = os.path.join(ROOT_DIR, "memory")
+    os.makedirs(memory_dir, exist_ok=True)
+    path = os.path.join(memory_dir, MEMORY_FILE_NAME)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump([{"type": "history", "content": f"{_POLICY_PARAGRAPH} #{index}"} for index in range(items)],
+                  f, ensure_ascii=False)
+    return path
+
+
+def _start_process(args: List[str], env: Dict[str, str]) -> subprocess.Popen:
+    return subprocess.Popen(args, cwd=ROOT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def _wait_ready(url: str, timeout: float = 30.0):
+    """等待服务就绪"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"服务未在 {timeout} 秒内就绪: {url}")
+
+
+def _print_table(results: Dict[str, Dict[str, Any]]):
+    columns = ["requests", "errors", "throughput_rps", "p50_ms", "p95_ms", "p99_ms", "ttft_p50_ms", "ttft_p95_ms"]
+    print(f"{'scenario':<18}" + "".join(f"{column:>15}" for column in columns))
+    for name, stats in results.items():
+        print(f"{name:<18}" + "".join(f"{str(stats.get(column)):>15}" for column in columns))
+
+
+async def main_async(args) -> int:
+    selected = [item for item in SCENARIOS if not args.scenario or item["name"] in args.scenario]
+    processes: List[subprocess.Popen] = []
+    memory_path = None
+    base_url = args.target
+    try:
+        if not base_url:
+            env = dict(os.environ)
+            env["QWEN_BASE_URL"] = f"http://127.0.0.1:{args.mock_port}/v1"
+            env["DASHSCOPE_API_KEY"] = "benchmark"
+            if args.replay:
+                # 回放录制的上游流量，不启动模拟上游
+                env["UPSTREAM_CASSETTE_MODE"] = "replay"
+                env["UPSTREAM_CASSETTE"] = os.path.abspath(args.replay)
+                env["UPSTREAM_CASSETTE_SPEED"] = str(args.replay_speed)
+            else:
+                mock_args = [sys.executable, "-m", "benchmarks.mock_server", "--port", str(args.mock_port),
+                             "--ttft-ms", str(args.ttft_ms), "--tokens-per-second", str(args.tokens_per_second),
+                             "--error-rate", str(args.error_rate), "--seed", str(args.seed)]
+                processes.append(_start_process(mock_args, env))
+                _wait_ready(f"http://127.0.0.1:{args.mock_port}/mock/config")
+            processes.append(_start_process(
+                [sys.executable, "-m", "uvicorn", "src.app:app", "--port", str(args.app_port), "--log-level", "warning"],
+                env
+            ))
+            base_url = f"http://127.0.0.1:{args.app_port}"
+            _wait_ready(f"{base_url}/api/v1/health")
+
+        scale = 0.1 if args.quick else 1.0
+        results = {}
+        for scenario in selected:
+            if scenario.get("memory_items"):
+                memory_path = _prepare_memory_file(scenario["memory_items"])
+            print(f"▶ {scenario['name']}: {scenario['description']}")
+            results[scenario["name"]] = await run_scenario(base_url, scenario, scale)
+
+        _print_table(results)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+
+        if args.save_baseline:
+            with open(args.baseline, "w", encoding="utf-8") as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+            print(f"基线已写入: {args.baseline}")
+            return 0
+
+        if os.path.exists(args.baseline):
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                baseline = json.load(f)
+            incomparable = incomparable_scenarios(results, baseline)
+            if incomparable:
+                print("⚠️ 以下场景的请求量与基线不一致，拒绝对比（快速运行请使用同为 --quick 生成的基线）:")
+                for item in incomparable:
+                    print(f"  - {item}")
+            regressions = compare_with_baseline(results, baseline, args.tolerance)
+            if regressions:
+                print("❌ 发现性能回归:")
+                for item in regressions:
+                    print(f"  - {item}")
+                return 1
+            if incomparable:
+                return 2
+            print("✅ 未发现性能回归")
+        return 0
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait(timeout=10)
+        if memory_path and os.path.exists(memory_path):
+            os.remove(memory_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="隐私政策智能生成系统性能测试")
+    parser.add_argument("--scenario", action="append", help="只运行指定场景，可重复")
+    parser.add_argument("--quick", action="store_true", help="请求量缩小为1/10")
+    parser.add_argument("--target", help="压测已启动的API服务地址，不启动模拟上游")
+    parser.add_argument("--mock-port", type=int, default=9100)
+    parser.add_argument("--app-port", type=int, default=8100)
+    parser.add_argument("--ttft-ms", type=float, default=300.0)
+    parser.add_argument("--tokens-per-second", type=float, default=1000.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--replay", help="以录制的上游流量磁带代替模拟上游（cassette 回放模式）")
+    parser.add_argument("--replay-speed", type=float, default=1.0, help="磁带回放速度倍数")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="与基线对比允许的退化比例")
+    parser.add_argument("--output", help="结果输出的JSON文件")
+    parser.add_argument("--save-baseline", action="store_true", help="将本次结果写入基线文件")
+    parser.add_argument("--baseline", default=BASELINE_FILE,
+                        help="基线文件，回放同一磁带对比新旧版本时可指定旧版本的结果文件")
+    sys.exit(asyncio.run(main_async(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
@@ -8,12 +8,14 @@ from .compliance_checker_prompt import SYSTEM_PROMPT as COMPLIANCE_CHECKER_PROMP
 # 导出各个Agent的Prompt和描述
 from .privacy_policy_generator_prompt import DESCRIPTION as PRIVACY_POLICY_GENERATOR_DESCRIPTION
 from .privacy_policy_generator_prompt import SYSTEM_PROMPT as PRIVACY_POLICY_GENERATOR_PROMPT
+from .privacy_policy_generator_prompt import REVISION_PROMPT as PRIVACY_POLICY_REVISION_PROMPT
 from .readability_checker_prompt import DESCRIPTION as READABILITY_CHECKER_DESCRIPTION
 from .readability_checker_prompt import SYSTEM_PROMPT as READABILITY_CHECKER_PROMPT
 
 __all__ = [
     "PRIVACY_POLICY_GENERATOR_DESCRIPTION",
     "PRIVACY_POLICY_GENERATOR_PROMPT",
+    "PRIVACY_POLICY_REVISION_PROMPT",
     "COMPLIANCE_CHECKER_DESCRIPTION",
     "COMPLIANCE_CHECKER_PROMPT",
     "READABILITY_CHECKER_DESCRIPTION",
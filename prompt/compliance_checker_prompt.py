@@ -32,7 +32,7 @@ SYSTEM_PROMPT = """你是一个专业的隐私政策合规性检测专家，负
 * ✅ 是否列出了隐私政策的发布日期、生效日期和更新日期？
 * 🔍 查找隐私政策中是否有“发布日期”、“生效日期”、“更新日期”字段。
 * 🧾 输出：“是/否”，并附引用。
-* ⚖️ 法律依据：`T5`、`T17`、`G7`、`Z1-20`
+* ⚖️ 法律依据：`T5`、`T5.5`、`G7`、`Z1-20`
 
 ---
 
@@ -280,4 +280,110 @@ SYSTEM_PROMPT = """你是一个专业的隐私政策合规性检测专家，负
     2、基于评估表，给出评估意见时，需同时给出对应的法律条文
     3、针对每个问题的具体改进建议
 请保持专业、客观的分析态度，提供实用且具体的改进方案。
-"""
\ No newline at end of file
+"""
+
+# 评估框架检测要点（与SYSTEM_PROMPT中的编号一一对应）
+CHECKPOINTS = [
+    {"id": 1, "section": "APP运营者及APP的基本信息", "title": "基本情况", "legal_basis": ["G17", "T5", "Z1-9", "S6.5"]},
+    {"id": 2, "section": "APP运营者及APP的基本信息", "title": "隐私政策时效", "legal_basis": ["T5", "T5.5", "G7", "Z1-20"]},
+    {"id": 3, "section": "第一方收集、使用个人信息", "title": "第一方处理规则", "legal_basis": ["G7/17", "T5", "Z1-5/6", "S2.1", "N6.3", "W-A.5"]},
+    {"id": 4, "section": "第一方收集、使用个人信息", "title": "一般个人信息类型", "legal_basis": ["G7/17-2", "Z1-5/7", "T5", "W-A.3", "S2.1"]},
+    {"id": 5, "section": "第一方收集、使用个人信息", "title": "敏感个人信息类型", "legal_basis": ["G7/17-2", "Z1-5/7", "T5", "W-A.3", "S2.1"]},
+    {"id": 6, "section": "第一方收集、使用个人信息", "title": "用户可操作方式", "legal_basis": ["G14", "T5", "Z23", "S3.4"]},
+    {"id": 7, "section": "第三方收集、使用个人信息", "title": "第三方处理规则", "legal_basis": ["G21", "T5", "Z5", "S2.1/5.3"]},
+    {"id": 8, "section": "第三方收集、使用个人信息", "title": "一般信息类型（第三方）", "legal_basis": ["G23", "Z1-5/7", "T5", "W-A.3", "S2.1"]},
+    {"id": 9, "section": "第三方收集、使用个人信息", "title": "敏感信息类型（第三方）", "legal_basis": ["G23", "Z1-5/7", "T5", "W-A.3", "S2.1"]},
+    {"id": 10, "section": "第三方收集、使用个人信息", "title": "第三方授权和约束", "legal_basis": ["G21", "T9", "Z1-7", "S5.3"]},
+    {"id": 11, "section": "敏感信息处理", "title": "收集规则", "legal_basis": ["G28", "N6.7-c", "Z1-5", "T6.3/5.4", "W6.3", "M7"]},
+    {"id": 12, "section": "敏感信息处理", "title": "存储说明", "legal_basis": ["G28", "N6.7-c", "Z1-5", "T6.3/5.4", "W6.3", "M7"]},
+    {"id": 13, "section": "未成年人信息保护", "title": "信息处理规则", "legal_basis": ["G31", "Z1-8", "T5.4-d", "R9/10", "S2.1", "M7.2.2"]},
+    {"id": 14, "section": "信息存储与跨境传输", "title": "境内存储说明", "legal_basis": ["G17", "T9.8/5.5", "Z12", "T6"]},
+    {"id": 15, "section": "信息存储与跨境传输", "title": "跨境传输说明", "legal_basis": ["G39", "T5.5/8", "Z12", "T6"]},
+    {"id": 16, "section": "信息存储与跨境传输", "title": "存储期限说明", "legal_basis": ["G19", "T5", "Z10"]},
+    {"id": 17, "section": "信息存储与跨境传输", "title": "超期处理方式", "legal_basis": ["Z1-10"]},
+    {"id": 18, "section": "安全保护能力", "title": "数据保护技术", "legal_basis": ["G21", "N6.2-b", "Z1-13", "T11-5"]},
+    {"id": 19, "section": "安全保护能力", "title": "应急处理", "legal_basis": ["G21", "N6.2-b", "Z1-13", "T11-5"]},
+    {"id": 20, "section": "数据共享/转让/披露", "title": "数据共享说明", "legal_basis": ["G23", "Z1-14", "T9-4/5", "S5.1"]},
+    {"id": 21, "section": "数据共享/转让/披露", "title": "数据转让说明", "legal_basis": ["G23", "Z1-14", "T9-4/5", "S5.1"]},
+    {"id": 22, "section": "数据共享/转让/披露", "title": "公开披露说明", "legal_basis": ["G23", "Z1-14", "T9-4/5", "S5.1"]},
+    {"id": 23, "section": "用户权利机制", "title": "权利说明", "legal_basis": ["G44-50", "Z1-15", "T8/5.5", "S6.1"]},
+    {"id": 24, "section": "用户权利机制", "title": "操作路径说明", "legal_basis": ["G44-50", "Z1-15", "T8/5.5", "S6.1"]},
+    {"id": 25, "section": "用户权利机制", "title": "运营者响应动作", "legal_basis": ["G22", "T8", "Z15", "S3.8"]},
+    {"id": 26, "section": "反馈与更新", "title": "投诉反馈渠道", "legal_basis": ["G17", "T5.5", "Z1-15", "S6.5"]},
+    {"id": 27, "section": "反馈与更新", "title": "Cookie及同类技术", "legal_basis": ["G7", "T5.4", "Z2-21"]},
+    {"id": 28, "section": "反馈与更新", "title": "SDK/第三方API清单", "legal_basis": ["G23", "T9.6/7", "Z2-22", "S5.1"]},
+    {"id": 29, "section": "隐私政策更新机制", "title": "告知方式", "legal_basis": ["G14", "G17", "T5", "Z1-18", "S2"]},
+    {"id": 30, "section": "隐私政策更新机制", "title": "更改原因", "legal_basis": ["G14", "G17", "T5", "Z1-18", "S2"]},
+    {"id": 31, "section": "隐私政策更新机制", "title": "用户选择", "legal_basis": ["G14", "G17", "T5", "Z1-18", "S2"]},
+    {"id": 32, "section": "其他说明", "title": "是否含有目录", "legal_basis": []},
+    {"id": 33, "section": "其他说明", "title": "是否含免责声明", "legal_basis": ["Z1-19"]},
+    {"id": 34, "section": "其他说明", "title": "是否定义术语", "legal_basis": []},
+    {"id": 35, "section": "其他说明", "title": "是否有其他补充", "legal_basis": []},
+]
+
+# 结构化输出提示词（追加在SYSTEM_PROMPT之后）
+STRUCTURED_OUTPUT_PROMPT = """
+【输出格式】
+请只输出一个JSON对象，不要输出任何其他文字或Markdown代码块。JSON结构如下，checkpoints 必须放在第一个字段，按编号顺序逐项输出全部35个检测要点：
+{
+  "checkpoints": [
+    {
+      "id": 1,
+      "result": "是",
+      "quotes": ["引用的原文段落"],
+      "legal_basis": ["G17", "T5"],
+      "suggestion": "改进建议，result为“是”时可为空字符串"
+    }
+  ],
+  "summary": "整体评估意见"
+}
+"""
+
+# 条款级检测提示词（逐条款标注其满足的检测要点，结果按条款缓存复用）
+CLAUSE_ANNOTATION_PROMPT = """
+【条款级检测】
+用户消息是从一份隐私政策中摘出的若干条款，每条以【条款N】开头。请逐条判断该条款本身满足了下列哪些检测要点，只依据条款原文，不要推测条款之外的内容。
+检测要点：
+""" + "\n".join(f"{entry['id']}. {entry['section']} - {entry['title']}" for entry in CHECKPOINTS) + """
+
+【输出格式】
+请只输出一个JSON对象，不要输出任何其他文字或Markdown代码块。clauses 中按条款编号逐条输出，不满足任何要点的条款 checkpoints 为空数组：
+{
+  "clauses": [
+    {"index": 1, "checkpoints": [{"id": 3, "quote": "条款中支持该要点的原文"}]}
+  ]
+}
+"""
+
+# 分地区检测系统提示词（非内置地区，提示词中只包含该地区规则包的检测要点）
+REGION_SYSTEM_PROMPT = """你是一个专业的隐私政策合规性检测专家，精通{laws}。
+
+【任务目标】
+仅依据{region}的法规要求评估用户提供的隐私政策文本，生成合规性评估报告。不要评估其他国家或地区的法规要求。
+
+【评估框架】
+{framework}
+
+注意：
+    1、给出评估意见时，需同时给出对应的法律条文
+    2、针对每个未满足的要点给出具体改进建议
+请保持专业、客观的分析态度，提供实用且具体的改进方案。
+"""
+
+# 分地区检测结构化输出提示词（追加在地区系统提示词之后）
+REGION_STRUCTURED_OUTPUT_PROMPT = """
+【输出格式】
+请只输出一个JSON对象，不要输出任何其他文字或Markdown代码块。JSON结构如下，checkpoints 必须放在第一个字段，按编号顺序逐项输出全部{count}个检测要点：
+{{
+  "checkpoints": [
+    {{
+      "id": 1,
+      "result": "是",
+      "quotes": ["引用的原文段落"],
+      "legal_basis": ["{example_basis}"],
+      "suggestion": "改进建议，result为“是”时可为空字符串"
+    }}
+  ],
+  "summary": "{region}合规整体评估意见"
+}}
+"""
@@ -26,4 +26,106 @@ SYSTEM_PROMPT = """你是一个专业的隐私政策生成专家，具有以下
 2. 确定适用的法律法规
 3. 生成结构清晰、内容完整的隐私政策
 4. 提供必要的法律建议和注意事项
-"""
\ No newline at end of file
+"""
+# 隐私政策修订提示词（用于生成→检测→修订流水线）
+REVISION_PROMPT = """请根据以下合规性检测和可读性检测意见，修订这份隐私政策。
+
+要求：
+- 逐项补全合规性检测中判定为“否”的内容
+- 按可读性检测建议改写模糊用词、复杂句式和缺少解释的术语
+- 保留原文中已经合规的条款，不要删减必要信息
+- 只输出修订后的完整隐私政策正文
+
+【原始需求】
+{request}
+
+【待修订的隐私政策】
+{policy}
+
+【合规性检测意见】
+{compliance_report}
+
+【可读性检测意见】
+{readability_report}
+"""
+
+# 分章节并行生成：章节大纲，对应合规性检测框架中的检测要点编号
+POLICY_SECTIONS = [
+    {"id": "introduction", "title": "引言与运营者信息", "checkpoints": [1, 2, 32, 34],
+     "guidance": "说明运营者名称、注册地址、APP名称及版本，隐私政策的生效和更新日期，列出本政策目录，并对关键术语作出定义。"},
+    {"id": "first_party", "title": "我们如何收集和使用您的个人信息", "checkpoints": [3, 4, 6],
+     "guidance": "按业务功能逐项说明收集的个人信息类型、目的、方式和范围，区分基本功能与扩展功能，并说明用户拒绝提供时的影响及可操作方式。"},
+    {"id": "sensitive", "title": "敏感个人信息的处理", "checkpoints": [5, 11, 12],
+     "guidance": "逐项说明收集的敏感个人信息、处理的必要性及对个人权益的影响，单独同意的获取方式，以及存储和保护措施。"},
+    {"id": "third_party", "title": "第三方收集、使用个人信息及SDK清单", "checkpoints": [7, 8, 9, 10, 28],
+     "guidance": "说明接入的第三方SDK/API的名称、提供方、收集的信息、目的与处理方式，以及对第三方的约束措施，以表格形式列出SDK清单。"},
+    {"id": "cookies", "title": "Cookie及同类技术", "checkpoints": [27],
+     "guidance": "说明Cookie、设备标识等同类技术的使用目的以及用户的管理和拒绝方式。"},
+    {"id": "minors", "title": "未成年人个人信息保护", "checkpoints": [13],
+     "guidance": "说明对未满14周岁儿童及未成年人个人信息的处理规则、监护人同意机制和专门保护措施。"},
+    {"id": "storage", "title": "个人信息的存储与跨境传输", "checkpoints": [14, 15, 16, 17],
+     "guidance": "说明存储地点、是否跨境传输及其合规依据，存储期限以及超期后的删除或匿名化处理方式。"},
+    {"id": "security", "title": "我们如何保护您的个人信息", "checkpoints": [18, 19],
+     "guidance": "说明采取的技术和管理安全措施，以及发生个人信息安全事件时的应急处置和告知方式。"},
+    {"id": "sharing", "title": "个人信息的共享、转让与公开披露", "checkpoints": [20, 21, 22],
+     "guidance": "分别说明共享、转让、公开披露的场景、条件和事先告知或征得同意的方式。"},
+    {"id": "rights", "title": "您的权利", "checkpoints": [23, 24, 25],
+     "guidance": "说明查阅、复制、更正、删除、撤回同意、注销账号等权利，逐项给出具体操作路径及响应时限。"},
+    {"id": "updates", "title": "本隐私政策的更新", "checkpoints": [29, 30, 31],
+     "guidance": "说明政策变更的告知方式、变更原因的说明方式，以及用户不同意变更时的选择。"},
+    {"id": "contact", "title": "如何联系我们", "checkpoints": [26, 33, 35],
+     "guidance": "提供投诉反馈渠道及响应时限、外部投诉途径，并补充免责声明等其他必要说明。"},
+]
+
+# 分章节生成提示词（各章节共享同一份应用信息，并发生成后按大纲顺序拼接）
+SECTION_PROMPT = """请为下述移动应用撰写隐私政策中的一个章节。
+
+【应用信息】
+{app_context}
+
+【完整大纲】
+{outline}
+
+【本章节】
+第{index}章 {title}
+写作要求：{guidance}
+需覆盖的检测要点：{checkpoints}
+
+要求：
+- 只输出本章节的正文，以“{index}. {title}”作为标题开头，不要输出其他章节的内容
+- 需要引用其他章节时使用章节标题，不要重复其他章节的内容
+- 与应用实际收集的数据类型保持一致，不要编造应用没有的功能
+"""
+
+# 模板补全提示词（基线章节由本地条款库生成，模型只补充缺口或润色）
+TEMPLATE_FILL_PROMPT = """以下是根据条款库为移动应用生成的隐私政策章节初稿，请在此基础上完成修改。
+
+【应用信息】
+{app_context}
+
+【章节初稿】
+{content}
+
+【需要补充的内容】
+{gaps}
+
+要求：
+- 只补充上述内容，保留初稿中已有的条款，不要删减
+- 原样保留“【请填写：…】”形式的占位符
+- 只输出修改后的完整章节正文
+"""
+
+# 模板润色提示词
+TEMPLATE_POLISH_PROMPT = """以下是根据条款库为移动应用生成的隐私政策章节初稿，请结合应用信息润色，使表述贴合该应用的实际功能、清晰易懂。
+
+【应用信息】
+{app_context}
+
+【章节初稿】
+{content}
+
+要求：
+- 不得删减初稿中的条款内容和法律依据
+- 原样保留“【请填写：…】”形式的占位符
+- 只输出润色后的完整章节正文
+"""
@@ -143,4 +143,70 @@ advice：对该问题的评估建议
 suggestion：优化方案，包括建议替代表达或结构调整
 legal_basis：参考的法规/指导文件编号（如 G17、S1-4、Z1-8 等）
 ```
-"""
\ No newline at end of file
+"""
+
+# 可读性检测维度（与SYSTEM_PROMPT中的编号一一对应）
+DIMENSIONS = [
+    {"id": 1, "category": "模糊性识别指标", "name": "可能性模糊用词", "legal_basis": []},
+    {"id": 2, "category": "模糊性识别指标", "name": "条件约束性表述", "legal_basis": []},
+    {"id": 3, "category": "模糊性识别指标", "name": "泛化性表述", "legal_basis": ["G17", "S1-4"]},
+    {"id": 4, "category": "模糊性识别指标", "name": "模糊量词", "legal_basis": ["Z1-5", "T5", "W-A.3"]},
+    {"id": 5, "category": "可读性指标", "name": "用词是否清晰易懂", "legal_basis": ["G17", "S1-4", "S2-4"]},
+    {"id": 6, "category": "可读性指标", "name": "是否避免复杂句式", "legal_basis": ["G17", "S1-4", "S2-4"]},
+    {"id": 7, "category": "可读性指标", "name": "是否结构清晰、有标题条款", "legal_basis": ["G17"]},
+    {"id": 8, "category": "可读性指标", "name": "是否突出重点信息", "legal_basis": ["Z1-8", "T5.5"]},
+    {"id": 9, "category": "可读性指标", "name": "是否附加解释/链接", "legal_basis": ["S1-4"]},
+]
+
+# 结构化输出提示词（追加在SYSTEM_PROMPT之后）
+STRUCTURED_OUTPUT_PROMPT = """
+【输出格式】
+请只输出一个JSON对象，不要输出任何其他文字或Markdown代码块。JSON结构如下，dimensions 必须放在第一个字段，按编号顺序逐项输出全部9个检测维度：
+{
+  "dimensions": [
+    {
+      "id": 1,
+      "score": 80,
+      "issues": [
+        {
+          "violation_type": "模糊用词",
+          "description": "具体发现的问题及其引用原文",
+          "advice": "对该问题的评估建议",
+          "suggestion": "优化方案",
+          "legal_basis": ["G17"]
+        }
+      ]
+    }
+  ],
+  "overall_score": 75,
+  "summary": "整体评估意见"
+}
+其中 score 与 overall_score 为0-100的整数，分数越高可读性越好。
+"""
+
+# 条款级检测提示词（逐条款标注可读性问题，结果按条款缓存复用）
+CLAUSE_ANNOTATION_PROMPT = """
+【条款级检测】
+用户消息是从一份隐私政策中摘出的若干条款，每条以【条款N】开头。请逐条检查该条款在下列检测维度上存在的可读性问题，只依据条款原文。
+检测维度：
+""" + "\n".join(f"{entry['id']}. {entry['category']} - {entry['name']}" for entry in DIMENSIONS) + """
+
+【输出格式】
+请只输出一个JSON对象，不要输出任何其他文字或Markdown代码块。clauses 中按条款编号逐条输出，没有问题的条款 issues 为空数组：
+{
+  "clauses": [
+    {
+      "index": 1,
+      "issues": [
+        {
+          "dimension": 1,
+          "violation_type": "模糊用词",
+          "description": "具体问题及引用原文",
+          "advice": "评估建议",
+          "suggestion": "优化方案"
+        }
+      ]
+    }
+  ]
+}
+"""
@@ -8,11 +8,17 @@ from .agent_manager import AgentManager
 from .privacy_policy_generator_builder import PrivacyPolicyGeneratorBuilder
 from .compliance_checker_builder import ComplianceCheckerBuilder
 from .readability_checker_builder import ReadabilityCheckerBuilder
+from .pipeline import PolicyPipeline
+from .section_generator import SectionedPolicyGenerator
+from .regional_checker import RegionalComplianceChecker
 
 __all__ = [
     "AgentFactory",
     "AgentManager",
     "PrivacyPolicyGeneratorBuilder",
     "ComplianceCheckerBuilder",
-    "ReadabilityCheckerBuilder"
+    "ReadabilityCheckerBuilder",
+    "PolicyPipeline",
+    "SectionedPolicyGenerator",
+    "RegionalComplianceChecker"
 ]
\ No newline at end of file
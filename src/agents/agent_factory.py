@@ -3,18 +3,61 @@ Agent工厂
 根据前端参数构建指定的Agent
 """
 
-from typing import Dict, Any, Optional, List
+import asyncio
+import json
+import time
+from typing import Dict, Any, Optional, List, AsyncIterator
 from loguru import logger
 
 try:
-    from src.utils.utils import get_config
+    from src.utils.utils import get_config, count_tokens
 except ImportError:
-    from ppgllm.src.utils import get_config
+    from ppgllm.src.utils import get_config, count_tokens
 
 try:
     from src.core.models.model_client import ModelClientFactory
+    from src.core.models.upstream import get_upstream_client
 except ImportError:
     from ..core.models.model_client import ModelClientFactory
+    from ..core.models.upstream import get_upstream_client
+try:
+    from src.core.structured import STRUCTURED_SPECS, StructuredReportParser
+except ImportError:
+    from ..core.structured import STRUCTURED_SPECS, StructuredReportParser
+try:
+    from src.core.accounting import BudgetExceededError, track_usage
+    from src.core.scheduling import AdmissionRejectedError
+except ImportError:
+    from ..core.accounting import BudgetExceededError, track_usage
+    from ..core.scheduling import AdmissionRejectedError
+try:
+    from src.core.audits import get_audit_store
+    from src.core.request_context import get_request_context
+except ImportError:
+    from ..core.audits import get_audit_store
+    from ..core.request_context import get_request_context
+try:
+    from src.core.documents import DocumentNotFoundError, get_document_store
+except ImportError:
+    from ..core.documents import DocumentNotFoundError, get_document_store
+try:
+    from src.core.telemetry import trace_stage
+except ImportError:
+    from ..core.telemetry import trace_stage
+try:
+    from src.core.fingerprint import get_fingerprint_index
+    from src.core.clauses import ClauseLevelChecker
+except ImportError:
+    from ..core.fingerprint import get_fingerprint_index
+    from ..core.clauses import ClauseLevelChecker
+try:
+    from src.core.citations import get_citation_index
+    from src.core.tools import get_tool_registry, text_statistics
+    from src.core.memory import get_memory_store
+except ImportError:
+    from ..core.citations import get_citation_index
+    from ..core.tools import get_tool_registry, text_statistics
+    from ..core.memory import get_memory_store
 
 # 导入各个Agent的构建器
 from .privacy_policy_generator_builder import PrivacyPolicyGeneratorBuilder
@@ -37,6 +80,14 @@ class AgentFactory:
 
     def __init__(self):
         self.model_client = self._create_model_client()
+        self.upstream_client = get_upstream_client()
+        self.agent_configs = get_config().get("agents", {})
+        self.fingerprint_index = get_fingerprint_index()
+        self.clause_checker = ClauseLevelChecker(self.upstream_client)
+        self.citation_index = get_citation_index()
+        self.tool_registry = get_tool_registry()
+        self.memory_store = get_memory_store()
+        self.inject_citations = get_config().get("citations", {}).get("inject_scoped", True)
         self.agent_builders = {
             "privacy_policy_generator": PrivacyPolicyGeneratorBuilder,
             "compliance_checker": ComplianceCheckerBuilder,
@@ -55,39 +106,46 @@ class AgentFactory:
             logger.error(f"创建模型客户端失败: {str(e)}")
             raise
 
+    def get_max_tokens(self, agent_type: str) -> int:
+        """获取Agent的最大输出token数，未单独配置时使用全局配置"""
+        return self.agent_configs.get(agent_type, {}).get("max_tokens") or self.upstream_client.max_tokens
+
     async def build_agent(self, agent_type: str, tools=None, memory_files=None):
         """
         构建Agent
         Args:
             agent_type: Agent类型
-            tools: 可选工具列表
-            memory_files: 内存文件列表
+            tools: 可选工具列表（由工具注册表在上游请求中执行，不传给Agent）
+            memory_files: 内存文件列表（由 attach_memory 按请求注入，不影响Agent本身）
         Returns:
             构建的Agent实例
         """
-        # 生成缓存键
-        cache_key = f"{agent_type}_{id(tools)}_{id(memory_files)}"
-        # 检查缓存
-        if cache_key in self._built_agents:
-            return self._built_agents[cache_key]
-        # 检查是否支持该Agent类型
-        if agent_type not in self.agent_builders:
-            raise ValueError(f"不支持的Agent类型: {agent_type}")
-        try:
-            # 获取构建器
-            builder = self.agent_builders[agent_type](
-                model_client=self.model_client,
-                tools=tools,
-                memory_files=memory_files
-            )
-            # 构建Agent
-            agent = await builder.build()
-            # 缓存Agent
-            self._built_agents[cache_key] = agent
-            return agent
-        except Exception as e:
-            logger.error(f"构建Agent失败 {agent_type}: {str(e)}")
-            raise
+        # 工具和记忆均在请求时处理，同一类型的Agent只构建一次
+        cache_key = agent_type
+        with trace_stage("AgentFactory.build_agent", timing="build_agent", agent_type=agent_type) as span:
+            # 检查缓存
+            span.set_attribute("cache_hit", cache_key in self._built_agents)
+            if cache_key in self._built_agents:
+                return self._built_agents[cache_key]
+            # 检查是否支持该Agent类型
+            if agent_type not in self.agent_builders:
+                raise ValueError(f"不支持的Agent类型: {agent_type}")
+            try:
+                # 获取构建器
+                builder = self.agent_builders[agent_type](
+                    model_client=self.model_client,
+                    tools=None,
+                    memory_files=memory_files
+                )
+                # 构建Agent
+                with trace_stage(f"{type(builder).__name__}.build", agent_type=agent_type):
+                    agent = await builder.build()
+                # 缓存Agent
+                self._built_agents[cache_key] = agent
+                return agent
+            except Exception as e:
+                logger.error(f"构建Agent失败 {agent_type}: {str(e)}")
+                raise
 
     async def get_agent_info(self, agent_type: str) -> Dict[str, Any]:
         """
@@ -123,9 +181,132 @@ class AgentFactory:
                 logger.error(f"获取Agent信息失败 {agent_type}: {str(e)}")
         return agents
 
+    def select_generation_params(self, agent_type: str, message: str,
+                                 check_scope: Optional[int] = None) -> Dict[str, Any]:
+        """
+        根据输入长度和检测范围选择模型与输出预算
+        Args:
+            agent_type: Agent类型
+            message: 用户消息
+            check_scope: 请求的检测要点/维度数量，None表示全部
+        Returns:
+            包含 model、max_tokens 的请求参数
+        """
+        selection = ModelClientFactory.select_model(agent_type, count_tokens(message), check_scope)
+        cap = self.get_max_tokens(agent_type)
+        max_tokens = min(selection["max_tokens"], cap) if selection["max_tokens"] else cap
+        logger.debug(f"模型选择 {agent_type}: tier={selection['tier']} model={selection['model']} max_tokens={max_tokens}")
+        return {"model": selection["model"], "max_tokens": max_tokens}
+
+    @staticmethod
+    def scope_legal_basis(agent_type: str, check_points: Optional[List[str]] = None) -> List[str]:
+        """
+        获取检测范围内要点/维度引用的法规编号
+        Args:
+            agent_type: 检测类Agent类型
+            check_points: 检测范围（要点/维度名称或编号），为空时返回全部要点的编号
+        Returns:
+            按目录顺序去重的法规编号列表
+        """
+        catalog = STRUCTURED_SPECS[agent_type]["catalog"]
+        if check_points:
+            wanted = [str(item).strip() for item in check_points]
+            catalog = [
+                entry for entry in catalog
+                if any(item == str(entry["id"]) or (item and item in entry.get("title", entry.get("name", "")))
+                       for item in wanted)
+            ]
+        return list(dict.fromkeys(code for entry in catalog for code in entry["legal_basis"]))
+
+    def apply_check_scope(self, message: str, check_points: Optional[List[str]] = None,
+                          agent_type: Optional[str] = None) -> str:
+        """在消息末尾声明检测范围，使模型只评估指定的要点/维度，并附上这些要点引用的法规条文"""
+        if not check_points:
+            return message
+        message = f"{message}\n\n【检测范围】仅评估以下检测要点/维度：{'、'.join(str(item) for item in check_points)}"
+        if self.inject_citations and agent_type in STRUCTURED_SPECS:
+            articles = self.citation_index.render_for_prompt(self.scope_legal_basis(agent_type, check_points))
+            if articles:
+                message += f"\n\n【法律依据原文】评估和给出建议时请引用以下条文：\n{articles}"
+        return message
+
+    @staticmethod
+    async def attach_document(message: str, document_id: Optional[str] = None) -> str:
+        """
+        将已上传文档的文本附加到消息后
+        Args:
+            message: 用户消息
+            document_id: 上传文档ID
+        Returns:
+            附加文档后的消息
+        Raises:
+            DocumentNotFoundError: 文档不存在
+        """
+        if not document_id:
+            return message
+        text = await get_document_store().get_text(document_id)
+        return f"{message}\n\n【文档内容】\n{text}" if message else text
+
+    async def attach_memory(self, agent_type: str, message: str,
+                            memory_files: Optional[List[str]] = None) -> str:
+        """
+        将与消息最相关的记忆条目附加到消息后，总量不超过该Agent的记忆token预算
+        Args:
+            agent_type: Agent类型
+            message: 用户消息
+            memory_files: 内存文件列表
+        Returns:
+            附加记忆后的消息
+        """
+        if not memory_files:
+            return message
+        budget = self.memory_store.get_budget(agent_type)
+        memories = await self.memory_store.select(message, memory_files, budget)
+        if not memories:
+            return message
+        return f"{message}\n\n【相关记忆】\n" + "\n".join(f"- {item}" for item in memories)
+
+    @staticmethod
+    async def attach_text_statistics(message: str, text: str) -> str:
+        """
+        在本地统计文本的可读性指标并附加到消息后，模型无需以工具参数重新输出全文
+        Args:
+            message: 用户消息
+            text: 待统计的隐私政策文本
+        Returns:
+            附加统计结果后的消息
+        """
+        statistics = await asyncio.to_thread(text_statistics, text)
+        return f"{message}\n\n【文本统计（本地计算）】\n{json.dumps(statistics, ensure_ascii=False)}"
+
+    @staticmethod
+    def _duplicate_summary(match: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """近似重复匹配的摘要信息（不含历史检测结果正文）"""
+        if match is None:
+            return None
+        return {key: match[key] for key in ("fingerprint_id", "similarity", "exact")}
+
+    async def _find_duplicate(self, message: str, result_key: str,
+                              reuse_duplicates: bool) -> Dict[str, Any]:
+        """
+        在近似重复索引中查找历史检测结果
+        Returns:
+            fingerprint: 当前文档指纹；match: 最相似的历史文档；reusable: 是否可直接复用其结果
+        """
+        fingerprint = await self.fingerprint_index.fingerprint_async(message)
+        match = self.fingerprint_index.best_match(fingerprint, result_key)
+        reusable = bool(reuse_duplicates and match and match["similarity"] >= self.fingerprint_index.reuse_threshold)
+        if reusable:
+            self.fingerprint_index.record_reuse()
+            logger.info(f"复用近似重复文档 {match['fingerprint_id']} 的检测结果 (相似度 {match['similarity']})")
+        return {"fingerprint": fingerprint, "match": match, "reusable": reusable}
+
     async def chat_with_agent(self, agent_type: str, message: str,
                             tools: Optional[List] = None,
-                            memory_files: Optional[List[str]] = None) -> Dict[str, Any]:
+                            memory_files: Optional[List[str]] = None,
+                            check_points: Optional[List[str]] = None,
+                            document_id: Optional[str] = None,
+                            reuse_duplicates: bool = False) -> Dict[str, Any]:
         """
         与指定Agent进行对话
         Args:
@@ -133,29 +314,61 @@ class AgentFactory:
             message: 用户消息
             tools: 工具列表
             memory_files: 内存文件列表
+            check_points: 检测范围（要点/维度名称或编号），仅检测类Agent使用
+            document_id: 上传文档ID，文档文本附加在消息之后
+            reuse_duplicates: 检测类Agent遇到高度相似的历史文档时直接复用其检测结果
         Returns:
             对话结果
         """
         try:
+            message = await self.attach_document(message, document_id)
+            if agent_type not in STRUCTURED_SPECS:
+                check_points = None
+            # 完整检测的结果写入近似重复索引，供模板相同的文档复用或对比
+            duplicate = None
+            if agent_type in STRUCTURED_SPECS and not check_points:
+                duplicate = await self._find_duplicate(message, agent_type, reuse_duplicates)
+                if duplicate["reusable"]:
+                    return {
+                        "success": True,
+                        "agent_type": agent_type,
+                        "response": duplicate["match"]["results"][agent_type]["response"],
+                        "message": f"{agent_type} 复用近似重复文档的检测结果",
+                        "near_duplicate": self._duplicate_summary(duplicate["match"]),
+                        "reused": True
+                    }
             # 构建Agent
             agent = await self.build_agent(agent_type, tools, memory_files)
+            check_scope = len(check_points) if check_points else None
+            with trace_stage("AgentFactory.prepare_prompt", timing="prompt", agent_type=agent_type) as span:
+                prompt = self.apply_check_scope(message, check_points, agent_type)
+                prompt = await self.attach_memory(agent_type, prompt, memory_files)
+                if agent_type == "readability_checker":
+                    prompt = await self.attach_text_statistics(prompt, message)
+                tool_names = self.tool_registry.resolve(tools, agent_type)
+                span.set_attributes({"prompt_chars": len(prompt), "tools": ",".join(tool_names)})
             # 根据agent_type选择不同的处理逻辑
             if agent_type == "privacy_policy_generator":
-                response = await self._process_privacy_policy_request(agent, message)
+                response = await self._process_privacy_policy_request(agent, prompt, tool_names)
             elif agent_type == "compliance_checker":
-                response = await self._process_compliance_check_request(agent, message)
+                response = await self._process_compliance_check_request(agent, prompt, check_scope, tool_names)
             elif agent_type == "readability_checker":
-                response = await self._process_readability_check_request(agent, message)
+                response = await self._process_readability_check_request(agent, prompt, check_scope, tool_names)
             else:
                 # 默认处理逻辑
-                response = await self._default_process_request(agent, message)
+                response = await self._default_process_request(agent, prompt, tool_names)
+            if duplicate is not None:
+                await self.fingerprint_index.add(duplicate["fingerprint"], message, agent_type, {"response": response})
             return {
                 "success": True,
                 "agent_type": agent_type,
                 "agent_name": agent.name if hasattr(agent, 'name') else agent_type,
                 "response": response,
-                "message": f"{agent_type} 处理完成"
+                "message": f"{agent_type} 处理完成",
+                "near_duplicate": self._duplicate_summary(duplicate["match"]) if duplicate else None
             }
+        except (BudgetExceededError, AdmissionRejectedError, DocumentNotFoundError):
+            raise
         except Exception as e:
             logger.error(f"Agent对话失败 {agent_type}: {str(e)}")
             return {
@@ -165,85 +378,249 @@ class AgentFactory:
                 "message": f"Agent {agent_type} 处理失败"
             }
 
-    async def _process_privacy_policy_request(self, agent, message):
+    async def stream_structured_chat(self, agent_type: str, message: str,
+                                     tools: Optional[List] = None,
+                                     memory_files: Optional[List[str]] = None,
+                                     check_points: Optional[List[str]] = None,
+                                     document_id: Optional[str] = None,
+                                     reuse_duplicates: bool = False,
+                                     clause_level: bool = False) -> AsyncIterator[Dict[str, Any]]:
+        """
+        以结构化JSON模式与检测Agent对话，流式解析并逐项产出结果
+        Args:
+            agent_type: Agent类型，仅支持检测类Agent
+            message: 用户消息
+            tools: 工具列表
+            memory_files: 内存文件列表
+            check_points: 检测范围（要点/维度名称或编号）
+            document_id: 上传文档ID
+            reuse_duplicates: 遇到高度相似的历史文档时直接复用其检测报告
+            clause_level: 按条款检测，已缓存的条款复用结果，只将新条款发送上游（不支持检测范围）
+        Returns:
+            事件的异步迭代器：item为单个检测要点/维度，report为最终完整报告
+        """
+        if agent_type not in STRUCTURED_SPECS:
+            raise ValueError(f"Agent类型不支持结构化输出: {agent_type}")
+        start = time.perf_counter()
+        message = await self.attach_document(message, document_id)
+        result_key = f"{agent_type}:structured"
+        duplicate = None
+        if not check_points:
+            duplicate = await self._find_duplicate(message, result_key, reuse_duplicates)
+            if duplicate["reusable"]:
+                report = duplicate["match"]["results"][result_key]["report"]
+                await self.record_audit(agent_type, report, "structured", message, start, reused=True)
+                yield {
+                    "type": "report",
+                    "data": report,
+                    "errors": [],
+                    "near_duplicate": self._duplicate_summary(duplicate["match"]),
+                    "reused": True
+                }
+                return
+        with track_usage() as usage:
+            agent = await self.build_agent(agent_type, tools, memory_files)
+            result = None
+            if clause_level and not check_points:
+                params = self.select_generation_params(agent_type, message[:self.clause_checker.store.batch_chars])
+                result = await self.clause_checker.check(agent_type, message, self._get_system_message(agent), **params)
+                if result["errors"]:
+                    # 部分条款的结果无法解析，条款级报告不完整，改为整篇检测
+                    logger.warning(f"条款级检测不完整，改为整篇检测 {agent_type}: {'; '.join(result['errors'])}")
+                else:
+                    report_model, errors = result["report"], []
+                    array_key = STRUCTURED_SPECS[agent_type]["array_key"]
+                    for item in getattr(report_model, array_key):
+                        yield {"type": "item", "data": item.model_dump()}
+            if result is None or result["errors"]:
+                parser = StructuredReportParser(agent_type)
+                system_message = self._get_system_message(agent) + parser.spec["prompt"]
+                params = self.select_generation_params(agent_type, message, len(check_points) if check_points else None)
+                prompt = self.apply_check_scope(message, check_points, agent_type)
+                prompt = await self.attach_memory(agent_type, prompt, memory_files)
+                async for chunk in self.upstream_client.stream(
+                    system_message, prompt,
+                    agent_type=agent_type,
+                    response_format={"type": "json_object"},
+                    **params
+                ):
+                    for item in parser.feed(chunk):
+                        yield {"type": "item", "data": item.model_dump()}
+                report_model, errors = parser.finalize(), parser.errors
+        report = report_model.model_dump()
+        # 有解析错误的报告不完整，不写入近似重复索引和检测结果存储
+        if not errors:
+            if duplicate is not None:
+                await self.fingerprint_index.add(duplicate["fingerprint"], message, result_key, {"report": report})
+            await self.record_audit(agent_type, report, "structured", message, start, usage=usage)
+        yield {
+            "type": "report",
+            "data": report,
+            "errors": errors,
+            "near_duplicate": self._duplicate_summary(duplicate["match"]) if duplicate else None,
+            "reused": False,
+            "clause_stats": result["stats"] if result else None
+        }
+
+    async def record_audit(self, agent_type: str, report: Dict[str, Any], source: str, policy: str,
+                           start: float, usage: Optional[Dict[str, int]] = None,
+                           region: Optional[str] = None, reused: bool = False) -> Optional[str]:
+        """
+        将检测报告写入检测结果存储，应用ID、请求ID和调用方取自当前请求上下文
+        Args:
+            agent_type: Agent类型
+            report: 结构化检测报告
+            source: 来源（structured、regional）
+            policy: 被检测的隐私政策文本
+            start: 检测开始时刻（time.perf_counter）
+            usage: 检测期间的token用量
+            region: 检测地区
+            reused: 是否复用了历史报告
+        Returns:
+            检测记录ID
+        """
+        context = get_request_context()
+        try:
+            return await get_audit_store().record(
+                agent_type, report, source,
+                app_id=context.app_id,
+                region=region,
+                usage=usage,
+                latency_ms=(time.perf_counter() - start) * 1000,
+                reused=reused,
+                request_id=context.request_id,
+                client_id=context.client_id,
+                policy=policy
+            )
+        except Exception as e:
+            # 存储异常不影响检测结果返回
+            logger.error(f"检测结果记录失败 {agent_type}: {str(e)}")
+            return None
+
+    async def structured_chat_with_agent(self, agent_type: str, message: str,
+                                         tools: Optional[List] = None,
+                                         memory_files: Optional[List[str]] = None,
+                                         check_points: Optional[List[str]] = None,
+                                         document_id: Optional[str] = None,
+                                         reuse_duplicates: bool = False,
+                                         clause_level: bool = False) -> Dict[str, Any]:
+        """
+        以结构化JSON模式与检测Agent对话
+        Args:
+            agent_type: Agent类型，仅支持检测类Agent
+            message: 用户消息
+            tools: 工具列表
+            memory_files: 内存文件列表
+            check_points: 检测范围（要点/维度名称或编号）
+            document_id: 上传文档ID
+            reuse_duplicates: 遇到高度相似的历史文档时直接复用其检测报告
+            clause_level: 按条款检测并复用条款级缓存
+        Returns:
+            包含强类型检测报告的对话结果
+        """
+        try:
+            final = {}
+            async for event in self.stream_structured_chat(agent_type, message, tools, memory_files,
+                                                           check_points, document_id, reuse_duplicates,
+                                                           clause_level):
+                if event["type"] == "report":
+                    final = event
+            return {
+                "success": True,
+                "agent_type": agent_type,
+                "report": final.get("data"),
+                "message": f"{agent_type} 结构化检测完成",
+                "near_duplicate": final.get("near_duplicate"),
+                "reused": final.get("reused", False),
+                "clause_stats": final.get("clause_stats")
+            }
+        except (BudgetExceededError, AdmissionRejectedError, DocumentNotFoundError):
+            raise
+        except Exception as e:
+            logger.error(f"结构化检测失败 {agent_type}: {str(e)}")
+            return {
+                "success": False,
+                "agent_type": agent_type,
+                "error": str(e),
+                "message": f"Agent {agent_type} 结构化检测失败"
+            }
+
+    async def _process_privacy_policy_request(self, agent, message, tools: Optional[List[str]] = None):
         """处理隐私政策生成请求"""
         try:
             # 使用OpenAI客户端发送请求
-            response = await self._send_chat_request(agent, message)
+            response = await self._send_chat_request(agent, message, "privacy_policy_generator", tools=tools)
             return response
         except Exception as e:
             logger.error(f"处理隐私政策请求失败: {str(e)}")
             raise
 
-    async def _process_compliance_check_request(self, agent, message):
+    async def _process_compliance_check_request(self, agent, message, check_scope: Optional[int] = None,
+                                                tools: Optional[List[str]] = None):
         """处理合规检查请求"""
         try:
             # 使用OpenAI客户端发送请求
-            response = await self._send_chat_request(agent, message)
+            response = await self._send_chat_request(agent, message, "compliance_checker", check_scope, tools)
             return response
         except Exception as e:
             logger.error(f"处理合规检查请求失败: {str(e)}")
             raise
 
-    async def _process_readability_check_request(self, agent, message):
+    async def _process_readability_check_request(self, agent, message, check_scope: Optional[int] = None,
+                                                 tools: Optional[List[str]] = None):
         """处理可读性检查请求"""
         try:
             # 使用OpenAI客户端发送请求
-            response = await self._send_chat_request(agent, message)
+            response = await self._send_chat_request(agent, message, "readability_checker", check_scope, tools)
             return response
         except Exception as e:
             logger.error(f"处理可读性检查请求失败: {str(e)}")
             raise
 
-    async def _default_process_request(self, agent, message):
+    async def _default_process_request(self, agent, message, tools: Optional[List[str]] = None):
         """默认处理请求"""
         try:
             # 使用OpenAI客户端发送请求
-            response = await self._send_chat_request(agent, message)
+            response = await self._send_chat_request(agent, message, tools=tools)
             return response
         except Exception as e:
             logger.error(f"处理请求失败: {str(e)}")
             raise
 
-    async def _send_chat_request(self, agent, message):
-        """发送聊天请求"""
+    async def _send_chat_request(self, agent, message, agent_type: str = "default",
+                                 check_scope: Optional[int] = None,
+                                 tools: Optional[List[str]] = None):
+        """发送聊天请求，tools为允许模型调用的本地工具名称"""
         try:
             # 获取系统消息
-            system_message = agent.system_message if hasattr(agent, 'system_message') else ""
-            
-            # 打印可用方法，帮助调试
-            logger.info(f"model_client类型: {type(self.model_client)}")
-            logger.info(f"model_client可用方法: {dir(self.model_client)}")
-            
-            # 直接使用原生OpenAI客户端
-            from openai import OpenAI
-            
-            qwen_config = get_config().get("qwen_client", {})
-            api_key = qwen_config.get("api_key", "")
-            base_url = qwen_config.get("base_url", "https://dashscope.aliyuncs.com/compatible-mode/v1")
-            model = qwen_config.get("model", "qwen-turbo")
-            max_tokens = qwen_config.get("max_tokens", 8000)
-            
-            client = OpenAI(
-                api_key=api_key,
-                base_url=base_url
-            )
-            
-            response = client.chat.completions.create(
-                model=model,
-                messages=[
-                    {"role": "system", "content": system_message},
-                    {"role": "user", "content": message}
-                ],
-                temperature=0.1,
-                max_tokens=max_tokens
-            )
-            # 返回响应内容
-            return response.choices[0].message.content
+            system_message = self._get_system_message(agent)
+            # 按输入长度和检测范围选择模型与输出预算
+            params = self.select_generation_params(agent_type, message, check_scope)
+            # 复用全局异步客户端，避免阻塞事件循环
+            if tools:
+                return await self.upstream_client.complete(
+                    system_message, message,
+                    agent_type=agent_type,
+                    tools=tools,
+                    **params
+                )
+            # 无工具时以流式接收，请求被取消（客户端断开或超时）时立即关闭上游连接停止生成
+            parts = []
+            async for chunk in self.upstream_client.stream(system_message, message, agent_type=agent_type, **params):
+                parts.append(chunk)
+            return "".join(parts)
         except Exception as e:
             logger.error(f"发送聊天请求失败: {str(e)}")
             raise
 
+    @staticmethod
+    def _get_system_message(agent) -> str:
+        """获取Agent的系统提示词"""
+        system_messages = getattr(agent, "_system_messages", None)
+        if system_messages:
+            return system_messages[0].content
+        return getattr(agent, "system_message", "") or ""
+
     def clear_cache(self):
         """清空Agent缓存"""
         self._built_agents.clear()
@@ -9,11 +9,32 @@ from loguru import logger
 
 from .agent_factory import AgentFactory
 
+try:
+    from src.core.accounting import BudgetExceededError
+    from src.core.scheduling import AdmissionRejectedError
+    from src.core.documents import DocumentNotFoundError
+    from src.core.intent import get_intent_classifier
+    from src.utils.utils import get_config
+except ImportError:
+    from ..core.accounting import BudgetExceededError
+    from ..core.scheduling import AdmissionRejectedError
+    from ..core.documents import DocumentNotFoundError
+    from ..core.intent import get_intent_classifier
+    from ..utils.utils import get_config
+try:
+    from prompt.intent_router_prompt import SYSTEM_PROMPT as INTENT_ROUTER_PROMPT
+except ImportError:
+    from ...prompt.intent_router_prompt import SYSTEM_PROMPT as INTENT_ROUTER_PROMPT
+
 class AgentManager:
     """Agent管理器类"""
-    def __init__(self):
-        self.factory = AgentFactory()
+    def __init__(self, factory: Optional[AgentFactory] = None):
+        self.factory = factory or AgentFactory()
         self.agents = {}  # 缓存已初始化的Agent
+        self.classifier = get_intent_classifier()
+        intent_config = get_config().get("intent", {})
+        self.confidence_threshold = intent_config.get("confidence_threshold", 0.7)
+        self.escalate = intent_config.get("escalate", True)
         
     async def get_available_agents(self) -> List[Dict[str, Any]]:
         """获取所有可用的Agent信息"""
@@ -37,17 +58,34 @@ class AgentManager:
             "agents": {agent["type"]: {"status": agent["status"]} for agent in agents}
         }
     def select_agent_by_intent(self, message: str) -> str:
-        """根据用户意图自动选择合适的Agent"""
-        # 简单的关键词匹配逻辑
-        if "生成" in message or "创建" in message or "写一个" in message:
-            return "privacy_policy_generator"
-        elif "合规" in message or "检查" in message or "符合法规" in message:
-            return "compliance_checker"
-        elif "可读性" in message or "易读" in message or "理解" in message:
-            return "readability_checker"
-        else:
-            # 默认使用隐私政策生成器
-            return "privacy_policy_generator"
+        """根据用户意图自动选择合适的Agent（本地分类器，不调用模型）"""
+        agent_type, _ = self.classifier.predict(message)
+        return agent_type
+
+    async def route_message(self, message: str) -> Dict[str, Any]:
+        """
+        为消息选择Agent，分类器置信度不足时交由模型判断
+        Args:
+            message: 用户消息
+        Returns:
+            包含 agent_type、confidence、method 的路由结果
+        """
+        agent_type, confidence = self.classifier.predict(message)
+        if confidence >= self.confidence_threshold or not self.escalate:
+            return {"agent_type": agent_type, "confidence": confidence, "method": "classifier"}
+        try:
+            # 只发送消息首尾片段，输出仅为Agent标识
+            snippet = message if len(message) <= 400 else f"{message[:200]}\n...\n{message[-200:]}"
+            answer = await self.factory.upstream_client.complete(
+                INTENT_ROUTER_PROMPT, snippet, agent_type="intent_router", max_tokens=16, temperature=0
+            )
+            for candidate in self.classifier.labels:
+                if candidate in answer:
+                    logger.info(f"意图分类置信度 {confidence:.2f} 过低，模型路由至 {candidate}")
+                    return {"agent_type": candidate, "confidence": confidence, "method": "llm"}
+        except Exception as e:
+            logger.error(f"模型意图路由失败，使用分类器结果: {str(e)}")
+        return {"agent_type": agent_type, "confidence": confidence, "method": "classifier"}
     async def process_request(self, agent_type: str, message: str, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """处理前端请求"""
         try:
@@ -65,14 +103,21 @@ class AgentManager:
                 agent_type=agent_type,
                 message=message,
                 tools=tools,
-                memory_files=memory_files
+                memory_files=memory_files,
+                document_id=context.get("document_id") if context else None,
+                reuse_duplicates=bool(context.get("reuse_duplicates")) if context else False
             )
             return {
-                "success": True,
+                "success": result.get("success", False),
                 "agent_type": agent_type,
                 "response": result.get("response"),
-                "message": "请求处理成功"
+                "message": "请求处理成功" if result.get("success") else result.get("message", "处理请求失败"),
+                "error": result.get("error"),
+                "near_duplicate": result.get("near_duplicate"),
+                "reused": result.get("reused", False)
             }
+        except (BudgetExceededError, AdmissionRejectedError, DocumentNotFoundError):
+            raise
         except Exception as e:
             logger.error(f"处理请求失败: {str(e)}")
             return {
@@ -84,7 +129,8 @@ class AgentManager:
     async def auto_process_request(self, message: str, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """自动选择Agent处理请求"""
         # 自动选择Agent
-        selected_agent = self.select_agent_by_intent(message)
+        routing = await self.route_message(message)
+        selected_agent = routing["agent_type"]
         # 处理请求
         result = await self.process_request(
             agent_type=selected_agent,
@@ -93,4 +139,6 @@ class AgentManager:
         )
         # 添加选择的Agent信息
         result["selected_agent"] = selected_agent
+        result["intent_confidence"] = round(routing["confidence"], 4)
+        result["routing_method"] = routing["method"]
         return result
@@ -2,16 +2,7 @@
 合规性检测Agent构建器
 """
 
-import os
 from autogen_agentchat.agents import AssistantAgent
-try:
-    from src.core.memory.list_memory import ListMemoryManager
-except ImportError:
-    from ..core.memory.list_memory import ListMemoryManager
-try:
-    from src.utils.utils import get_memory_dir
-except ImportError:
-    from ppgllm.src.utils import get_memory_dir
 try:
     from prompt.compliance_checker_prompt import DESCRIPTION, SYSTEM_PROMPT
 except ImportError:
@@ -27,17 +18,12 @@ class ComplianceCheckerBuilder:
 
     async def build(self):
         """构建合规性检测Agent"""
-        memories = []
-        for name in self.memory_files:
-            manager = ListMemoryManager(os.path.join(get_memory_dir(), name))
-            memories.append(await manager.get_memory())
-            
+        # 记忆文件不再整体加载，由 MemoryStore 在每次请求时按相关性选择并在预算内注入
         return AssistantAgent(
             name="移动应用隐私政策内容合规性检测agent",
             model_client=self.model_client,
             description=DESCRIPTION,
             system_message=SYSTEM_PROMPT,
             tools=self.tools,
-            memory=memories,
             model_client_stream=True
         )
\ No newline at end of file
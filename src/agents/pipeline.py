@@ -0,0 +1,156 @@
+"""
+隐私政策处理流水线
+在服务端串联 生成 → 并发检测 → 修订，中间文本不回传客户端
+"""
+
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List, AsyncIterator
+
+from loguru import logger
+
+from .agent_factory import AgentFactory
+
+try:
+    from prompt.privacy_policy_generator_prompt import REVISION_PROMPT
+except ImportError:
+    from ...prompt.privacy_policy_generator_prompt import REVISION_PROMPT
+
+
+class PolicyPipeline:
+    """生成→检测→修订流水线"""
+
+    GENERATOR = "privacy_policy_generator"
+    CHECKERS = ("compliance_checker", "readability_checker")
+
+    def __init__(self, factory: AgentFactory, max_runs: int = 100):
+        self.factory = factory
+        self.max_runs = max_runs
+        self._runs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()  # 保存最近的运行结果
+
+    def get_run(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """获取流水线运行结果"""
+        return self._runs.get(run_id)
+
+    def _save_run(self, run_id: str, run: Dict[str, Any]):
+        """保存运行结果，超出上限时淘汰最早的记录"""
+        self._runs[run_id] = run
+        self._runs.move_to_end(run_id)
+        while len(self._runs) > self.max_runs:
+            self._runs.popitem(last=False)
+
+    async def _run_stage(self, agent_type: str, message: str,
+                         tools: Optional[List] = None,
+                         memory_files: Optional[List[str]] = None) -> Dict[str, Any]:
+        """执行单个Agent阶段并记录耗时"""
+        start = time.perf_counter()
+        result = await self.factory.chat_with_agent(
+            agent_type=agent_type,
+            message=message,
+            tools=tools,
+            memory_files=memory_files
+        )
+        result["elapsed"] = round(time.perf_counter() - start, 3)
+        return result
+
+    @staticmethod
+    def _event(run_id: str, stage: str, status: str, **fields) -> Dict[str, Any]:
+        """构造进度事件"""
+        event = {"run_id": run_id, "stage": stage, "status": status}
+        event.update(fields)
+        return event
+
+    async def run(self, message: str, revise: bool = True,
+                  include_reports: bool = False,
+                  tools: Optional[List] = None,
+                  memory_files: Optional[List[str]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        运行流水线并逐阶段产出进度事件
+        Args:
+            message: 隐私政策生成需求
+            revise: 是否根据检测意见进行一轮修订
+            include_reports: 最终事件中是否附带检测报告
+            tools: 工具列表
+            memory_files: 内存文件列表
+        Returns:
+            进度事件的异步迭代器
+        """
+        run_id = uuid.uuid4().hex
+        run: Dict[str, Any] = {"run_id": run_id, "request": message, "status": "running", "reports": {}}
+        self._save_run(run_id, run)
+        pipeline_start = time.perf_counter()
+
+        # 阶段中抛出的异常（预算超限、准入拒绝等）或客户端断开取消时也需结束运行状态，避免一直显示为运行中
+        try:
+            # 1. 生成
+            yield self._event(run_id, "generate", "started")
+            generated = await self._run_stage(self.GENERATOR, message, tools, memory_files)
+            if not generated["success"]:
+                run["status"] = "failed"
+                run["error"] = generated.get("error")
+                yield self._event(run_id, "generate", "failed", error=generated.get("error"))
+                return
+            policy = generated["response"] or ""
+            run["draft"] = policy
+            yield self._event(run_id, "generate", "completed",
+                              elapsed=generated["elapsed"], chars=len(policy))
+
+            # 2. 并发检测
+            yield self._event(run_id, "check", "started", agents=list(self.CHECKERS))
+            tasks = {
+                asyncio.ensure_future(self._run_stage(agent_type, policy, tools, memory_files)): agent_type
+                for agent_type in self.CHECKERS
+            }
+            try:
+                for future in asyncio.as_completed(list(tasks)):
+                    result = await future
+                    agent_type = result["agent_type"]
+                    run["reports"][agent_type] = result.get("response")
+                    yield self._event(run_id, agent_type, "completed" if result["success"] else "failed",
+                                      elapsed=result["elapsed"], error=result.get("error"))
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+            failed = [agent_type for agent_type in self.CHECKERS if not run["reports"].get(agent_type)]
+            if failed:
+                logger.warning(f"流水线 {run_id} 检测阶段部分失败: {failed}")
+
+            # 3. 修订
+            if revise and failed:
+                yield self._event(run_id, "revise", "skipped", reason=f"检测阶段失败: {failed}")
+            elif revise:
+                yield self._event(run_id, "revise", "started")
+                revision_message = REVISION_PROMPT.format(
+                    request=message,
+                    policy=policy,
+                    compliance_report=run["reports"]["compliance_checker"],
+                    readability_report=run["reports"]["readability_checker"]
+                )
+                revised = await self._run_stage(self.GENERATOR, revision_message, tools, memory_files)
+                if revised["success"] and revised["response"]:
+                    policy = revised["response"]
+                    yield self._event(run_id, "revise", "completed",
+                                      elapsed=revised["elapsed"], chars=len(policy))
+                else:
+                    yield self._event(run_id, "revise", "failed", error=revised.get("error"))
+
+            run["policy"] = policy
+            run["status"] = "completed"
+            done = self._event(run_id, "done", "completed",
+                               elapsed=round(time.perf_counter() - pipeline_start, 3),
+                               policy=policy)
+            if include_reports:
+                done["reports"] = run["reports"]
+            yield done
+        except (asyncio.CancelledError, GeneratorExit):
+            # 已产出最终事件后调用方关闭迭代器不改变结果
+            if run["status"] == "running":
+                run["status"] = "cancelled"
+            raise
+        except Exception as e:
+            run["status"] = "failed"
+            run["error"] = str(e)
+            raise
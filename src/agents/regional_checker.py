@@ -0,0 +1,194 @@
+"""
+多地区并行合规检测
+每个目标地区单独请求模型，提示词中只包含该地区规则包的检测要点，各地区并发检测后合并为 主题×地区 矩阵，
+总耗时接近最慢的单个地区
+"""
+
+import asyncio
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from loguru import logger
+
+from .agent_factory import AgentFactory
+
+try:
+    from src.utils.utils import get_config
+except ImportError:
+    from ppgllm.src.utils import get_config
+try:
+    from src.core.accounting import BudgetExceededError, track_usage
+    from src.core.scheduling import AdmissionRejectedError
+    from src.core.rule_packs import get_rule_pack_library
+    from src.core.structured import StructuredReportParser
+    from src.core.telemetry import trace_stage
+except ImportError:
+    from ..core.accounting import BudgetExceededError, track_usage
+    from ..core.scheduling import AdmissionRejectedError
+    from ..core.rule_packs import get_rule_pack_library
+    from ..core.structured import StructuredReportParser
+    from ..core.telemetry import trace_stage
+try:
+    from prompt.compliance_checker_prompt import REGION_STRUCTURED_OUTPUT_PROMPT, REGION_SYSTEM_PROMPT
+except ImportError:
+    from ...prompt.compliance_checker_prompt import REGION_STRUCTURED_OUTPUT_PROMPT, REGION_SYSTEM_PROMPT
+
+
+class RegionalComplianceChecker:
+    """多地区并行合规检测器"""
+
+    AGENT_TYPE = "compliance_checker"
+
+    def __init__(self, factory: AgentFactory):
+        self.factory = factory
+        config = get_config().get("regional_compliance", {})
+        self.concurrency = config.get("concurrency", 4)
+        self.library = get_rule_pack_library()
+
+    def plan(self, regions: Optional[List[str]] = None,
+             check_points: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        解析目标地区和检测范围
+        Args:
+            regions: 目标地区（名称或别名，如 GDPR、加州），默认中国
+            check_points: 检测主题（id或名称），默认全部
+        Returns:
+            regions（需要检测的地区）、unknown_regions、not_applicable_regions（规则包不含所选主题的地区）、topics
+        Raises:
+            ValueError: 没有可用的地区规则包、检测主题无法识别或所选主题不适用于任何目标地区
+        """
+        matched, unknown = self.library.resolve_regions(regions)
+        if not matched:
+            raise ValueError(f"没有适用于目标地区的规则包: {', '.join(unknown)}，可选: {', '.join(self.library.regions)}")
+        topics = self.library.resolve_topics(check_points)
+        applicable = [region for region in matched if self.library.catalog(region, topics)]
+        if not applicable:
+            raise ValueError(f"所选检测主题不适用于目标地区: {', '.join(matched)}")
+        return {
+            "regions": applicable,
+            "unknown_regions": unknown,
+            "not_applicable_regions": [region for region in matched if region not in applicable],
+            "topics": topics
+        }
+
+    def _region_request(self, region: str, catalog: List[Dict[str, Any]], base_system: str,
+                        policy: str, topics: Optional[List[str]]) -> Dict[str, str]:
+        """组装单个地区的系统提示词和用户消息"""
+        if self.library.is_builtin(region):
+            # 内置评估框架沿用合规检测Agent的提示词，指定主题时按检测要点声明范围
+            parser_prompt = StructuredReportParser(self.AGENT_TYPE).spec["prompt"]
+            scope = [str(entry["id"]) for entry in catalog] if topics is not None else None
+            return {
+                "system": base_system + parser_prompt,
+                "message": self.factory.apply_check_scope(policy, scope, self.AGENT_TYPE)
+            }
+        system = REGION_SYSTEM_PROMPT.format(
+            laws=self.library.regions[region]["laws"],
+            region=region,
+            framework=self.library.render_framework(catalog)
+        ) + REGION_STRUCTURED_OUTPUT_PROMPT.format(
+            count=len(catalog),
+            example_basis=catalog[0]["legal_basis"][0] if catalog[0]["legal_basis"] else "",
+            region=region
+        )
+        return {"system": system, "message": policy}
+
+    async def check(self, policy: str,
+                    regions: Optional[List[str]] = None,
+                    check_points: Optional[List[str]] = None,
+                    tools: Optional[List] = None,
+                    memory_files: Optional[List[str]] = None,
+                    document_id: Optional[str] = None,
+                    parallel: bool = True) -> AsyncIterator[Dict[str, Any]]:
+        """
+        按地区检测隐私政策合规性
+        Args:
+            policy: 隐私政策内容
+            regions: 目标地区
+            check_points: 检测主题
+            tools: 工具列表
+            memory_files: 内存文件列表
+            document_id: 上传文档ID，文档文本附加在政策内容之后
+            parallel: 是否并发检测各地区，否则逐个地区检测
+        Returns:
+            事件的异步迭代器：plan为检测计划，region为按完成顺序产出的地区报告，done为合并后的矩阵；
+            规则包中没有所选主题检测要点的地区不发送请求，列入 not_applicable_regions
+        """
+        start = time.perf_counter()
+        plan = self.plan(regions, check_points)
+        topics = plan["topics"]
+        catalogs = {region: self.library.catalog(region, topics) for region in plan["regions"]}
+        yield {
+            "type": "plan",
+            **plan,
+            "checkpoints": {region: len(catalog) for region, catalog in catalogs.items()}
+        }
+
+        policy = await self.factory.attach_document(policy, document_id)
+        agent = await self.factory.build_agent(self.AGENT_TYPE, tools, memory_files)
+        base_system = self.factory._get_system_message(agent)
+        policy = await self.factory.attach_memory(self.AGENT_TYPE, policy, memory_files)
+        semaphore = asyncio.Semaphore(self.concurrency if parallel else 1)
+
+        async def check_region(region: str) -> Dict[str, Any]:
+            catalog = catalogs[region]
+            request = self._region_request(region, catalog, base_system, policy, topics)
+            parser = StructuredReportParser(self.AGENT_TYPE, catalog)
+            params = self.factory.select_generation_params(self.AGENT_TYPE, request["message"], len(catalog))
+            result = {"region": region, "laws": self.library.regions[region]["laws"]}
+            async with semaphore:
+                region_start = time.perf_counter()
+                try:
+                    with trace_stage("compliance.region", region=region, checkpoints=len(catalog)), \
+                            track_usage() as usage:
+                        text = await self.factory.upstream_client.complete(
+                            request["system"], request["message"],
+                            agent_type=self.AGENT_TYPE,
+                            response_format={"type": "json_object"},
+                            **params
+                        )
+                except (BudgetExceededError, AdmissionRejectedError):
+                    raise
+                except Exception as e:
+                    # 单个地区失败不影响其他地区的结果
+                    logger.error(f"地区合规检测失败 {region}: {str(e)}")
+                    return {**result, "report": None, "errors": [str(e)],
+                            "elapsed": round(time.perf_counter() - region_start, 3)}
+            parser.feed(text)
+            report = parser.finalize().model_dump()
+            if not parser.errors:
+                await self.factory.record_audit(self.AGENT_TYPE, report, "regional", policy, region_start,
+                                                usage=usage, region=region)
+            return {
+                **result,
+                "report": report,
+                "errors": parser.errors,
+                "elapsed": round(time.perf_counter() - region_start, 3)
+            }
+
+        tasks = [asyncio.create_task(check_region(region)) for region in plan["regions"]]
+        completed: Dict[str, Dict[str, Any]] = {}
+        try:
+            for future in asyncio.as_completed(tasks):
+                result = await future
+                completed[result["region"]] = result
+                yield {"type": "region", **result}
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        reports = {region: completed[region]["report"] for region in plan["regions"]
+                   if completed[region]["report"] is not None}
+        elapsed = round(time.perf_counter() - start, 3)
+        slowest = max(result["elapsed"] for result in completed.values())
+        logger.info(f"多地区合规检测完成: {', '.join(plan['regions'])}, 耗时 {elapsed}s（最慢地区 {slowest}s）")
+        yield {
+            "type": "done",
+            "regions": plan["regions"],
+            "unknown_regions": plan["unknown_regions"],
+            "not_applicable_regions": plan["not_applicable_regions"],
+            "matrix": self.library.build_matrix(reports, topics),
+            "failed_regions": [region for region in plan["regions"] if region not in reports],
+            "elapsed": elapsed,
+            "slowest_region_elapsed": slowest
+        }
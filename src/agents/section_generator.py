@@ -0,0 +1,192 @@
+"""
+分章节并行生成隐私政策
+按合规框架规划大纲，各章节共享应用信息并发生成，按大纲顺序拼接并尽早流式返回已完成的章节
+"""
+
+import asyncio
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from loguru import logger
+
+from .agent_factory import AgentFactory
+
+try:
+    from src.utils.utils import get_config
+except ImportError:
+    from ppgllm.src.utils import get_config
+try:
+    from src.core.templates import get_template_engine
+except ImportError:
+    from ..core.templates import get_template_engine
+try:
+    from prompt.privacy_policy_generator_prompt import (
+        POLICY_SECTIONS, SECTION_PROMPT, TEMPLATE_FILL_PROMPT, TEMPLATE_POLISH_PROMPT
+    )
+    from prompt.compliance_checker_prompt import CHECKPOINTS
+except ImportError:
+    from ...prompt.privacy_policy_generator_prompt import (
+        POLICY_SECTIONS, SECTION_PROMPT, TEMPLATE_FILL_PROMPT, TEMPLATE_POLISH_PROMPT
+    )
+    from ...prompt.compliance_checker_prompt import CHECKPOINTS
+
+# 用于区分敏感个人信息的关键词
+SENSITIVE_KEYWORDS = (
+    "身份证", "证件", "人脸", "面部", "指纹", "声纹", "虹膜", "生物", "位置", "定位", "行踪", "轨迹",
+    "健康", "医疗", "病历", "银行", "金融", "支付", "账户", "信用", "通讯录", "宗教", "未成年", "儿童"
+)
+
+
+class SectionedPolicyGenerator:
+    """分章节并行隐私政策生成器"""
+
+    AGENT_TYPE = "privacy_policy_generator"
+
+    def __init__(self, factory: AgentFactory):
+        self.factory = factory
+        config = get_config().get("generation", {})
+        self.concurrency = config.get("section_concurrency", 6)
+        self.section_max_tokens = config.get("section_max_tokens", 2000)
+        self._checkpoint_titles = {entry["id"]: entry["title"] for entry in CHECKPOINTS}
+        self.template_engine = get_template_engine()
+
+    @staticmethod
+    def build_app_context(app_info: Dict[str, Any]) -> str:
+        """
+        组装各章节共享的应用信息
+        Args:
+            app_info: PrivacyPolicyGenerateRequest 的字段
+        Returns:
+            应用信息文本
+        """
+        data_types = list(app_info.get("data_types") or [])
+        sensitive = [item for item in data_types if any(keyword in item for keyword in SENSITIVE_KEYWORDS)]
+        lines = [
+            f"应用名称：{app_info['app_name']}",
+            f"应用类型：{app_info['app_type']}",
+            f"收集的个人信息：{'、'.join(data_types) or '无'}",
+            f"其中敏感个人信息：{'、'.join(sensitive) or '无'}",
+            f"目标地区：{'、'.join(app_info.get('regions') or ['中国'])}"
+        ]
+        if app_info.get("requirements"):
+            lines.append(f"特殊要求：{app_info['requirements']}")
+        return "\n".join(lines)
+
+    @staticmethod
+    def plan_outline(section_ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        规划大纲
+        Args:
+            section_ids: 仅生成指定章节（POLICY_SECTIONS 中的id），默认全部
+        Returns:
+            按顺序排列的章节列表
+        """
+        if not section_ids:
+            return list(POLICY_SECTIONS)
+        wanted = set(section_ids)
+        unknown = wanted - {section["id"] for section in POLICY_SECTIONS}
+        if unknown:
+            raise ValueError(f"未知的章节: {', '.join(sorted(unknown))}")
+        return [section for section in POLICY_SECTIONS if section["id"] in wanted]
+
+    def _section_message(self, app_context: str, outline: List[Dict[str, Any]], index: int) -> str:
+        section = outline[index]
+        return SECTION_PROMPT.format(
+            app_context=app_context,
+            outline="\n".join(f"{number}. {item['title']}" for number, item in enumerate(outline, 1)),
+            index=index + 1,
+            title=section["title"],
+            guidance=section["guidance"],
+            checkpoints="、".join(self._checkpoint_titles[item] for item in section["checkpoints"])
+        )
+
+    def _template_message(self, app_context: str, section: Dict[str, Any], polish: bool) -> Optional[str]:
+        """模板章节需要模型处理时返回请求消息，无缺口且不润色时返回None"""
+        if section["gaps"]:
+            return TEMPLATE_FILL_PROMPT.format(
+                app_context=app_context,
+                content=section["content"],
+                gaps="\n".join(f"- {gap}" for gap in section["gaps"])
+            )
+        if polish:
+            return TEMPLATE_POLISH_PROMPT.format(app_context=app_context, content=section["content"])
+        return None
+
+    async def generate(self, app_info: Dict[str, Any],
+                       section_ids: Optional[List[str]] = None,
+                       tools: Optional[List] = None,
+                       memory_files: Optional[List[str]] = None,
+                       use_template: bool = False,
+                       polish: bool = False,
+                       slots: Optional[Dict[str, str]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        分章节并行生成隐私政策
+        Args:
+            app_info: 应用信息（app_name、app_type、data_types、regions、requirements）
+            section_ids: 仅生成指定章节
+            tools: 工具列表
+            memory_files: 内存文件列表
+            use_template: 先由本地条款库组装基线，只对条款库无法覆盖的章节调用模型
+            polish: 模板模式下对所有章节调用模型润色
+            slots: 模板槽位取值（如 operator、contact_email）
+        Returns:
+            事件的异步迭代器：outline为大纲，section为按顺序产出的已完成章节，done为拼接后的完整政策
+        """
+        start = time.perf_counter()
+        outline = self.plan_outline(section_ids)
+        baseline = self.template_engine.assemble(app_info, outline, slots) if use_template else None
+        outline_event = {"type": "outline", "sections": [{"id": item["id"], "title": item["title"]} for item in outline]}
+        if baseline is not None:
+            outline_event.update({key: baseline[key] for key in
+                                  ("placeholders", "unknown_data_types", "unknown_regions", "elapsed_ms")})
+        yield outline_event
+
+        agent = await self.factory.build_agent(self.AGENT_TYPE, tools, memory_files)
+        system_message = self.factory._get_system_message(agent)
+        app_context = await self.factory.attach_memory(self.AGENT_TYPE, self.build_app_context(app_info), memory_files)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def generate_section(index: int) -> Dict[str, Any]:
+            section = {"index": index, "id": outline[index]["id"], "title": outline[index]["title"]}
+            if baseline is not None:
+                message = self._template_message(app_context, baseline["sections"][index], polish)
+                if message is None:
+                    return {**section, "content": baseline["sections"][index]["content"], "source": "template", "elapsed": 0.0}
+                source = "template+llm"
+            else:
+                message = self._section_message(app_context, outline, index)
+                source = "llm"
+            params = self.factory.select_generation_params(self.AGENT_TYPE, message)
+            params["max_tokens"] = min(params["max_tokens"], self.section_max_tokens)
+            async with semaphore:
+                section_start = time.perf_counter()
+                content = await self.factory.upstream_client.complete(
+                    system_message, message, agent_type=self.AGENT_TYPE, **params
+                )
+            return {
+                **section,
+                "content": content.strip(),
+                "source": source,
+                "elapsed": round(time.perf_counter() - section_start, 3)
+            }
+
+        tasks = [asyncio.create_task(generate_section(index)) for index in range(len(outline))]
+        completed: Dict[int, Dict[str, Any]] = {}
+        next_index = 0
+        try:
+            for future in asyncio.as_completed(tasks):
+                section = await future
+                completed[section["index"]] = section
+                # 按大纲顺序产出，前面的章节全部完成后立即返回
+                while next_index in completed:
+                    yield {"type": "section", **completed[next_index]}
+                    next_index += 1
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        policy = "\n\n".join(completed[index]["content"] for index in range(len(outline)))
+        llm_sections = sum(1 for section in completed.values() if section["source"] != "template")
+        elapsed = round(time.perf_counter() - start, 3)
+        logger.info(f"分章节生成完成: {len(outline)} 个章节（调用模型 {llm_sections} 个）, 耗时 {elapsed}s")
+        yield {"type": "done", "policy": policy, "elapsed": elapsed, "llm_sections": llm_sections}
@@ -3,9 +3,14 @@ API数据模型
 定义请求和响应的数据结构
 """
 
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Union
 from pydantic import BaseModel, Field
 
+try:
+    from src.core.structured import ComplianceReport, ReadabilityReport
+except ImportError:
+    from ..core.structured import ComplianceReport, ReadabilityReport
+
 
 class ChatRequest(BaseModel):
     """聊天请求模型"""
@@ -28,6 +33,30 @@ class ChatResponse(BaseModel):
     message: str = Field(..., description="状态消息")
     error: Optional[str] = Field(None, description="错误信息")
     selected_agent: Optional[str] = Field(None, description="自动选择的Agent")
+    intent_confidence: Optional[float] = Field(None, description="意图分类置信度")
+    routing_method: Optional[str] = Field(None, description="路由方式（classifier/llm）")
+    near_duplicate: Optional[Dict[str, Any]] = Field(None, description="最相似的历史检测文档（指纹ID、相似度）")
+    reused: bool = Field(False, description="是否复用了近似重复文档的检测结果")
+
+
+class StructuredChatRequest(BaseModel):
+    """结构化检测请求模型"""
+    agent_type: str = Field(..., description="检测Agent类型（compliance_checker/readability_checker）")
+    message: str = Field(..., description="待检测的隐私政策内容")
+    stream: bool = Field(False, description="是否以NDJSON流式返回逐项结果")
+    context: Optional[Dict[str, Any]] = Field(None, description="上下文信息")
+
+
+class StructuredChatResponse(BaseModel):
+    """结构化检测响应模型"""
+    success: bool = Field(..., description="是否成功")
+    agent_type: str = Field(..., description="处理的Agent类型")
+    report: Optional[Union[ComplianceReport, ReadabilityReport]] = Field(None, description="结构化检测报告")
+    message: str = Field(..., description="状态消息")
+    error: Optional[str] = Field(None, description="错误信息")
+    near_duplicate: Optional[Dict[str, Any]] = Field(None, description="最相似的历史检测文档（指纹ID、相似度）")
+    reused: bool = Field(False, description="是否复用了近似重复文档的检测报告")
+    clause_stats: Optional[Dict[str, Any]] = Field(None, description="条款级检测统计（条款数、缓存命中数、上游请求数）")
 
 
 class AgentInfo(BaseModel):
@@ -57,13 +86,59 @@ class PrivacyPolicyGenerateRequest(BaseModel):
     data_types: List[str] = Field(..., description="收集的数据类型")
     regions: List[str] = Field(default=["中国"], description="目标地区")
     requirements: Optional[str] = Field(None, description="特殊要求")
+    sections: Optional[List[str]] = Field(None, description="仅生成指定章节（章节id），默认全部")
+    parallel: bool = Field(True, description="是否分章节并行生成")
+    template: bool = Field(False, description="是否先由本地条款库组装基线，只对缺口调用模型")
+    polish: bool = Field(False, description="模板模式下是否对所有章节调用模型润色")
+    slots: Optional[Dict[str, str]] = Field(None, description="模板槽位取值（operator、address、contact_email、contact_phone、sdk_list等）")
+    stream: bool = Field(False, description="是否以NDJSON流式返回已完成的章节")
+    context: Optional[Dict[str, Any]] = Field(None, description="上下文信息（tools、memory_files）")
+
+
+class PrivacyPolicyGenerateResponse(BaseModel):
+    """隐私政策生成响应模型"""
+    success: bool = Field(..., description="是否成功")
+    policy: Optional[str] = Field(None, description="生成的隐私政策")
+    sections: List[Dict[str, Any]] = Field(default_factory=list, description="各章节内容及耗时")
+    elapsed: Optional[float] = Field(None, description="总耗时（秒）")
+    llm_sections: Optional[int] = Field(None, description="调用模型生成或补全的章节数")
+    placeholders: List[str] = Field(default_factory=list, description="模板中待人工填写的槽位")
+    message: str = Field(..., description="状态消息")
+    error: Optional[str] = Field(None, description="错误信息")
 
 
 class ComplianceCheckRequest(BaseModel):
     """合规性检测请求模型"""
     privacy_policy: str = Field(..., description="隐私政策内容")
-    target_regions: Optional[List[str]] = Field(None, description="目标地区")
-    check_points: Optional[List[str]] = Field(None, description="检测要点")
+    target_regions: Optional[List[str]] = Field(None, description="目标地区（名称或别名，如 中国、GDPR、加州），默认中国")
+    check_points: Optional[List[str]] = Field(None, description="检测主题（id或名称，如 cross_border、用户权利），默认全部")
+    parallel: bool = Field(True, description="是否并发检测各地区")
+    stream: bool = Field(False, description="是否以NDJSON流式返回已完成的地区报告")
+    context: Optional[Dict[str, Any]] = Field(None, description="上下文信息（tools、memory_files、document_id）")
+
+
+class RegionComplianceResult(BaseModel):
+    """单个地区的合规检测结果"""
+    region: str = Field(..., description="地区")
+    laws: str = Field(..., description="适用的法规")
+    report: Optional[ComplianceReport] = Field(None, description="该地区的检测报告，检测失败时为空")
+    errors: List[str] = Field(default_factory=list, description="解析或请求错误")
+    elapsed: float = Field(..., description="该地区检测耗时（秒）")
+
+
+class RegionalComplianceResponse(BaseModel):
+    """多地区合规检测响应模型"""
+    success: bool = Field(..., description="是否成功")
+    regions: List[str] = Field(default_factory=list, description="已检测的地区")
+    unknown_regions: List[str] = Field(default_factory=list, description="没有规则包的地区")
+    not_applicable_regions: List[str] = Field(default_factory=list, description="规则包不含所选检测主题的地区")
+    results: List[RegionComplianceResult] = Field(default_factory=list, description="按请求顺序排列的地区结果")
+    matrix: List[Dict[str, Any]] = Field(default_factory=list, description="检测主题×地区矩阵")
+    failed_regions: List[str] = Field(default_factory=list, description="检测失败的地区")
+    elapsed: Optional[float] = Field(None, description="总耗时（秒）")
+    slowest_region_elapsed: Optional[float] = Field(None, description="最慢地区的耗时（秒）")
+    message: str = Field(..., description="状态消息")
+    error: Optional[str] = Field(None, description="错误信息")
 
 
 class ReadabilityCheckRequest(BaseModel):
@@ -73,6 +148,127 @@ class ReadabilityCheckRequest(BaseModel):
     check_dimensions: Optional[List[str]] = Field(None, description="检测维度")
 
 
+class PipelineRequest(BaseModel):
+    """生成→检测→修订流水线请求模型"""
+    message: str = Field(..., description="隐私政策生成需求")
+    revise: bool = Field(True, description="是否根据检测意见进行一轮修订")
+    include_reports: bool = Field(False, description="最终结果中是否附带检测报告")
+    context: Optional[Dict[str, Any]] = Field(None, description="上下文信息")
+
+
+class PipelineRunResponse(BaseModel):
+    """流水线运行结果响应模型"""
+    run_id: str = Field(..., description="流水线运行ID")
+    status: str = Field(..., description="运行状态：running/completed/failed/cancelled")
+    policy: Optional[str] = Field(None, description="最终隐私政策")
+    reports: Dict[str, Optional[str]] = Field(default_factory=dict, description="各检测Agent的报告")
+    error: Optional[str] = Field(None, description="运行失败的原因")
+
+
+class UsageResponse(BaseModel):
+    """token用量响应模型"""
+    date: str = Field(..., description="统计日期")
+    by_client: Dict[str, Dict[str, Any]] = Field(..., description="按调用方汇总的用量")
+    by_agent: Dict[str, Dict[str, int]] = Field(..., description="按Agent类型汇总的用量")
+    recent: List[Dict[str, Any]] = Field(default_factory=list, description="最近的请求用量明细")
+    cancelled: Dict[str, Dict[str, int]] = Field(default_factory=dict, description="按Agent类型统计的已取消调用及节省的token")
+
+
+class DocumentResponse(BaseModel):
+    """上传文档响应模型"""
+    document_id: str = Field(..., description="文档ID，可在对话上下文中以 document_id 引用")
+    filename: Optional[str] = Field(None, description="原始文件名")
+    format: str = Field(..., description="文档格式（txt/html/docx/pdf）")
+    size: int = Field(..., description="文件大小（字节）")
+    chars: int = Field(..., description="提取文本的字符数")
+    created_at: float = Field(..., description="首次上传时间戳")
+    deduplicated: bool = Field(False, description="内容是否已存在（未重复解析）")
+    text: Optional[str] = Field(None, description="提取的文本")
+
+
+class FingerprintMatchRequest(BaseModel):
+    """近似重复查询请求模型"""
+    text: Optional[str] = Field(None, description="隐私政策文本")
+    document_id: Optional[str] = Field(None, description="已上传文档ID（与text二选一）")
+    agent_type: Optional[str] = Field(None, description="仅返回包含该Agent检测结果的文档")
+    top_k: int = Field(5, ge=1, le=50, description="返回数量")
+    threshold: Optional[float] = Field(None, ge=0, le=1, description="相似度阈值，默认使用配置值")
+    include_results: bool = Field(True, description="是否返回历史检测结果")
+    include_diff: bool = Field(False, description="是否返回与最相似文档的差异")
+
+
+class FingerprintMatch(BaseModel):
+    """近似重复匹配项"""
+    fingerprint_id: str = Field(..., description="历史文档指纹ID")
+    similarity: float = Field(..., description="估计的Jaccard相似度")
+    exact: bool = Field(..., description="规范化后内容是否完全相同")
+    results: Optional[Dict[str, Any]] = Field(None, description="历史检测结果（按Agent类型）")
+    diff: Optional[str] = Field(None, description="与当前文档的差异（unified diff）")
+
+
+class FingerprintMatchResponse(BaseModel):
+    """近似重复查询响应模型"""
+    fingerprint_id: str = Field(..., description="当前文档指纹ID")
+    matches: List[FingerprintMatch] = Field(default_factory=list, description="按相似度降序的匹配列表")
+    query_ms: float = Field(..., description="索引查询耗时（毫秒，不含指纹计算）")
+
+
+class CitationArticle(BaseModel):
+    """法规条文"""
+    key: str = Field(..., description="条文键，如 G17、Z1.9")
+    source: str = Field(..., description="法规名称")
+    kind: str = Field(..., description="原文或要点")
+    title: str = Field(..., description="条文标题")
+    text: str = Field(..., description="条文内容")
+    note: Optional[str] = Field(None, description="引用的款/项")
+    score: Optional[float] = Field(None, description="检索得分")
+    snippet: Optional[str] = Field(None, description="命中片段")
+
+
+class CitationExpansion(BaseModel):
+    """单个法规编号的展开结果"""
+    code: str = Field(..., description="法规编号")
+    articles: List[CitationArticle] = Field(default_factory=list, description="对应条文")
+    unresolved: List[str] = Field(default_factory=list, description="条文库中未收录的条文键")
+
+
+class CitationExpandRequest(BaseModel):
+    """法规编号展开请求模型"""
+    codes: Optional[List[str]] = Field(None, description="法规编号列表，如 [\"G17\", \"Z1-5/7\"]")
+    text: Optional[str] = Field(None, description="包含法规编号的文本（如检测报告），自动提取其中的编号")
+
+
+class CitationExpandResponse(BaseModel):
+    """法规编号展开响应模型"""
+    citations: List[CitationExpansion] = Field(default_factory=list, description="按编号顺序的展开结果")
+
+
+class CitationSearchResponse(BaseModel):
+    """条文检索响应模型"""
+    query: str = Field(..., description="检索词")
+    results: List[CitationArticle] = Field(default_factory=list, description="按得分降序的条文")
+    elapsed_ms: float = Field(..., description="检索耗时（毫秒）")
+
+
+class ProfileArmRequest(BaseModel):
+    """预约请求剖析"""
+    path: str = Field("/api/v1/chat", description="剖析路径以此为前缀的请求")
+    count: int = Field(1, ge=1, le=20, description="剖析的请求数")
+    mode: Optional[str] = Field(None, description="sample（采样，输出折叠栈）或 cprofile（确定性剖析）")
+
+
+class VectorIngestRequest(BaseModel):
+    """向量数据写入请求"""
+    items: List[Dict[str, Any]] = Field(..., min_length=1, description="要写入向量库的数据，原样发送到向量库写入接口")
+    wait: bool = Field(True, description="写入队列已满时是否等待空间，否则立即返回429")
+
+
+class VectorIngestResponse(BaseModel):
+    """向量数据写入响应"""
+    ids: List[str] = Field(default_factory=list, description="写入队列的条目ID")
+    pending: int = Field(..., description="队列中待发送的条目数")
+
+
 class HealthResponse(BaseModel):
     """健康检查响应模型"""
     status: str = Field(..., description="服务状态")
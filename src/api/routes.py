@@ -3,14 +3,30 @@ API路由
 定义所有的API端点
 """
 
+import asyncio
+import json
+import os
+import time
 from datetime import datetime
 
-from fastapi import APIRouter, HTTPException, Depends
+from typing import Any, AsyncIterator, Awaitable, Optional
+
+from fastapi import APIRouter, HTTPException, Depends, Header, Request
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.datastructures import UploadFile
 from loguru import logger
 
 from .models import (
-    ChatRequest, ChatResponse,
-    AgentListResponse, HealthResponse
+    ChatRequest, ChatResponse, AutoChatRequest,
+    AgentListResponse, HealthResponse,
+    PipelineRequest, PipelineRunResponse,
+    StructuredChatRequest, StructuredChatResponse,
+    UsageResponse, DocumentResponse,
+    FingerprintMatchRequest, FingerprintMatchResponse,
+    CitationExpansion, CitationExpandRequest, CitationExpandResponse, CitationSearchResponse,
+    ComplianceCheckRequest, RegionalComplianceResponse,
+    ProfileArmRequest, VectorIngestRequest, VectorIngestResponse,
+    PrivacyPolicyGenerateRequest, PrivacyPolicyGenerateResponse
 )
 
 # 修改这些导入
@@ -32,9 +48,70 @@ try:
     from src.agents import AgentManager
 except ImportError:
     from ..agents import AgentManager
+try:
+    from src.agents.pipeline import PolicyPipeline
+    from src.agents.section_generator import SectionedPolicyGenerator
+    from src.agents.regional_checker import RegionalComplianceChecker
+except ImportError:
+    from ..agents.pipeline import PolicyPipeline
+    from ..agents.section_generator import SectionedPolicyGenerator
+    from ..agents.regional_checker import RegionalComplianceChecker
+
+try:
+    from src.core.accounting import BudgetExceededError, TokenAccountant, get_token_accountant
+    from src.core.documents import (
+        DocumentNotFoundError, DocumentParseError, DocumentStore, DocumentTooLargeError,
+        UnsupportedDocumentError, get_document_store
+    )
+    from src.core.citations import CitationIndex, extract_codes, get_citation_index
+    from src.core.clauses import ClauseStore, get_clause_store
+    from src.core.fingerprint import FingerprintIndex, get_fingerprint_index
+    from src.core.request_context import context_from_headers, set_request_context
+    from src.core.memory import MemoryStore, get_memory_store
+    from src.core.scheduling import AdmissionController, AdmissionRejectedError, get_admission_controller
+    from src.core.tools import ToolRegistry, get_tool_registry
+    from src.core.models.upstream import UpstreamClient, get_upstream_client
+    from src.core.telemetry import trace_stage
+    from src.core.profiling import RequestProfiler, get_request_profiler
+    from src.core.ingestion import IngestionBackpressureError, VectorStoreQueue, get_vector_store_queue
+    from src.core.audits import AuditStore, get_audit_store
+except ImportError:
+    from ..core.accounting import BudgetExceededError, TokenAccountant, get_token_accountant
+    from ..core.documents import (
+        DocumentNotFoundError, DocumentParseError, DocumentStore, DocumentTooLargeError,
+        UnsupportedDocumentError, get_document_store
+    )
+    from ..core.citations import CitationIndex, extract_codes, get_citation_index
+    from ..core.clauses import ClauseStore, get_clause_store
+    from ..core.fingerprint import FingerprintIndex, get_fingerprint_index
+    from ..core.request_context import context_from_headers, set_request_context
+    from ..core.memory import MemoryStore, get_memory_store
+    from ..core.scheduling import AdmissionController, AdmissionRejectedError, get_admission_controller
+    from ..core.tools import ToolRegistry, get_tool_registry
+    from ..core.models.upstream import UpstreamClient, get_upstream_client
+    from ..core.telemetry import trace_stage
+    from ..core.profiling import RequestProfiler, get_request_profiler
+    from ..core.ingestion import IngestionBackpressureError, VectorStoreQueue, get_vector_store_queue
+    from ..core.audits import AuditStore, get_audit_store
+
+try:
+    from src.utils.utils import get_config
+except ImportError:
+    from ppgllm.src.utils import get_config
+
+# 非流式请求的硬性截止时间及客户端断开检测间隔
+_system_config = get_config().get("system", {})
+REQUEST_TIMEOUT = _system_config.get("timeout", 300)
+DISCONNECT_POLL_INTERVAL = _system_config.get("disconnect_poll_interval", 0.5)
+
+
+async def bind_request_context(request: Request):
+    """根据请求头绑定请求上下文（调用方、请求ID）"""
+    set_request_context(context_from_headers(request.headers))
+
 
 # 创建路由器
-router = APIRouter()
+router = APIRouter(dependencies=[Depends(bind_request_context)])
 
 # 全局Agent工厂实例
 agent_factory = None
@@ -42,6 +119,15 @@ agent_factory = None
 # 全局Agent管理器实例
 agent_manager = None
 
+# 全局流水线实例
+policy_pipeline = None
+
+# 全局分章节生成器实例
+section_generator = None
+
+# 全局多地区合规检测器实例
+regional_checker = None
+
 def get_agent_factory() -> AgentFactory:
     """获取Agent工厂实例"""
     global agent_factory
@@ -53,9 +139,95 @@ def get_agent_manager() -> AgentManager:
     """获取Agent管理器实例"""
     global agent_manager
     if agent_manager is None:
-        agent_manager = AgentManager()
+        agent_manager = AgentManager(get_agent_factory())
     return agent_manager
 
+def get_policy_pipeline() -> PolicyPipeline:
+    """获取流水线实例"""
+    global policy_pipeline
+    if policy_pipeline is None:
+        policy_pipeline = PolicyPipeline(get_agent_factory())
+    return policy_pipeline
+
+def get_section_generator() -> SectionedPolicyGenerator:
+    """获取分章节生成器实例"""
+    global section_generator
+    if section_generator is None:
+        section_generator = SectionedPolicyGenerator(get_agent_factory())
+    return section_generator
+
+def get_regional_checker() -> RegionalComplianceChecker:
+    """获取多地区合规检测器实例"""
+    global regional_checker
+    if regional_checker is None:
+        regional_checker = RegionalComplianceChecker(get_agent_factory())
+    return regional_checker
+
+def get_check_points(context: Optional[dict]) -> Optional[list]:
+    """从上下文中读取检测范围（检测要点或检测维度）"""
+    if not context:
+        return None
+    return context.get("check_points") or context.get("check_dimensions")
+
+def admission_rejected(e: AdmissionRejectedError) -> HTTPException:
+    """上游容量已满时返回503，并通过Retry-After提示客户端重试时间"""
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+async def run_until_disconnect(http_request: Request, awaitable: Awaitable[Any]) -> Any:
+    """
+    执行请求处理，客户端断开或超过截止时间时取消处理并中止上游调用
+    Args:
+        http_request: HTTP请求，用于检测客户端是否断开
+        awaitable: 请求处理协程
+    Returns:
+        处理结果
+    Raises:
+        HTTPException: 客户端断开（499）或超过 system.timeout（504）
+    """
+    task = asyncio.ensure_future(awaitable)
+    deadline = time.monotonic() + REQUEST_TIMEOUT
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_INTERVAL)
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                logger.info(f"客户端已断开，取消请求 {http_request.url.path}")
+                raise HTTPException(status_code=499, detail="客户端已断开")
+            if time.monotonic() >= deadline:
+                logger.warning(f"请求超过 {REQUEST_TIMEOUT} 秒，已取消 {http_request.url.path}")
+                raise HTTPException(status_code=504, detail="请求处理超时")
+    finally:
+        if not task.done():
+            task.cancel()
+            # 等待取消完成，确保上游连接已关闭、用量已记录
+            await asyncio.wait({task})
+
+async def until_deadline(events: AsyncIterator[Any]) -> AsyncIterator[Any]:
+    """
+    为流式响应设置与非流式请求相同的 system.timeout 截止时间，超时时取消处理并中止上游调用
+    Args:
+        events: 事件的异步生成器
+    Returns:
+        原样产出的事件
+    Raises:
+        TimeoutError: 超过截止时间
+    """
+    deadline = asyncio.get_running_loop().time() + REQUEST_TIMEOUT
+    try:
+        while True:
+            try:
+                # 只在等待下一个事件时计时，取消落在事件生成器内部而不是响应发送过程中
+                async with asyncio.timeout_at(deadline):
+                    event = await anext(events)
+            except StopAsyncIteration:
+                return
+            except TimeoutError:
+                raise TimeoutError(f"请求处理超过 {REQUEST_TIMEOUT} 秒，已取消")
+            yield event
+    finally:
+        await events.aclose()
+
 @router.get("/health", response_model=HealthResponse)
 async def health_check():
     """健康检查端点"""
@@ -76,18 +248,545 @@ async def get_agents(factory: AgentFactory = Depends(get_agent_factory)):
         raise HTTPException(status_code=500, detail="获取Agent列表失败")
 
 @router.post("/chat", response_model=ChatResponse)
-async def chat_with_agent(request: ChatRequest, factory: AgentFactory = Depends(get_agent_factory)):
+async def chat_with_agent(request: ChatRequest, http_request: Request,
+                          factory: AgentFactory = Depends(get_agent_factory)):
     """与指定Agent进行对话"""
     try:
-        result = await factory.chat_with_agent(
-            agent_type=request.agent_type,
-            message=request.message,
-            tools=request.context.get("tools") if request.context else None,
-            memory_files=request.context.get("memory_files") if request.context else None
-        )
+        with trace_stage("routes.chat_with_agent", agent_type=request.agent_type) as span:
+            result = await run_until_disconnect(http_request, factory.chat_with_agent(
+                agent_type=request.agent_type,
+                message=request.message,
+                tools=request.context.get("tools") if request.context else None,
+                memory_files=request.context.get("memory_files") if request.context else None,
+                check_points=get_check_points(request.context),
+                document_id=request.context.get("document_id") if request.context else None,
+                reuse_duplicates=bool(request.context.get("reuse_duplicates")) if request.context else False
+            ))
+            span.set_attribute("success", result["success"])
 
         return ChatResponse(**result)
 
+    except BudgetExceededError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except AdmissionRejectedError as e:
+        raise admission_rejected(e)
+    except DocumentNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"对话处理失败: {str(e)}")
         raise HTTPException(status_code=500, detail="对话处理失败")
+
+
+@router.post("/chat/auto", response_model=ChatResponse)
+async def auto_chat(request: AutoChatRequest, http_request: Request,
+                    manager: AgentManager = Depends(get_agent_manager)):
+    """根据意图自动选择Agent进行对话"""
+    try:
+        with trace_stage("routes.auto_chat") as span:
+            result = await run_until_disconnect(http_request, manager.auto_process_request(
+                message=request.message,
+                context=request.context
+            ))
+            span.set_attribute("selected_agent", result.get("selected_agent") or "")
+        return ChatResponse(**result)
+    except BudgetExceededError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except AdmissionRejectedError as e:
+        raise admission_rejected(e)
+    except DocumentNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"自动对话处理失败: {str(e)}")
+        raise HTTPException(status_code=500, detail="对话处理失败")
+
+@router.post("/chat/structured", response_model=StructuredChatResponse)
+async def structured_chat_with_agent(request: StructuredChatRequest, http_request: Request,
+                                     factory: AgentFactory = Depends(get_agent_factory)):
+    """以结构化JSON模式与检测Agent对话，可选NDJSON流式返回逐项结果"""
+    context = request.context or {}
+    tools = context.get("tools")
+    memory_files = context.get("memory_files")
+    check_points = get_check_points(context)
+    document_id = context.get("document_id")
+    reuse_duplicates = bool(context.get("reuse_duplicates"))
+    clause_level = bool(context.get("clause_level"))
+
+    if request.stream:
+        async def event_stream():
+            try:
+                async for event in until_deadline(factory.stream_structured_chat(
+                    agent_type=request.agent_type,
+                    message=request.message,
+                    tools=tools,
+                    memory_files=memory_files,
+                    check_points=check_points,
+                    document_id=document_id,
+                    reuse_duplicates=reuse_duplicates,
+                    clause_level=clause_level
+                )):
+                    yield json.dumps(event, ensure_ascii=False) + "\n"
+            except Exception as e:
+                logger.error(f"结构化检测失败: {str(e)}")
+                yield json.dumps({"type": "error", "error": str(e)}, ensure_ascii=False) + "\n"
+
+        return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
+    try:
+        result = await run_until_disconnect(http_request, factory.structured_chat_with_agent(
+            agent_type=request.agent_type,
+            message=request.message,
+            tools=tools,
+            memory_files=memory_files,
+            check_points=check_points,
+            document_id=document_id,
+            reuse_duplicates=reuse_duplicates,
+            clause_level=clause_level
+        ))
+    except BudgetExceededError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except AdmissionRejectedError as e:
+        raise admission_rejected(e)
+    except DocumentNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return StructuredChatResponse(**result)
+
+@router.post("/pipeline")
+async def run_pipeline(request: PipelineRequest, pipeline: PolicyPipeline = Depends(get_policy_pipeline)):
+    """运行生成→检测→修订流水线，以NDJSON流式返回阶段进度"""
+    context = request.context or {}
+
+    async def event_stream():
+        try:
+            async for event in until_deadline(pipeline.run(
+                message=request.message,
+                revise=request.revise,
+                include_reports=request.include_reports,
+                tools=context.get("tools"),
+                memory_files=context.get("memory_files")
+            )):
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+        except Exception as e:
+            logger.error(f"流水线执行失败: {str(e)}")
+            yield json.dumps({"stage": "pipeline", "status": "failed", "error": str(e)}, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
+@router.get("/pipeline/{run_id}", response_model=PipelineRunResponse)
+async def get_pipeline_run(run_id: str, pipeline: PolicyPipeline = Depends(get_policy_pipeline)):
+    """获取流水线运行结果（含检测报告）"""
+    run = pipeline.get_run(run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="流水线运行记录不存在")
+    return PipelineRunResponse(
+        run_id=run_id,
+        status=run["status"],
+        policy=run.get("policy"),
+        reports=run["reports"],
+        error=run.get("error")
+    )
+
+@router.post("/generate", response_model=PrivacyPolicyGenerateResponse)
+async def generate_privacy_policy(request: PrivacyPolicyGenerateRequest, http_request: Request,
+                                  generator: SectionedPolicyGenerator = Depends(get_section_generator)):
+    """生成隐私政策：按大纲分章节并行生成，可选NDJSON流式按顺序返回已完成的章节"""
+    context = request.context or {}
+    app_info = request.model_dump(include={"app_name", "app_type", "data_types", "regions", "requirements"})
+    tools = context.get("tools")
+    memory_files = context.get("memory_files")
+
+    if not request.parallel:
+        try:
+            outline = generator.plan_outline(request.sections)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        message = (f"{generator.build_app_context(app_info)}\n\n请按以下大纲生成完整的隐私政策：\n"
+                   + "\n".join(f"{index}. {item['title']}" for index, item in enumerate(outline, 1)))
+        try:
+            result = await run_until_disconnect(http_request, generator.factory.chat_with_agent(
+                agent_type=generator.AGENT_TYPE, message=message, tools=tools, memory_files=memory_files
+            ))
+        except BudgetExceededError as e:
+            raise HTTPException(status_code=429, detail=str(e))
+        except AdmissionRejectedError as e:
+            raise admission_rejected(e)
+        return PrivacyPolicyGenerateResponse(
+            success=result["success"],
+            policy=result.get("response"),
+            message=result["message"],
+            error=result.get("error")
+        )
+
+    try:
+        generator.plan_outline(request.sections)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    events = generator.generate(app_info, request.sections, tools, memory_files,
+                                use_template=request.template, polish=request.polish, slots=request.slots)
+
+    if request.stream:
+        async def event_stream():
+            try:
+                async for event in until_deadline(events):
+                    yield json.dumps(event, ensure_ascii=False) + "\n"
+            except Exception as e:
+                logger.error(f"分章节生成失败: {str(e)}")
+                yield json.dumps({"type": "error", "error": str(e)}, ensure_ascii=False) + "\n"
+
+        return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
+    sections = []
+    placeholders = []
+    try:
+        async for event in until_deadline(events):
+            if event["type"] == "outline":
+                placeholders = event.get("placeholders", [])
+            elif event["type"] == "section":
+                sections.append(event)
+            elif event["type"] == "done":
+                return PrivacyPolicyGenerateResponse(
+                    success=True,
+                    policy=event["policy"],
+                    sections=sections,
+                    elapsed=event["elapsed"],
+                    llm_sections=event["llm_sections"],
+                    placeholders=placeholders,
+                    message="隐私政策生成完成"
+                )
+    except BudgetExceededError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except AdmissionRejectedError as e:
+        raise admission_rejected(e)
+    except TimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        logger.error(f"分章节生成失败: {str(e)}")
+        return PrivacyPolicyGenerateResponse(success=False, sections=sections, message="隐私政策生成失败", error=str(e))
+
+@router.post("/check/compliance", response_model=RegionalComplianceResponse)
+async def check_compliance(request: ComplianceCheckRequest,
+                           checker: RegionalComplianceChecker = Depends(get_regional_checker)):
+    """多地区合规检测：各目标地区只带该地区规则包并发检测，结果合并为 检测主题×地区 矩阵"""
+    context = request.context or {}
+    try:
+        checker.plan(request.target_regions, request.check_points)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    events = checker.check(request.privacy_policy, request.target_regions, request.check_points,
+                           tools=context.get("tools"), memory_files=context.get("memory_files"),
+                           document_id=context.get("document_id"), parallel=request.parallel)
+
+    if request.stream:
+        async def event_stream():
+            try:
+                async for event in until_deadline(events):
+                    yield json.dumps(event, ensure_ascii=False) + "\n"
+            except Exception as e:
+                logger.error(f"多地区合规检测失败: {str(e)}")
+                yield json.dumps({"type": "error", "error": str(e)}, ensure_ascii=False) + "\n"
+
+        return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
+    results = {}
+    try:
+        async for event in until_deadline(events):
+            if event["type"] == "region":
+                results[event["region"]] = event
+            elif event["type"] == "done":
+                return RegionalComplianceResponse(
+                    success=not event["failed_regions"],
+                    regions=event["regions"],
+                    unknown_regions=event["unknown_regions"],
+                    not_applicable_regions=event["not_applicable_regions"],
+                    results=[results[region] for region in event["regions"]],
+                    matrix=event["matrix"],
+                    failed_regions=event["failed_regions"],
+                    elapsed=event["elapsed"],
+                    slowest_region_elapsed=event["slowest_region_elapsed"],
+                    message="多地区合规检测完成"
+                )
+    except BudgetExceededError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except AdmissionRejectedError as e:
+        raise admission_rejected(e)
+    except DocumentNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except TimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        logger.error(f"多地区合规检测失败: {str(e)}")
+        return RegionalComplianceResponse(success=False, results=list(results.values()),
+                                          message="多地区合规检测失败", error=str(e))
+
+# multipart 请求体中文件内容之外的余量（分隔符和字段头）
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+async def read_upload_form(request: Request, store: DocumentStore):
+    """
+    在大小上限内解析上传表单：Content-Length 超限时直接拒绝，不接收请求体；
+    未声明长度（分块传输）时边接收边计数，超过上限立即中止，避免完整缓冲超大请求体
+    Raises:
+        DocumentTooLargeError: 请求体超出大小上限
+    """
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit():
+        store.check_size(int(content_length), MULTIPART_OVERHEAD)
+    received = 0
+
+    async def receive():
+        nonlocal received
+        message = await request.receive()
+        if message["type"] == "http.request":
+            received += len(message.get("body", b""))
+            store.check_size(received, MULTIPART_OVERHEAD)
+        return message
+
+    return await Request(request.scope, receive).form(max_files=1)
+
+
+@router.post("/documents", response_model=DocumentResponse, openapi_extra={
+    "requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+        "type": "object", "required": ["file"],
+        "properties": {"file": {"type": "string", "format": "binary"}}
+    }}}}
+})
+async def upload_document(request: Request, store: DocumentStore = Depends(get_document_store)):
+    """上传隐私政策文档（PDF/HTML/DOCX/TXT），流式落盘并提取文本，返回可在对话中引用的文档ID"""
+    file = None
+    try:
+        form = await read_upload_form(request, store)
+        file = form.get("file")
+        if not isinstance(file, UploadFile):
+            raise HTTPException(status_code=422, detail="缺少上传文件字段 file")
+        metadata = await store.save_upload(file, filename=file.filename, content_type=file.content_type)
+        return DocumentResponse(**metadata)
+    except HTTPException:
+        raise
+    except UnsupportedDocumentError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except DocumentTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except DocumentParseError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logger.error(f"文档上传失败: {str(e)}")
+        raise HTTPException(status_code=500, detail="文档上传失败")
+    finally:
+        if file is not None:
+            await file.close()
+
+@router.get("/documents/{document_id}", response_model=DocumentResponse)
+async def get_document(document_id: str, include_text: bool = False,
+                       store: DocumentStore = Depends(get_document_store)):
+    """获取已上传文档的元数据，可选返回提取的文本"""
+    try:
+        metadata = await store.get_metadata(document_id)
+        text = await store.get_text(document_id) if include_text else None
+    except DocumentNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return DocumentResponse(text=text, **metadata)
+
+@router.post("/fingerprints/match", response_model=FingerprintMatchResponse)
+async def match_fingerprint(request: FingerprintMatchRequest,
+                            index: FingerprintIndex = Depends(get_fingerprint_index),
+                            store: DocumentStore = Depends(get_document_store)):
+    """查找与给定隐私政策近似重复的历史检测文档，可返回其检测结果及差异"""
+    try:
+        text = await store.get_text(request.document_id) if request.document_id else request.text
+    except DocumentNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    if not text:
+        raise HTTPException(status_code=400, detail="需要提供 text 或 document_id")
+
+    fingerprint = await index.fingerprint_async(text)
+    start = time.perf_counter()
+    matches = index.query(fingerprint, request.agent_type, request.top_k, request.threshold)
+    query_ms = (time.perf_counter() - start) * 1000
+    for position, match in enumerate(matches):
+        if not request.include_results:
+            match.pop("results")
+        if request.include_diff and position == 0 and not match["exact"]:
+            match["diff"] = await index.diff(match["fingerprint_id"], text)
+    return FingerprintMatchResponse(
+        fingerprint_id=fingerprint.fingerprint_id,
+        matches=matches,
+        query_ms=round(query_ms, 4)
+    )
+
+@router.get("/fingerprints/stats")
+async def get_fingerprint_stats(index: FingerprintIndex = Depends(get_fingerprint_index)):
+    """获取近似重复索引统计（文档数、命中次数、复用次数、平均查询耗时）"""
+    return index.get_stats()
+
+@router.get("/clauses/stats")
+async def get_clause_stats(store: ClauseStore = Depends(get_clause_store)):
+    """获取条款级缓存统计（缓存条款数、按Agent类型的命中率）"""
+    return store.get_stats()
+
+@router.get("/citations/search", response_model=CitationSearchResponse)
+async def search_citations(q: str, limit: int = 10, index: CitationIndex = Depends(get_citation_index)):
+    """在本地法规条文库中全文检索（查询中的法规编号优先命中）"""
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="检索词不能为空")
+    return index.search(q, max(1, min(limit, 50)))
+
+@router.post("/citations/expand", response_model=CitationExpandResponse)
+async def expand_citations(request: CitationExpandRequest, index: CitationIndex = Depends(get_citation_index)):
+    """批量展开法规编号为条文原文，可直接传入检测报告文本，无需调用模型"""
+    codes = list(request.codes or []) + extract_codes(request.text or "")
+    if not codes:
+        raise HTTPException(status_code=400, detail="需要提供 codes 或包含法规编号的 text")
+    return CitationExpandResponse(citations=index.expand(codes))
+
+@router.get("/citations/{code}", response_model=CitationExpansion)
+async def get_citation(code: str, index: CitationIndex = Depends(get_citation_index)):
+    """展开单个法规编号（支持 G7/17-2、G44-50 等复合写法）"""
+    expansion = index.lookup(code)
+    if not expansion["articles"]:
+        raise HTTPException(status_code=404, detail=f"未收录的法规编号: {code}")
+    return expansion
+
+@router.get("/tools")
+async def get_tools(registry: ToolRegistry = Depends(get_tool_registry)):
+    """获取已注册的本地工具及调用统计（调用次数、缓存命中、平均/最大延迟）"""
+    return {"tools": registry.list_tools(), "stats": registry.get_stats()}
+
+@router.get("/memory/stats")
+async def get_memory_stats(store: MemoryStore = Depends(get_memory_store)):
+    """获取记忆缓存与注入统计（文件加载/缓存命中次数、注入条目数和token数）"""
+    return store.get_stats()
+
+@router.get("/admission/stats")
+async def get_admission_stats(controller: AdmissionController = Depends(get_admission_controller)):
+    """获取上游调用准入统计（并发数、队列深度、排队耗时分位数、拒绝次数）"""
+    return controller.get_stats()
+
+def check_profiler_access(profiler: RequestProfiler, admin_token: Optional[str]):
+    """剖析接口需要启用剖析，配置了管理令牌时还需校验 X-Admin-Token"""
+    if not profiler.enabled:
+        raise HTTPException(status_code=404, detail="请求剖析未启用")
+    if not profiler.check_token(admin_token):
+        raise HTTPException(status_code=403, detail="管理令牌无效")
+
+@router.post("/profiling/arm")
+async def arm_profiling(request: ProfileArmRequest,
+                        admin_token: Optional[str] = Header(None, alias="X-Admin-Token"),
+                        profiler: RequestProfiler = Depends(get_request_profiler)):
+    """预约剖析接下来匹配路径前缀的请求"""
+    check_profiler_access(profiler, admin_token)
+    try:
+        return profiler.arm(request.path, request.count, request.mode)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/profiling/profiles")
+async def list_profiles(admin_token: Optional[str] = Header(None, alias="X-Admin-Token"),
+                        profiler: RequestProfiler = Depends(get_request_profiler)):
+    """列出已保存的剖析结果（耗时、样本数、事件循环阻塞统计）"""
+    check_profiler_access(profiler, admin_token)
+    return await asyncio.to_thread(profiler.get_stats, include_items=True)
+
+@router.get("/profiling/profiles/{profile_id}")
+async def download_profile(profile_id: str, kind: str = "folded",
+                           admin_token: Optional[str] = Header(None, alias="X-Admin-Token"),
+                           profiler: RequestProfiler = Depends(get_request_profiler)):
+    """下载剖析结果：folded/blocked 为火焰图折叠栈，prof 为cProfile结果，json 为摘要"""
+    check_profiler_access(profiler, admin_token)
+    path = await asyncio.to_thread(profiler.get_file, profile_id, kind)
+    if path is None or not await asyncio.to_thread(os.path.exists, path):
+        raise HTTPException(status_code=404, detail="剖析结果不存在")
+    return FileResponse(path, filename=os.path.basename(path))
+
+@router.get("/upstream/stats")
+async def get_upstream_stats(client: UpstreamClient = Depends(get_upstream_client)):
+    """获取上游对冲请求统计（对冲比例、备用请求胜出次数、各Agent类型首token延迟及对冲阈值）及流量录制/回放统计"""
+    return {**client.hedging.get_stats(), "cassette": client.get_cassette_stats()}
+
+@router.post("/ingestion/vectors", response_model=VectorIngestResponse, status_code=202)
+async def ingest_vectors(request: VectorIngestRequest, queue: VectorStoreQueue = Depends(get_vector_store_queue)):
+    """写入向量数据：持久化到本地队列后立即返回，由后台任务批量发送到向量库"""
+    ids = []
+    try:
+        for item in request.items:
+            ids.append(await queue.enqueue(item, wait=request.wait))
+    except IngestionBackpressureError as e:
+        # 已入队的条目不回滚，客户端只需重试未入队的部分
+        raise HTTPException(status_code=429, detail={"message": str(e), "accepted": ids}, headers={"Retry-After": "1"})
+    return VectorIngestResponse(ids=ids, pending=queue.get_stats()["pending"])
+
+@router.get("/ingestion/stats")
+async def get_ingestion_stats(queue: VectorStoreQueue = Depends(get_vector_store_queue)):
+    """获取向量库写入队列统计（积压条数、最早未发送数据的等待秒数、发送/重试/死信次数）"""
+    return queue.get_stats()
+
+@router.get("/audits")
+async def list_audits(app_id: Optional[str] = None, agent_type: Optional[str] = None,
+                      region: Optional[str] = None, since: Optional[str] = None, until: Optional[str] = None,
+                      limit: int = 50, store: AuditStore = Depends(get_audit_store)):
+    """按应用、Agent类型、地区和时间范围（ISO时间，until不含）查询检测记录，按时间倒序"""
+    start = time.perf_counter()
+    try:
+        items = await store.list_audits(app_id, agent_type, region, since, until, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": items, "query_ms": round((time.perf_counter() - start) * 1000, 3)}
+
+@router.get("/audits/stats/items")
+async def get_audit_item_stats(agent_type: str = "compliance_checker", region: Optional[str] = None,
+                               since: Optional[str] = None, until: Optional[str] = None, latest: bool = True,
+                               store: AuditStore = Depends(get_audit_store)):
+    """
+    按检测要点/维度统计结论：latest 时统计每个应用（X-App-ID）在各地区每个要点的最新结论，
+    否则统计按天（since含、until不含）范围内的全部检测
+    """
+    start = time.perf_counter()
+    try:
+        items = await store.item_stats(agent_type, region, since, until, latest)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"agent_type": agent_type, "region": region, "latest": latest, "items": items,
+            "query_ms": round((time.perf_counter() - start) * 1000, 3)}
+
+@router.get("/audits/stats/items/{item_id}/apps")
+async def get_audit_failing_apps(item_id: int, agent_type: str = "compliance_checker", region: Optional[str] = None,
+                                 limit: int = 100, offset: int = 0, store: AuditStore = Depends(get_audit_store)):
+    """列出该检测要点最新结论为未满足的应用"""
+    start = time.perf_counter()
+    result = await store.failing_apps(agent_type, item_id, region, limit, offset)
+    return {"item_id": item_id, **result, "query_ms": round((time.perf_counter() - start) * 1000, 3)}
+
+@router.get("/audits/stats/summary")
+async def get_audit_summary(group_by: str = "day", agent_type: Optional[str] = None, region: Optional[str] = None,
+                            since: Optional[str] = None, until: Optional[str] = None, limit: int = 100,
+                            store: AuditStore = Depends(get_audit_store)):
+    """按天、地区、Agent类型、来源或应用汇总检测次数、平均得分、token用量和耗时"""
+    start = time.perf_counter()
+    try:
+        items = await store.summary(group_by, agent_type, region, since, until, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"group_by": group_by, "items": items, "query_ms": round((time.perf_counter() - start) * 1000, 3)}
+
+@router.get("/audits/store/stats")
+async def get_audit_store_stats(store: AuditStore = Depends(get_audit_store)):
+    """获取检测结果存储统计（记录数、应用数、数据库大小、写入失败次数）"""
+    return await store.get_stats()
+
+@router.get("/audits/{audit_id}")
+async def get_audit(audit_id: str, store: AuditStore = Depends(get_audit_store)):
+    """获取单次检测记录及报告正文"""
+    audit = await store.get_audit(audit_id)
+    if audit is None:
+        raise HTTPException(status_code=404, detail=f"检测记录不存在: {audit_id}")
+    return audit
+
+@router.get("/usage", response_model=UsageResponse)
+async def get_usage(day: Optional[str] = None, limit: int = 50,
+                    accountant: TokenAccountant = Depends(get_token_accountant)):
+    """获取token用量汇总及最近请求明细"""
+    summary = accountant.get_summary(day)
+    return UsageResponse(recent=accountant.get_recent(limit), **summary)
@@ -16,9 +16,9 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # 导入配置获取函数
 try:
-    from src.utils.utils import get_config
+    from src.utils.utils import get_config, close_qwen_clients
 except ImportError:
-    from utils.utils import get_config
+    from utils.utils import get_config, close_qwen_clients
 
 # 获取配置
 config = get_config()
@@ -30,6 +30,20 @@ try:
     from src.api.routes import router
 except ImportError:
     from api.routes import router
+try:
+    from src.core.models.upstream import get_upstream_client
+    from src.core.intent import get_intent_classifier
+    from src.core.telemetry import ServerTimingMiddleware, setup_tracing, shutdown_tracing
+    from src.core.profiling import ProfilingMiddleware, get_request_profiler
+    from src.core.ingestion import get_vector_store_queue
+    from src.core.audits import get_audit_store
+except ImportError:
+    from core.models.upstream import get_upstream_client
+    from core.intent import get_intent_classifier
+    from core.telemetry import ServerTimingMiddleware, setup_tracing, shutdown_tracing
+    from core.profiling import ProfilingMiddleware, get_request_profiler
+    from core.ingestion import get_vector_store_queue
+    from core.audits import get_audit_store
 
 # 创建FastAPI应用
 app = FastAPI(
@@ -47,8 +61,17 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
+# 链路追踪：请求级span及 Server-Timing 响应头
+setup_tracing()
+app.add_middleware(ServerTimingMiddleware)
+
+# 按需请求剖析：未启用时不注册中间件，没有额外开销
+if get_request_profiler().enabled:
+    app.add_middleware(ProfilingMiddleware)
+
 # 注册路由
 app.include_router(router, prefix="/api/v1")
 
@@ -68,6 +91,12 @@ if SYSTEM_CONFIG.get("enable_logging", True):
 async def startup_event():
     """应用启动事件"""
     logger.info("隐私政策智能生成系统启动中...")
+    # 启动时训练意图分类器，避免首个请求承担训练耗时
+    get_intent_classifier()
+    # 向量库写入队列：发送上次关闭时未发送完的数据
+    await get_vector_store_queue().start()
+    # 检测结果存储：汇总表缺失时由明细表重建，避免首个检测请求承担重建耗时
+    get_audit_store()
     logger.info(f"API文档地址: http://localhost:{API_CONFIG['port']}/docs")
     logger.info(f"前端地址: http://localhost:3000")
 
@@ -76,6 +105,11 @@ async def startup_event():
 async def shutdown_event():
     """应用关闭事件"""
     logger.info("隐私政策智能生成系统正在关闭...")
+    await get_vector_store_queue().stop()
+    get_audit_store().close()
+    await get_upstream_client().close()
+    await close_qwen_clients()
+    shutdown_tracing()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,7 @@
+"""
+token用量统计包初始化文件
+"""
+
+from .token_accountant import BudgetExceededError, TokenAccountant, get_token_accountant, track_usage
+
+__all__ = ["BudgetExceededError", "TokenAccountant", "get_token_accountant", "track_usage"]
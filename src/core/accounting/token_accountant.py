@@ -0,0 +1,225 @@
+"""
+token用量统计
+按请求、Agent类型和API调用方记录token用量，并执行每日预算控制
+"""
+
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import date
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import aiofiles
+from loguru import logger
+
+try:
+    from src.utils.utils import get_config, get_log_dir
+except ImportError:
+    from ppgllm.src.utils import get_config, get_log_dir
+
+# 当前协程链路中正在统计用量的范围，由内向外依次累加
+_usage_scopes: ContextVar[Tuple[Dict[str, int], ...]] = ContextVar("usage_scopes", default=())
+
+
+@contextmanager
+def track_usage() -> Iterator[Dict[str, int]]:
+    """
+    统计代码块内（含其中创建的子任务）上游调用的token用量，可嵌套
+    退出时恢复进入前的值而不是reset，在异步生成器中跨yield使用也不会因上下文不同而报错
+    Returns:
+        用量字典 {"prompt_tokens", "completion_tokens", "calls"}，随调用累加
+    """
+    usage = {"prompt_tokens": 0, "completion_tokens": 0, "calls": 0}
+    previous = _usage_scopes.get()
+    _usage_scopes.set(previous + (usage,))
+    try:
+        yield usage
+    finally:
+        _usage_scopes.set(previous)
+
+
+class BudgetExceededError(Exception):
+    """调用方超出每日token预算"""
+
+    def __init__(self, client_id: str, used: int, budget: int):
+        self.client_id = client_id
+        self.used = used
+        self.budget = budget
+        super().__init__(f"调用方 {client_id} 今日token用量 {used} 已超出预算 {budget}")
+
+
+class TokenAccountant:
+    """token用量统计器"""
+
+    def __init__(self, usage_file: Optional[str] = None, flush_interval: Optional[float] = None,
+                 daily_budgets: Optional[Dict[str, int]] = None, recent_size: int = 200):
+        config = get_config().get("accounting", {})
+        self.usage_file = usage_file or config.get("usage_file") or os.path.join(get_log_dir(), "token_usage.json")
+        self.flush_interval = flush_interval if flush_interval is not None else config.get("flush_interval", 30)
+        budgets = daily_budgets if daily_budgets is not None else config.get("daily_budgets", {})
+        self.daily_budgets: Dict[str, int] = dict(budgets or {})
+        # 聚合结构: {日期: {调用方: {Agent类型: {prompt_tokens, completion_tokens, requests, estimated}}}}
+        self._aggregates: Dict[str, Dict[str, Dict[str, Dict[str, int]]]] = {}
+        self._recent: deque = deque(maxlen=recent_size)
+        # 客户端断开或超时被取消的上游调用（仅统计本进程）
+        self._cancelled: Dict[str, Dict[str, int]] = {}
+        self._dirty = False
+        self._last_flush = time.monotonic()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._load()
+
+    def _load(self):
+        """加载已持久化的聚合数据"""
+        if not os.path.exists(self.usage_file):
+            return
+        try:
+            with open(self.usage_file, "r", encoding="utf-8") as f:
+                self._aggregates = json.load(f)
+        except Exception as e:
+            logger.error(f"读取token用量文件失败: {str(e)}")
+
+    def get_budget(self, client_id: str) -> int:
+        """获取调用方每日预算，0表示不限制"""
+        return int(self.daily_budgets.get(client_id, self.daily_budgets.get("default", 0)) or 0)
+
+    def get_daily_usage(self, client_id: str, day: Optional[str] = None) -> int:
+        """获取调用方某日已使用的token总数"""
+        agents = self._aggregates.get(day or date.today().isoformat(), {}).get(client_id, {})
+        return sum(item["prompt_tokens"] + item["completion_tokens"] for item in agents.values())
+
+    def check_budget(self, client_id: str, prompt_tokens: int = 0):
+        """
+        派发请求前检查调用方预算
+        Args:
+            client_id: API调用方
+            prompt_tokens: 本次请求的输入token数
+        Raises:
+            BudgetExceededError: 已用量加本次输入超出每日预算
+        """
+        budget = self.get_budget(client_id)
+        if budget <= 0:
+            return
+        used = self.get_daily_usage(client_id)
+        if used + prompt_tokens > budget:
+            raise BudgetExceededError(client_id, used, budget)
+
+    def record(self, request_id: str, agent_type: str, client_id: str, model: str,
+               prompt_tokens: int, completion_tokens: int, estimated: bool = False):
+        """
+        记录一次上游调用的token用量
+        Args:
+            request_id: 请求ID
+            agent_type: Agent类型
+            client_id: API调用方
+            model: 模型名称
+            prompt_tokens: 输入token数
+            completion_tokens: 输出token数
+            estimated: 是否为tiktoken估算值（上游未返回usage）
+        """
+        day = date.today().isoformat()
+        item = self._aggregates.setdefault(day, {}).setdefault(client_id, {}).setdefault(
+            agent_type, {"prompt_tokens": 0, "completion_tokens": 0, "requests": 0, "estimated": 0}
+        )
+        item["prompt_tokens"] += prompt_tokens
+        item["completion_tokens"] += completion_tokens
+        item["requests"] += 1
+        item["estimated"] += int(estimated)
+        for usage in _usage_scopes.get():
+            usage["prompt_tokens"] += prompt_tokens
+            usage["completion_tokens"] += completion_tokens
+            usage["calls"] += 1
+        self._recent.append({
+            "request_id": request_id,
+            "agent_type": agent_type,
+            "client_id": client_id,
+            "model": model,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "estimated": estimated,
+            "timestamp": time.time()
+        })
+        self._dirty = True
+        self._schedule_flush()
+
+    def record_cancellation(self, agent_type: str, generated_tokens: int, saved_tokens: int):
+        """
+        记录一次被取消的上游调用
+        Args:
+            agent_type: Agent类型
+            generated_tokens: 取消前已生成的输出token数
+            saved_tokens: 估算节省的输出token数（该Agent平均输出token数减去已生成数）
+        """
+        item = self._cancelled.setdefault(agent_type, {"requests": 0, "generated_tokens": 0, "saved_tokens": 0})
+        item["requests"] += 1
+        item["generated_tokens"] += generated_tokens
+        item["saved_tokens"] += saved_tokens
+
+    def _schedule_flush(self):
+        """距离上次持久化超过间隔时在后台写入文件"""
+        if time.monotonic() - self._last_flush < self.flush_interval:
+            return
+        if self._flush_task is not None and not self._flush_task.done():
+            return
+        try:
+            self._flush_task = asyncio.get_running_loop().create_task(self.flush())
+        except RuntimeError:
+            pass
+
+    async def flush(self):
+        """将聚合数据写入文件"""
+        if not self._dirty:
+            return
+        self._dirty = False
+        self._last_flush = time.monotonic()
+        try:
+            os.makedirs(os.path.dirname(self.usage_file) or ".", exist_ok=True)
+            tmp_file = f"{self.usage_file}.tmp"
+            async with aiofiles.open(tmp_file, "w", encoding="utf-8") as f:
+                await f.write(json.dumps(self._aggregates, ensure_ascii=False))
+            os.replace(tmp_file, self.usage_file)
+        except Exception as e:
+            self._dirty = True
+            logger.error(f"写入token用量文件失败: {str(e)}")
+
+    def get_summary(self, day: Optional[str] = None) -> Dict[str, Any]:
+        """
+        获取用量汇总
+        Args:
+            day: 日期（YYYY-MM-DD），默认今天
+        Returns:
+            按调用方和Agent类型汇总的用量
+        """
+        day = day or date.today().isoformat()
+        clients = self._aggregates.get(day, {})
+        by_agent: Dict[str, Dict[str, int]] = {}
+        by_client: Dict[str, Dict[str, Any]] = {}
+        for client_id, agents in clients.items():
+            total = 0
+            for agent_type, item in agents.items():
+                merged = by_agent.setdefault(agent_type, {"prompt_tokens": 0, "completion_tokens": 0, "requests": 0})
+                merged["prompt_tokens"] += item["prompt_tokens"]
+                merged["completion_tokens"] += item["completion_tokens"]
+                merged["requests"] += item["requests"]
+                total += item["prompt_tokens"] + item["completion_tokens"]
+            by_client[client_id] = {"total_tokens": total, "budget": self.get_budget(client_id), "agents": agents}
+        return {"date": day, "by_client": by_client, "by_agent": by_agent, "cancelled": self._cancelled}
+
+    def get_recent(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """获取最近的请求用量明细"""
+        return list(self._recent)[-limit:]
+
+
+# 全局用量统计实例
+_token_accountant: Optional[TokenAccountant] = None
+
+
+def get_token_accountant() -> TokenAccountant:
+    """获取token用量统计实例"""
+    global _token_accountant
+    if _token_accountant is None:
+        _token_accountant = TokenAccountant()
+    return _token_accountant
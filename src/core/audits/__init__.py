@@ -0,0 +1,7 @@
+"""
+检测结果存储包初始化文件
+"""
+
+from .audit_store import AuditStore, get_audit_store
+
+__all__ = ["AuditStore", "get_audit_store"]
@@ -0,0 +1,565 @@
+"""
+检测结果存储
+将每份结构化检测报告连同应用、Agent类型、地区、逐项结论、得分、token用量和耗时写入本地SQLite。
+逐项结论单独成表，写入时同步维护按天和按应用最新结论的汇总表，统计查询只读取汇总表，
+在数十万次检测上毫秒级回答全量统计问题（如“多少应用未满足要点14”）
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+try:
+    from src.utils.utils import get_config, get_data_dir
+except ImportError:
+    from ppgllm.src.utils import get_config, get_data_dir
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS audits (
+    id INTEGER PRIMARY KEY,
+    audit_id TEXT NOT NULL UNIQUE,
+    created_at REAL NOT NULL,
+    day TEXT NOT NULL,
+    app_id TEXT NOT NULL DEFAULT '',
+    agent_type TEXT NOT NULL,
+    region TEXT NOT NULL DEFAULT '',
+    source TEXT NOT NULL,
+    latest INTEGER NOT NULL DEFAULT 1,
+    score REAL,
+    passed INTEGER,
+    total INTEGER,
+    missing INTEGER NOT NULL DEFAULT 0,
+    prompt_tokens INTEGER NOT NULL DEFAULT 0,
+    completion_tokens INTEGER NOT NULL DEFAULT 0,
+    latency_ms REAL,
+    reused INTEGER NOT NULL DEFAULT 0,
+    request_id TEXT,
+    client_id TEXT,
+    policy_hash TEXT,
+    report TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_audits_app ON audits (app_id, agent_type, region, created_at);
+CREATE INDEX IF NOT EXISTS idx_audits_agent_time ON audits (agent_type, created_at);
+
+CREATE TABLE IF NOT EXISTS audit_items (
+    audit_rowid INTEGER NOT NULL REFERENCES audits (id) ON DELETE CASCADE,
+    item_id INTEGER NOT NULL,
+    agent_type TEXT NOT NULL,
+    region TEXT NOT NULL,
+    app_id TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    latest INTEGER NOT NULL DEFAULT 1,
+    passed INTEGER,
+    score INTEGER,
+    issues INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (audit_rowid, item_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_items_latest_failed ON audit_items (agent_type, item_id, region, app_id)
+    WHERE latest = 1 AND passed = 0 AND app_id != '';
+CREATE INDEX IF NOT EXISTS idx_items_app_latest ON audit_items (app_id, agent_type, region, item_id)
+    WHERE latest = 1;
+
+-- 按天汇总：每次检测累加
+CREATE TABLE IF NOT EXISTS audit_daily (
+    agent_type TEXT NOT NULL,
+    day TEXT NOT NULL,
+    region TEXT NOT NULL,
+    source TEXT NOT NULL,
+    audits INTEGER NOT NULL,
+    score_sum REAL NOT NULL,
+    scored INTEGER NOT NULL,
+    prompt_tokens INTEGER NOT NULL,
+    completion_tokens INTEGER NOT NULL,
+    latency_sum REAL NOT NULL,
+    timed INTEGER NOT NULL,
+    latency_max REAL,
+    PRIMARY KEY (agent_type, day, region, source)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS item_daily (
+    agent_type TEXT NOT NULL,
+    day TEXT NOT NULL,
+    region TEXT NOT NULL,
+    item_id INTEGER NOT NULL,
+    audits INTEGER NOT NULL,
+    judged INTEGER NOT NULL,
+    failed INTEGER NOT NULL,
+    score_sum REAL NOT NULL,
+    scored INTEGER NOT NULL,
+    issues INTEGER NOT NULL,
+    PRIMARY KEY (agent_type, day, region, item_id)
+) WITHOUT ROWID;
+-- 应用最新结论的汇总：同一应用、Agent类型和地区的每个检测要点只计入最近一次检测到该要点的结论
+CREATE TABLE IF NOT EXISTS item_latest (
+    agent_type TEXT NOT NULL,
+    region TEXT NOT NULL,
+    item_id INTEGER NOT NULL,
+    audits INTEGER NOT NULL,
+    judged INTEGER NOT NULL,
+    failed INTEGER NOT NULL,
+    score_sum REAL NOT NULL,
+    scored INTEGER NOT NULL,
+    issues INTEGER NOT NULL,
+    PRIMARY KEY (agent_type, region, item_id)
+) WITHOUT ROWID;
+"""
+
+_UPSERT_AUDIT_DAILY = """
+INSERT INTO audit_daily VALUES (?, ?, ?, ?, 1, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT DO UPDATE SET
+    audits = audits + 1, score_sum = score_sum + excluded.score_sum, scored = scored + excluded.scored,
+    prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+    completion_tokens = completion_tokens + excluded.completion_tokens,
+    latency_sum = latency_sum + excluded.latency_sum, timed = timed + excluded.timed,
+    latency_max = MAX(COALESCE(latency_max, excluded.latency_max), COALESCE(excluded.latency_max, latency_max))
+"""
+_ITEM_DELTA = """
+    audits = audits + excluded.audits, judged = judged + excluded.judged, failed = failed + excluded.failed,
+    score_sum = score_sum + excluded.score_sum, scored = scored + excluded.scored, issues = issues + excluded.issues
+"""
+_UPSERT_ITEM_DAILY = "INSERT INTO item_daily VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT DO UPDATE SET" + _ITEM_DELTA
+_UPSERT_ITEM_LATEST = "INSERT INTO item_latest VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT DO UPDATE SET" + _ITEM_DELTA
+
+# 汇总统计支持的分组维度
+GROUP_COLUMNS = {"day": "day", "region": "region", "agent_type": "agent_type", "app_id": "app_id", "source": "source"}
+
+
+def _item_delta(passed: Optional[int], score: Optional[int], issues: int, sign: int = 1) -> Tuple[int, ...]:
+    """单个逐项结论对汇总表的增量 (audits, judged, failed, score_sum, scored, issues)"""
+    return (sign, sign * int(passed is not None), sign * int(passed == 0), sign * (score or 0),
+            sign * int(score is not None), sign * issues)
+
+
+def _day(value: Optional[str]) -> Optional[str]:
+    """将ISO日期/时间规范为日期字符串，按天汇总的统计以天为粒度过滤"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value).date().isoformat()
+    except ValueError:
+        raise ValueError(f"无法解析的日期: {value}，请使用ISO格式（如 2026-10-01）")
+
+
+def _timestamp(value: Optional[str]) -> Optional[float]:
+    """将ISO日期/时间（如 2026-10-01、2026-10-01T08:00:00）转换为时间戳"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise ValueError(f"无法解析的时间: {value}，请使用ISO格式（如 2026-10-01）")
+
+
+def extract_items(agent_type: str, report: Dict[str, Any]) -> Tuple[List[Tuple[int, Optional[int], Optional[int], int]],
+                                                                    Dict[str, Any]]:
+    """
+    从结构化报告中提取逐项结论及汇总
+    Args:
+        agent_type: compliance_checker 或 readability_checker
+        report: ComplianceReport / ReadabilityReport 字典
+    Returns:
+        ([(要点/维度编号, 是否满足, 得分, 问题数)], {"score", "passed", "total", "missing"})
+    """
+    missing = len(report.get("missing_ids") or [])
+    if agent_type == "compliance_checker":
+        checkpoints = report.get("checkpoints") or []
+        items = [(item["id"], int(bool(item["passed"])), None, 0 if item["passed"] else 1) for item in checkpoints]
+        passed = sum(item[1] for item in items)
+        score = round(passed * 100 / len(items), 1) if items else None
+        return items, {"score": score, "passed": passed, "total": len(items) + missing, "missing": missing}
+    dimensions = report.get("dimensions") or []
+    items = [(item["id"], None, item.get("score"), len(item.get("issues") or [])) for item in dimensions]
+    return items, {"score": report.get("overall_score"), "passed": None, "total": len(items) + missing,
+                   "missing": missing}
+
+
+class AuditStore:
+    """检测结果存储"""
+
+    def __init__(self, db_file: Optional[str] = None):
+        config = get_config().get("audits", {})
+        self.enabled = config.get("enabled", True)
+        self.store_reports = config.get("store_reports", True)
+        self.max_limit = config.get("max_limit", 1000)
+        self.db_file = db_file or config.get("db_file") or os.path.join(get_data_dir(), "audits", "audits.db")
+        os.makedirs(os.path.dirname(self.db_file) or ".", exist_ok=True)
+        # 写连接和读连接分开：WAL模式下读不阻塞写，各自加锁保证同一连接不被多个线程同时使用
+        self._write_lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        self._writer = self._connect()
+        self._writer.executescript(_SCHEMA)
+        self._reader = self._connect()
+        self._recorded = 0
+        self._failures = 0
+        if (self._writer.execute("SELECT 1 FROM audits LIMIT 1").fetchone()
+                and not self._writer.execute("SELECT 1 FROM audit_daily LIMIT 1").fetchone()):
+            self.rebuild_rollups()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.db_file, check_same_thread=False, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute("PRAGMA foreign_keys=ON")
+        return connection
+
+    def _insert(self, audit: Dict[str, Any], items: List[Tuple[int, Optional[int], Optional[int], int]]):
+        agent_type, region = audit["agent_type"], audit["region"]
+        with self._write_lock:
+            cursor = self._writer.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                if audit["app_id"] and items:
+                    # 逐项替换：指定检测范围的检测只替换其包含的要点，其余要点保留之前的最新结论
+                    item_ids = [item[0] for item in items]
+                    previous = cursor.execute(
+                        "SELECT audit_rowid, item_id, passed, score, issues FROM audit_items "
+                        "WHERE app_id = ? AND agent_type = ? AND region = ? AND latest = 1 "
+                        f"AND item_id IN ({','.join('?' * len(item_ids))})",
+                        [audit["app_id"], agent_type, region] + item_ids
+                    ).fetchall()
+                    if previous:
+                        cursor.executemany(_UPSERT_ITEM_LATEST, [
+                            (agent_type, region, item_id, *_item_delta(passed, score, issues, -1))
+                            for _, item_id, passed, score, issues in previous
+                        ])
+                        cursor.executemany("UPDATE audit_items SET latest = 0 WHERE audit_rowid = ? AND item_id = ?",
+                                           [(rowid, item_id) for rowid, item_id, *_ in previous])
+                        # 所有要点都已被替换的检测不再是最新检测
+                        cursor.executemany(
+                            "UPDATE audits SET latest = 0 WHERE id = ? AND NOT EXISTS "
+                            "(SELECT 1 FROM audit_items WHERE audit_rowid = audits.id AND latest = 1)",
+                            [(rowid,) for rowid in {row[0] for row in previous}]
+                        )
+                    cursor.executemany(_UPSERT_ITEM_LATEST, [
+                        (agent_type, region, item_id, *_item_delta(passed, score, issues))
+                        for item_id, passed, score, issues in items
+                    ])
+                columns = list(audit)
+                cursor.execute(
+                    f"INSERT INTO audits ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                    [audit[column] for column in columns]
+                )
+                rowid = cursor.lastrowid
+                cursor.executemany(
+                    "INSERT INTO audit_items (audit_rowid, item_id, agent_type, region, app_id, created_at, "
+                    "passed, score, issues) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(rowid, item_id, agent_type, region, audit["app_id"], audit["created_at"],
+                      passed, score, issues) for item_id, passed, score, issues in items]
+                )
+                cursor.execute(_UPSERT_AUDIT_DAILY, (
+                    agent_type, audit["day"], region, audit["source"],
+                    audit["score"] or 0, int(audit["score"] is not None),
+                    audit["prompt_tokens"], audit["completion_tokens"],
+                    audit["latency_ms"] or 0, int(audit["latency_ms"] is not None), audit["latency_ms"]
+                ))
+                cursor.executemany(_UPSERT_ITEM_DAILY, [
+                    (agent_type, audit["day"], region, item_id, *_item_delta(passed, score, issues))
+                    for item_id, passed, score, issues in items
+                ])
+                cursor.execute("COMMIT")
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+
+    def rebuild_rollups(self):
+        """由明细表重建汇总表（汇总表为空而明细表有数据时在启动时自动执行）"""
+        with self._write_lock:
+            cursor = self._writer.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                for table in ("audit_daily", "item_daily", "item_latest"):
+                    cursor.execute(f"DELETE FROM {table}")
+                cursor.execute(
+                    "INSERT INTO audit_daily SELECT agent_type, day, region, source, COUNT(*), "
+                    "COALESCE(SUM(score), 0), COUNT(score), SUM(prompt_tokens), SUM(completion_tokens), "
+                    "COALESCE(SUM(latency_ms), 0), COUNT(latency_ms), MAX(latency_ms) "
+                    "FROM audits GROUP BY agent_type, day, region, source"
+                )
+                cursor.execute(
+                    "INSERT INTO item_daily SELECT i.agent_type, a.day, i.region, i.item_id, COUNT(*), COUNT(i.passed), "
+                    "SUM(i.passed = 0), COALESCE(SUM(i.score), 0), COUNT(i.score), SUM(i.issues) "
+                    "FROM audit_items AS i JOIN audits AS a ON a.id = i.audit_rowid "
+                    "GROUP BY i.agent_type, a.day, i.region, i.item_id"
+                )
+                cursor.execute(
+                    "INSERT INTO item_latest SELECT agent_type, region, item_id, COUNT(*), COUNT(passed), "
+                    "SUM(passed = 0), COALESCE(SUM(score), 0), COUNT(score), SUM(issues) "
+                    "FROM audit_items WHERE latest = 1 AND app_id != '' GROUP BY agent_type, region, item_id"
+                )
+                cursor.execute("COMMIT")
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+        logger.info("检测结果汇总表重建完成")
+
+    async def record(self, agent_type: str, report: Dict[str, Any], source: str,
+                     app_id: Optional[str] = None,
+                     region: Optional[str] = None,
+                     usage: Optional[Dict[str, int]] = None,
+                     latency_ms: Optional[float] = None,
+                     reused: bool = False,
+                     request_id: Optional[str] = None,
+                     client_id: Optional[str] = None,
+                     policy: Optional[str] = None) -> Optional[str]:
+        """
+        记录一份检测报告，写入失败只记录日志，不影响检测请求
+        Args:
+            agent_type: 检测类Agent类型
+            report: 结构化检测报告
+            source: 来源（structured：结构化检测，regional：多地区合规检测）
+            app_id: 被检测应用ID
+            region: 检测地区，按地区检测时填写
+            usage: token用量 {"prompt_tokens", "completion_tokens"}
+            latency_ms: 检测耗时（毫秒）
+            reused: 是否复用了相似文档的历史报告
+            request_id: 请求ID
+            client_id: API调用方
+            policy: 被检测的隐私政策文本，只保存其哈希
+        Returns:
+            检测记录ID，未启用或写入失败时返回None
+        """
+        if not self.enabled:
+            return None
+        items, summary = extract_items(agent_type, report)
+        now = time.time()
+        audit = {
+            "audit_id": uuid.uuid4().hex,
+            "created_at": now,
+            "day": date.fromtimestamp(now).isoformat(),
+            "app_id": app_id or "",
+            "agent_type": agent_type,
+            "region": region or "",
+            "source": source,
+            **summary,
+            "prompt_tokens": (usage or {}).get("prompt_tokens", 0),
+            "completion_tokens": (usage or {}).get("completion_tokens", 0),
+            "latency_ms": round(latency_ms, 3) if latency_ms is not None else None,
+            "reused": int(reused),
+            "request_id": request_id,
+            "client_id": client_id,
+            "policy_hash": hashlib.sha256(policy.encode("utf-8")).hexdigest()[:20] if policy else None,
+            "report": json.dumps(report, ensure_ascii=False) if self.store_reports else None
+        }
+        try:
+            await asyncio.to_thread(self._insert, audit, items)
+        except sqlite3.Error as e:
+            self._failures += 1
+            logger.error(f"检测结果写入失败: {str(e)}")
+            return None
+        self._recorded += 1
+        return audit["audit_id"]
+
+    def _query(self, sql: str, params: List[Any]) -> List[Dict[str, Any]]:
+        with self._read_lock:
+            return [dict(row) for row in self._reader.execute(sql, params)]
+
+    async def query(self, sql: str, params: List[Any]) -> List[Dict[str, Any]]:
+        """在线程中执行只读查询"""
+        return await asyncio.to_thread(self._query, sql, params)
+
+    def _limit(self, limit: int) -> int:
+        return max(1, min(limit, self.max_limit))
+
+    @staticmethod
+    def _filters(column_prefix: str = "", **filters) -> Tuple[str, List[Any]]:
+        """拼接等值及时间范围条件，值为None的条件忽略"""
+        clauses, params = [], []
+        for key, value in filters.items():
+            if value is None:
+                continue
+            if key == "since":
+                clauses.append(f"{column_prefix}created_at >= ?")
+                params.append(_timestamp(value))
+            elif key == "until":
+                clauses.append(f"{column_prefix}created_at < ?")
+                params.append(_timestamp(value))
+            else:
+                clauses.append(f"{column_prefix}{key} = ?")
+                params.append(value)
+        return (" AND ".join(clauses) or "1"), params
+
+    async def list_audits(self, app_id: Optional[str] = None, agent_type: Optional[str] = None,
+                          region: Optional[str] = None, since: Optional[str] = None, until: Optional[str] = None,
+                          limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        按时间倒序列出检测记录（不含报告正文）
+        Args:
+            app_id: 应用ID
+            agent_type: Agent类型
+            region: 地区
+            since: 起始时间（含）
+            until: 截止时间（不含）
+            limit: 返回条数
+        Returns:
+            检测记录列表
+        """
+        where, params = self._filters(app_id=app_id, agent_type=agent_type, region=region, since=since, until=until)
+        return await self.query(
+            "SELECT audit_id, created_at, app_id, agent_type, region, source, latest, score, passed, total, missing, "
+            "prompt_tokens, completion_tokens, latency_ms, reused, request_id, client_id, policy_hash "
+            f"FROM audits WHERE {where} ORDER BY created_at DESC LIMIT ?",
+            params + [self._limit(limit)]
+        )
+
+    async def get_audit(self, audit_id: str) -> Optional[Dict[str, Any]]:
+        """获取单次检测记录及报告正文"""
+        rows = await self.query("SELECT * FROM audits WHERE audit_id = ?", [audit_id])
+        if not rows:
+            return None
+        audit = rows[0]
+        audit.pop("id")
+        audit["report"] = json.loads(audit["report"]) if audit["report"] else None
+        return audit
+
+    async def item_stats(self, agent_type: str, region: Optional[str] = None,
+                         since: Optional[str] = None, until: Optional[str] = None,
+                         latest: bool = True) -> List[Dict[str, Any]]:
+        """
+        按检测要点/维度统计结论
+        Args:
+            agent_type: Agent类型
+            region: 地区
+            since: 起始日期（含），latest为False时有效
+            until: 截止日期（不含），latest为False时有效
+            latest: 只统计每个应用（需提供应用ID）在各地区每个要点的最新结论（指定检测范围的检测只更新其包含的要点），
+                否则统计时间范围内的全部检测
+        Returns:
+            [{"item_id", "audits", "failed", "pass_rate", "avg_score", "issues"}]；
+            要点编号在各地区规则包内编排，统计欧盟、美国等独立规则包时应指定地区；
+            latest 时 failed 即未满足该要点的 应用×地区 数
+        """
+        where, params = self._filters(agent_type=agent_type, region=region)
+        table = "item_latest" if latest else "item_daily"
+        if not latest:
+            for clause, value in (("day >= ?", _day(since)), ("day < ?", _day(until))):
+                if value:
+                    where += f" AND {clause}"
+                    params.append(value)
+        rows = await self.query(
+            "SELECT item_id, SUM(audits) AS audits, SUM(failed) AS failed, SUM(judged) AS judged, "
+            "SUM(score_sum) AS score_sum, SUM(scored) AS scored, SUM(issues) AS issues "
+            f"FROM {table} WHERE {where} GROUP BY item_id HAVING SUM(audits) > 0 ORDER BY item_id",
+            params
+        )
+        for row in rows:
+            judged, scored = row.pop("judged"), row.pop("scored")
+            score_sum = row.pop("score_sum")
+            row["pass_rate"] = round((judged - row["failed"]) / judged, 4) if judged else None
+            row["avg_score"] = round(score_sum / scored, 2) if scored else None
+        return rows
+
+    async def failing_apps(self, agent_type: str, item_id: int, region: Optional[str] = None,
+                           limit: int = 100, offset: int = 0) -> Dict[str, Any]:
+        """
+        列出该要点最新结论为未满足的应用
+        Args:
+            agent_type: Agent类型
+            item_id: 检测要点编号
+            region: 地区
+            limit: 返回条数
+            offset: 跳过条数
+        Returns:
+            {"total": 未满足的 应用×地区 数（指定地区时即应用数）,
+             "apps": [{"app_id", "region", "audit_id", "created_at"}]}，按地区、应用ID排序
+        """
+        where, params = self._filters(agent_type=agent_type, item_id=item_id, region=region)
+        total = await self.query(f"SELECT COALESCE(SUM(failed), 0) AS total FROM item_latest WHERE {where}", params)
+        # 条件与排序均落在部分索引 idx_items_latest_failed 上，只回表取当前页
+        where, params = self._filters("i.", agent_type=agent_type, item_id=item_id, region=region)
+        apps = await self.query(
+            "SELECT i.app_id, i.region, a.audit_id, a.created_at FROM audit_items AS i "
+            f"JOIN audits AS a ON a.id = i.audit_rowid WHERE {where} "
+            "AND i.latest = 1 AND i.passed = 0 AND i.app_id != '' ORDER BY i.region, i.app_id LIMIT ? OFFSET ?",
+            params + [self._limit(limit), max(offset, 0)]
+        )
+        return {"total": total[0]["total"], "apps": apps}
+
+    async def summary(self, group_by: str = "day", agent_type: Optional[str] = None,
+                      region: Optional[str] = None, since: Optional[str] = None, until: Optional[str] = None,
+                      limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        按维度汇总检测次数、平均得分、token用量和耗时
+        Args:
+            group_by: 分组维度（day、region、agent_type、source 读取按天汇总表；app_id 读取明细表）
+            agent_type: Agent类型
+            region: 地区
+            since: 起始日期（含）
+            until: 截止日期（不含）
+            limit: 返回的分组数
+        Returns:
+            各分组的汇总
+        """
+        if group_by not in GROUP_COLUMNS:
+            raise ValueError(f"不支持的分组维度: {group_by}，可选: {', '.join(GROUP_COLUMNS)}")
+        column = GROUP_COLUMNS[group_by]
+        where, params = self._filters(agent_type=agent_type, region=region)
+        order = f"{column} DESC" if group_by == "day" else "audits DESC"
+        if group_by == "app_id":
+            where_time, time_params = self._filters(since=since, until=until)
+            sql = ("SELECT app_id, COUNT(*) AS audits, SUM(score) AS score_sum, COUNT(score) AS scored, "
+                   "SUM(prompt_tokens) AS prompt_tokens, SUM(completion_tokens) AS completion_tokens, "
+                   "SUM(latency_ms) AS latency_sum, COUNT(latency_ms) AS timed, MAX(latency_ms) AS max_latency_ms "
+                   f"FROM audits WHERE {where} AND {where_time} AND app_id != '' GROUP BY app_id")
+            params += time_params
+        else:
+            for clause, value in (("day >= ?", _day(since)), ("day < ?", _day(until))):
+                if value:
+                    where += f" AND {clause}"
+                    params.append(value)
+            sql = (f"SELECT {column} AS {group_by}, SUM(audits) AS audits, SUM(score_sum) AS score_sum, "
+                   "SUM(scored) AS scored, SUM(prompt_tokens) AS prompt_tokens, "
+                   "SUM(completion_tokens) AS completion_tokens, SUM(latency_sum) AS latency_sum, "
+                   "SUM(timed) AS timed, MAX(latency_max) AS max_latency_ms "
+                   f"FROM audit_daily WHERE {where} GROUP BY {column}")
+        rows = await self.query(f"{sql} ORDER BY {order} LIMIT ?", params + [self._limit(limit)])
+        for row in rows:
+            score_sum, scored = row.pop("score_sum"), row.pop("scored")
+            latency_sum, timed = row.pop("latency_sum"), row.pop("timed")
+            row["avg_score"] = round(score_sum / scored, 2) if scored else None
+            row["avg_latency_ms"] = round(latency_sum / timed, 2) if timed else None
+            row["max_latency_ms"] = round(row["max_latency_ms"], 2) if row["max_latency_ms"] is not None else None
+        return rows
+
+    async def get_stats(self) -> Dict[str, Any]:
+        """获取存储统计（计数查询在线程中执行）"""
+        counts = await self.query(
+            "SELECT (SELECT COUNT(*) FROM audits) AS audits, "
+            "(SELECT COUNT(DISTINCT app_id) FROM audits WHERE app_id != '') AS apps", []
+        )
+        return {
+            "enabled": self.enabled,
+            "db_file": self.db_file,
+            "db_bytes": sum(os.path.getsize(path) for path in (self.db_file, self.db_file + "-wal")
+                            if os.path.exists(path)),
+            **counts[0],
+            "recorded": self._recorded,
+            "failures": self._failures
+        }
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._write_lock:
+            self._writer.close()
+        with self._read_lock:
+            self._reader.close()
+
+
+# 全局检测结果存储实例
+_audit_store: Optional[AuditStore] = None
+
+
+def get_audit_store() -> AuditStore:
+    """获取检测结果存储实例"""
+    global _audit_store
+    if _audit_store is None:
+        _audit_store = AuditStore()
+    return _audit_store
@@ -0,0 +1,7 @@
+"""
+法律依据条文索引包初始化文件
+"""
+
+from .citation_index import CitationIndex, extract_codes, get_citation_index, split_code
+
+__all__ = ["CitationIndex", "extract_codes", "get_citation_index", "split_code"]
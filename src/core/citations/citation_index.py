@@ -0,0 +1,229 @@
+"""
+法律依据条文索引
+以评估框架中的法规编号（如 G17、Z1-9、S6.5）为键加载本地条文库，支持编号展开、全文检索和提示词注入
+"""
+
+import json
+import math
+import os
+import re
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from loguru import logger
+
+try:
+    from src.utils.utils import get_config, get_resource_dir
+    from src.core.fingerprint import normalize_text
+except ImportError:
+    from ppgllm.src.utils import get_config, get_resource_dir
+    from ..fingerprint import normalize_text
+
+# 文本中的法规编号，如 G7/17-2、Z1-5/7、T5.4-d、W-A.3
+CODE_PATTERN = re.compile(
+    r"(?<![A-Za-z0-9])([GZWTRNSM](?:-A\.)?\d+(?:[.\-](?:\d+|[a-z]))*(?:/\d+(?:[.\-](?:\d+|[a-z]))*)*)(?![A-Za-z0-9])"
+)
+
+
+def extract_codes(text: str) -> List[str]:
+    """
+    提取文本中出现的法规编号
+    Args:
+        text: 任意文本（如检测报告）
+    Returns:
+        按出现顺序去重的编号列表
+    """
+    return list(dict.fromkeys(CODE_PATTERN.findall(text or "")))
+
+
+def _replace_last_segment(previous: str, part: str) -> str:
+    """斜杠后的简写只替换前一编号的最后一级，如 Z1-5/7 中的 7 表示 Z1-7"""
+    match = re.match(r"^(.*[.\-])[^.\-]+$", previous)
+    return match.group(1) + part if match else part
+
+
+def split_code(code: str) -> List[Dict[str, Any]]:
+    """
+    将复合编号拆分为单个条文键
+    G 类编号中“-”表示条文范围（G44-50）或款（G17-2），其他类编号中“-”与“.”均表示下级条目
+    Args:
+        code: 法规编号，如 G7/17-2、T9.6/7、G44-50
+    Returns:
+        [{"key": 条文键, "note": 款/项说明}]，无法识别时返回空列表
+    """
+    code = code.strip().strip("`")
+    if not code or not CODE_PATTERN.fullmatch(code):
+        return []
+    letter, body = code[0], code[1:]
+    if body.startswith("-A."):
+        return [{"key": f"{letter}{body}", "note": None}]
+
+    parts: List[str] = []
+    for part in body.split("/"):
+        if parts and re.fullmatch(r"\d+|[a-z]", part):
+            part = _replace_last_segment(parts[-1], part)
+        parts.append(part)
+
+    keys = []
+    for part in parts:
+        if letter == "G":
+            match = re.fullmatch(r"(\d+)(?:-(\d+))?", part)
+            if not match:
+                continue
+            start, end = int(match.group(1)), match.group(2)
+            if end is not None and int(end) > start:
+                keys.extend({"key": f"G{number}", "note": None} for number in range(start, int(end) + 1))
+            else:
+                keys.append({"key": f"G{start}", "note": f"第{end}款" if end else None})
+        else:
+            keys.append({"key": letter + part.replace("-", "."), "note": None})
+    return keys
+
+
+class CitationIndex:
+    """法律依据条文索引"""
+
+    def __init__(self, corpus_file: Optional[str] = None):
+        config = get_config().get("citations", {})
+        corpus_file = corpus_file or config.get("corpus_file") or os.path.join(get_resource_dir(), "legal_corpus.json")
+        self.max_prompt_chars = config.get("max_prompt_chars", 6000)
+        with open(corpus_file, "r", encoding="utf-8") as f:
+            corpus = json.load(f)
+        self.sources: Dict[str, Dict[str, Any]] = corpus["sources"]
+        self.articles: Dict[str, Dict[str, Any]] = corpus["articles"]
+        # 字符二元组倒排索引 {二元组: {条文键: 出现次数}}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        for key, article in self.articles.items():
+            for gram in self._bigrams(f"{self.sources[key[0]]['name']}{article['title']}{article['text']}"):
+                postings = self._postings.setdefault(gram, {})
+                postings[key] = postings.get(key, 0) + 1
+        logger.info(f"法律依据条文库加载完成: {len(self.sources)} 部法规, {len(self.articles)} 条条文")
+
+    @staticmethod
+    def _bigrams(text: str) -> List[str]:
+        normalized = normalize_text(text)
+        return [normalized[index:index + 2] for index in range(len(normalized) - 1)] or ([normalized] if normalized else [])
+
+    def _article(self, key: str) -> Dict[str, Any]:
+        source = self.sources[key[0]]
+        return {"key": key, "source": source["name"], "kind": source["kind"], **self.articles[key]}
+
+    def _resolve(self, key: str) -> Optional[str]:
+        """条文库未收录下级条目时逐级回退到上级条文，如 T5.4.d → T5.4"""
+        while key:
+            if key in self.articles:
+                return key
+            trimmed = re.sub(r"[.\-][^.\-]+$", "", key)
+            if trimmed == key:
+                return None
+            key = trimmed
+        return None
+
+    def lookup(self, code: str) -> Dict[str, Any]:
+        """
+        展开单个法规编号
+        Args:
+            code: 法规编号，可包含斜杠和范围，如 G7/17-2、G44-50
+        Returns:
+            code: 原编号；articles: 匹配的条文；unresolved: 条文库中未收录的条文键
+        """
+        articles, unresolved = [], []
+        for item in split_code(code):
+            key = self._resolve(item["key"])
+            if key is None:
+                unresolved.append(item["key"])
+                continue
+            article = self._article(key)
+            if item["note"]:
+                article["note"] = item["note"]
+            articles.append(article)
+        return {"code": code, "articles": articles, "unresolved": unresolved}
+
+    def expand(self, codes: Iterable[str]) -> List[Dict[str, Any]]:
+        """批量展开法规编号"""
+        return [self.lookup(code) for code in dict.fromkeys(codes)]
+
+    def search(self, query: str, limit: int = 10) -> Dict[str, Any]:
+        """
+        全文检索条文
+        查询中包含法规编号时优先返回编号命中的条文，其余按字符二元组的TF-IDF得分排序
+        Args:
+            query: 检索词或法规编号
+            limit: 返回数量
+        Returns:
+            results: 条文列表（含得分和命中片段）；elapsed_ms: 检索耗时
+        """
+        start = time.perf_counter()
+        scores: Dict[str, float] = {}
+        for code in extract_codes(query):
+            for article in self.lookup(code)["articles"]:
+                scores[article["key"]] = scores.get(article["key"], 0.0) + 100.0
+        total = len(self.articles)
+        for gram in set(self._bigrams(query)):
+            postings = self._postings.get(gram)
+            if not postings:
+                continue
+            idf = math.log(1 + total / len(postings))
+            for key, count in postings.items():
+                scores[key] = scores.get(key, 0.0) + idf * (1 + math.log(count))
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+        results = []
+        for key, score in ranked:
+            article = self._article(key)
+            article["score"] = round(score, 3)
+            article["snippet"] = self._snippet(article["text"], query)
+            results.append(article)
+        return {"query": query, "results": results, "elapsed_ms": round((time.perf_counter() - start) * 1000, 3)}
+
+    @staticmethod
+    def _snippet(text: str, query: str, width: int = 40) -> str:
+        """截取首个命中的查询二元组附近的文本"""
+        terms = [term for term in re.split(r"\s+", query.strip()) if term]
+        position = -1
+        for term in terms:
+            for index in range(max(len(term) - 1, 1)):
+                position = text.find(term[index:index + 2])
+                if position >= 0:
+                    break
+            if position >= 0:
+                break
+        start = max(position - width // 2, 0) if position >= 0 else 0
+        snippet = text[start:start + width].replace("\n", " ")
+        return ("…" if start > 0 else "") + snippet + ("…" if start + width < len(text) else "")
+
+    def render_for_prompt(self, codes: Iterable[str], max_chars: Optional[int] = None) -> str:
+        """
+        将引用的条文渲染为提示词片段
+        Args:
+            codes: 法规编号
+            max_chars: 最大字符数，超出的条文只保留标题
+        Returns:
+            条文文本，没有可用条文时返回空字符串
+        """
+        max_chars = self.max_prompt_chars if max_chars is None else max_chars
+        keys: List[str] = []
+        for entry in self.expand(codes):
+            keys.extend(article["key"] for article in entry["articles"] if article["key"] not in keys)
+        lines, used = [], 0
+        for key in keys:
+            article = self._article(key)
+            header = f"【{key}】{article['source']} {article['title']}" + ("（要点）" if article["kind"] == "要点" else "")
+            line = f"{header}\n{article['text']}"
+            if used + len(line) > max_chars:
+                line = header
+            lines.append(line)
+            used += len(line)
+        return "\n".join(lines)
+
+
+# 全局条文索引实例
+_citation_index: Optional[CitationIndex] = None
+
+
+def get_citation_index() -> CitationIndex:
+    """获取法律依据条文索引实例"""
+    global _citation_index
+    if _citation_index is None:
+        _citation_index = CitationIndex()
+    return _citation_index
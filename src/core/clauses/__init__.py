@@ -0,0 +1,8 @@
+"""
+条款级缓存包初始化文件
+"""
+
+from .clause_checker import ClauseLevelChecker
+from .clause_store import ClauseStore, clause_hash, get_clause_store, split_clauses
+
+__all__ = ["ClauseLevelChecker", "ClauseStore", "clause_hash", "get_clause_store", "split_clauses"]
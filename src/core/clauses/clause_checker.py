@@ -0,0 +1,183 @@
+"""
+条款级检测
+已缓存的条款直接复用结果，只将新条款分批发送上游，再汇总为完整的结构化检测报告
+"""
+
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+from pydantic import ValidationError
+
+try:
+    from src.core.structured import STRUCTURED_SPECS, ReadabilityIssue, parse_json_text
+    from src.core.structured.schemas import build_section_summaries
+except ImportError:
+    from ..structured import STRUCTURED_SPECS, ReadabilityIssue, parse_json_text
+    from ..structured.schemas import build_section_summaries
+from .clause_store import ClauseStore, clause_hash, get_clause_store, split_clauses
+
+
+class ClauseLevelChecker:
+    """条款级检测器"""
+
+    def __init__(self, upstream_client, store: Optional[ClauseStore] = None):
+        self.upstream_client = upstream_client
+        self.store = store or get_clause_store()
+
+    async def check(self, agent_type: str, text: str, system_message: str, **params) -> Dict[str, Any]:
+        """
+        按条款检测隐私政策
+        Args:
+            agent_type: Agent类型，仅支持检测类Agent
+            text: 隐私政策文本
+            system_message: Agent系统提示词
+            params: 上游请求参数（model、max_tokens等）
+        Returns:
+            report: 结构化检测报告；stats: 条款数、缓存命中数和上游请求数；
+            errors: 无法解析的批次，非空时报告不完整（对应条款按没有发现处理），调用方应改用整篇检测
+        """
+        if agent_type not in STRUCTURED_SPECS:
+            raise ValueError(f"Agent类型不支持条款级检测: {agent_type}")
+        clauses = split_clauses(text, self.store.min_chars)
+        keys = [clause_hash(clause) for clause in clauses]
+        unique = dict(zip(keys, clauses))
+
+        findings = self.store.lookup(agent_type, unique)
+        novel = [(key, clause) for key, clause in unique.items() if key not in findings]
+        batches = self.store.batches(novel)
+        errors: List[str] = []
+        if batches:
+            system_message = system_message + STRUCTURED_SPECS[agent_type]["clause_prompt"]
+            results = await asyncio.gather(*[
+                self._annotate(agent_type, batch, system_message, params) for batch in batches
+            ])
+            for result, error in results:
+                if error:
+                    errors.append(error)
+                    continue
+                findings.update(result)
+                await self.store.put(agent_type, result)
+
+        stats = {
+            "clauses": len(clauses),
+            "unique_clauses": len(unique),
+            "cached": len(unique) - len(novel),
+            "novel": len(novel),
+            "upstream_requests": len(batches),
+            "failed_batches": len(errors)
+        }
+        logger.info(f"条款级检测 {agent_type}: {stats}")
+        if agent_type == "compliance_checker":
+            report = self._build_compliance_report(clauses, keys, findings)
+        else:
+            report = self._build_readability_report(clauses, keys, findings)
+        return {"report": report, "stats": stats, "errors": errors}
+
+    async def _annotate(self, agent_type: str, batch: List[tuple],
+                        system_message: str, params: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[str]]:
+        """
+        发送一批新条款并解析逐条结果
+        Returns:
+            ({条款哈希: 条款检测结果}, 错误信息)；模型输出无法解析时结果为空并返回错误，不写入缓存
+        """
+        message = "\n\n".join(f"【条款{index}】\n{clause}" for index, (_, clause) in enumerate(batch, 1))
+        content = await self.upstream_client.complete(
+            system_message, message,
+            agent_type=agent_type,
+            response_format={"type": "json_object"},
+            **params
+        )
+        data = parse_json_text(content)
+        if data is None or not isinstance(data.get("clauses"), list):
+            logger.warning(f"条款级检测输出解析失败 {agent_type}: {content[:100]}")
+            return {}, f"{len(batch)} 条条款的检测结果无法解析"
+
+        catalog_ids = {entry["id"] for entry in STRUCTURED_SPECS[agent_type]["catalog"]}
+        annotated: Dict[int, Any] = {}
+        for item in data["clauses"]:
+            if not isinstance(item, dict) or not isinstance(item.get("index"), int):
+                continue
+            entries = [entry for entry in item.get("checkpoints" if agent_type == "compliance_checker" else "issues")
+                       or [] if isinstance(entry, dict)]
+            if agent_type == "compliance_checker":
+                annotated[item["index"]] = [
+                    {"id": entry["id"], "quote": str(entry.get("quote") or "")}
+                    for entry in entries if entry.get("id") in catalog_ids
+                ]
+            else:
+                annotated[item["index"]] = self._readability_findings(entries, catalog_ids)
+        # 模型未返回的条款视为没有发现
+        return {key: annotated.get(index, []) for index, (key, _) in enumerate(batch, 1)}, None
+
+    @staticmethod
+    def _readability_findings(entries: List[Dict[str, Any]], catalog_ids: set) -> List[Dict[str, Any]]:
+        """逐条校验可读性问题，字段不合法的问题跳过，不影响同批其他条款"""
+        findings = []
+        for entry in entries:
+            if entry.get("dimension") not in catalog_ids or not entry.get("violation_type"):
+                continue
+            try:
+                issue = ReadabilityIssue.model_validate(entry)
+            except ValidationError as e:
+                logger.warning(f"跳过无效的可读性问题: {e.errors()[0].get('msg')}")
+                continue
+            findings.append({"dimension": entry["dimension"], **issue.model_dump()})
+        return findings
+
+    @staticmethod
+    def _build_compliance_report(clauses: List[str], keys: List[str], findings: Dict[str, Any]):
+        """检测要点在任一条款中得到满足即判定为满足"""
+        spec = STRUCTURED_SPECS["compliance_checker"]
+        quotes: Dict[int, List[str]] = {}
+        for clause, key in zip(clauses, keys):
+            for finding in findings.get(key, []):
+                quotes.setdefault(finding["id"], []).append(finding["quote"] or clause[:80])
+
+        checkpoints = []
+        for entry in spec["catalog"]:
+            evidence = quotes.get(entry["id"], [])
+            checkpoints.append(spec["item_model"](
+                id=entry["id"],
+                passed=bool(evidence),
+                quotes=evidence[:3],
+                legal_basis=list(entry["legal_basis"]),
+                suggestion=None if evidence else f"未找到涉及“{entry['title']}”的条款，请补充相关内容"
+            ))
+        passed = sum(1 for item in checkpoints if item.passed)
+        return spec["report_model"](
+            checkpoints=checkpoints,
+            sections=build_section_summaries(checkpoints, spec["catalog"]),
+            summary=f"条款级检测：{passed}/{len(checkpoints)} 项检测要点在政策中有对应条款"
+        )
+
+    @staticmethod
+    def _build_readability_report(clauses: List[str], keys: List[str], findings: Dict[str, Any]):
+        """维度得分为未发现该维度问题的条款字符数占比"""
+        spec = STRUCTURED_SPECS["readability_checker"]
+        total_chars = sum(len(clause) for clause in clauses) or 1
+        issues: Dict[int, List[ReadabilityIssue]] = {}
+        flagged_chars: Dict[int, int] = {}
+        for clause, key in zip(clauses, keys):
+            dimensions = set()
+            for finding in findings.get(key, []):
+                fields = {name: value for name, value in finding.items() if name != "dimension"}
+                issues.setdefault(finding["dimension"], []).append(ReadabilityIssue(**fields))
+                dimensions.add(finding["dimension"])
+            for dimension in dimensions:
+                flagged_chars[dimension] = flagged_chars.get(dimension, 0) + len(clause)
+
+        dimensions = [
+            spec["item_model"](
+                id=entry["id"],
+                score=round(100 * (1 - flagged_chars.get(entry["id"], 0) / total_chars)),
+                issues=issues.get(entry["id"], [])
+            )
+            for entry in spec["catalog"]
+        ]
+        overall = round(sum(item.score for item in dimensions) / len(dimensions)) if dimensions else None
+        return spec["report_model"](
+            dimensions=dimensions,
+            overall_score=overall,
+            summary=f"条款级检测：共发现 {sum(len(item.issues) for item in dimensions)} 处可读性问题"
+        )
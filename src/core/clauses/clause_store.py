@@ -0,0 +1,173 @@
+"""
+条款级结果缓存
+以规范化段落哈希为键，缓存每个条款已计算过的合规检测要点和可读性问题，跨隐私政策复用
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+
+import aiofiles
+from loguru import logger
+
+try:
+    from src.utils.utils import get_config, get_data_dir
+    from src.core.fingerprint import normalize_text
+except ImportError:
+    from ppgllm.src.utils import get_config, get_data_dir
+    from ..fingerprint import normalize_text
+
+
+def split_clauses(text: str, min_chars: int = 20) -> List[str]:
+    """
+    将隐私政策拆分为条款
+    按行切分，规范化后不足 min_chars 的短行（如章节标题）并入其后的条款
+    Args:
+        text: 隐私政策文本
+        min_chars: 独立成条的最少字符数
+    Returns:
+        条款列表
+    """
+    clauses: List[str] = []
+    pending: List[str] = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        pending.append(line)
+        if len(normalize_text(line)) >= min_chars:
+            clauses.append("\n".join(pending))
+            pending = []
+    if pending:
+        if clauses:
+            clauses[-1] = clauses[-1] + "\n" + "\n".join(pending)
+        else:
+            clauses.append("\n".join(pending))
+    return clauses
+
+
+def clause_hash(clause: str) -> str:
+    """计算条款的规范化哈希，排版和标点差异不影响结果"""
+    return hashlib.sha256(normalize_text(clause).encode("utf-8")).hexdigest()[:20]
+
+
+class ClauseStore:
+    """条款级结果缓存"""
+
+    def __init__(self, storage_dir: Optional[str] = None):
+        config = get_config().get("clauses", {})
+        self.storage_dir = storage_dir or config.get("storage_dir") or os.path.join(get_data_dir(), "clauses")
+        self.max_entries = config.get("max_entries", 100000)
+        self.min_chars = config.get("min_chars", 20)
+        self.batch_chars = config.get("batch_chars", 4000)
+        self.store_file = os.path.join(self.storage_dir, "clauses.jsonl")
+        # {条款哈希: {Agent类型: 条款检测结果}}
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._lock = asyncio.Lock()
+        os.makedirs(self.storage_dir, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        """加载已持久化的条款结果"""
+        if not os.path.exists(self.store_file):
+            return
+        try:
+            with open(self.store_file, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        self._set(record["hash"], record["agent_type"], record["findings"])
+            logger.info(f"条款缓存加载完成: {len(self._entries)} 条")
+        except Exception as e:
+            logger.error(f"读取条款缓存失败: {str(e)}")
+
+    def _set(self, key: str, agent_type: str, findings: Any):
+        self._entries.setdefault(key, {})[agent_type] = findings
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def lookup(self, agent_type: str, clauses: Dict[str, str]) -> Dict[str, Any]:
+        """
+        查询条款缓存
+        Args:
+            agent_type: Agent类型
+            clauses: {条款哈希: 条款原文}
+        Returns:
+            命中的 {条款哈希: 条款检测结果}
+        """
+        stats = self._stats.setdefault(agent_type, {"lookups": 0, "hits": 0, "hit_chars": 0, "miss_chars": 0})
+        hits = {}
+        for key, clause in clauses.items():
+            entry = self._entries.get(key)
+            stats["lookups"] += 1
+            if entry is not None and agent_type in entry:
+                self._entries.move_to_end(key)
+                hits[key] = entry[agent_type]
+                stats["hits"] += 1
+                stats["hit_chars"] += len(clause)
+            else:
+                stats["miss_chars"] += len(clause)
+        return hits
+
+    async def put(self, agent_type: str, findings: Dict[str, Any]):
+        """
+        写入条款检测结果
+        Args:
+            agent_type: Agent类型
+            findings: {条款哈希: 条款检测结果}
+        """
+        if not findings:
+            return
+        for key, value in findings.items():
+            self._set(key, agent_type, value)
+        lines = "".join(
+            json.dumps({"hash": key, "agent_type": agent_type, "findings": value}, ensure_ascii=False) + "\n"
+            for key, value in findings.items()
+        )
+        try:
+            async with self._lock:
+                async with aiofiles.open(self.store_file, "a", encoding="utf-8") as f:
+                    await f.write(lines)
+        except Exception as e:
+            logger.error(f"写入条款缓存失败: {str(e)}")
+
+    def batches(self, clauses: Iterable[tuple]) -> List[List[tuple]]:
+        """按字符数将待检测条款分批，每批一次上游请求"""
+        batches: List[List[tuple]] = []
+        size = 0
+        for item in clauses:
+            if not batches or size + len(item[1]) > self.batch_chars:
+                batches.append([])
+                size = 0
+            batches[-1].append(item)
+            size += len(item[1])
+        return batches
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存命中率统计"""
+        agents = {}
+        for agent_type, stats in self._stats.items():
+            total_chars = stats["hit_chars"] + stats["miss_chars"]
+            agents[agent_type] = {
+                **stats,
+                "hit_rate": round(stats["hits"] / stats["lookups"], 4) if stats["lookups"] else 0.0,
+                "char_hit_rate": round(stats["hit_chars"] / total_chars, 4) if total_chars else 0.0
+            }
+        return {"entries": len(self._entries), "agents": agents}
+
+
+# 全局条款缓存实例
+_clause_store: Optional[ClauseStore] = None
+
+
+def get_clause_store() -> ClauseStore:
+    """获取条款缓存实例"""
+    global _clause_store
+    if _clause_store is None:
+        _clause_store = ClauseStore()
+    return _clause_store
@@ -0,0 +1,14 @@
+"""
+上传文档包初始化文件
+"""
+
+from .document_store import (
+    DocumentError, DocumentNotFoundError, DocumentParseError, DocumentStore, DocumentTooLargeError,
+    UnsupportedDocumentError, get_document_store
+)
+from .extractors import SUPPORTED_FORMATS, detect_format
+
+__all__ = [
+    "DocumentError", "DocumentNotFoundError", "DocumentParseError", "DocumentStore", "DocumentTooLargeError",
+    "UnsupportedDocumentError", "get_document_store", "SUPPORTED_FORMATS", "detect_format"
+]
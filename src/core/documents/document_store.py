@@ -0,0 +1,245 @@
+"""
+上传文档存储
+将上传文件分块写入磁盘的同时增量提取文本，按内容哈希去重，同一文档只解析一次
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import aiofiles
+from loguru import logger
+
+try:
+    from src.utils.utils import get_config, get_data_dir
+except ImportError:
+    from ppgllm.src.utils import get_config, get_data_dir
+from .extractors import (
+    HTMLExtractor, TextExtractor, WhitespaceNormalizer,
+    detect_format, iter_docx_text, iter_pdf_text
+)
+
+_DOCUMENT_ID = re.compile(r"^[0-9a-f]{16}$")
+
+
+class DocumentError(Exception):
+    """文档处理错误"""
+
+
+class UnsupportedDocumentError(DocumentError):
+    """不支持的文档格式"""
+
+
+class DocumentParseError(DocumentError):
+    """文档内容损坏或无法解析"""
+
+
+class DocumentTooLargeError(DocumentError):
+    """文档超出大小上限"""
+
+
+class DocumentNotFoundError(DocumentError):
+    """文档不存在"""
+
+
+class DocumentStore:
+    """上传文档存储"""
+
+    def __init__(self, storage_dir: Optional[str] = None):
+        config = get_config().get("documents", {})
+        self.storage_dir = storage_dir or config.get("storage_dir") or os.path.join(get_data_dir(), "documents")
+        self.max_upload_bytes = int(config.get("max_upload_mb", 50) * 1024 * 1024)
+        self.chunk_size = config.get("chunk_size", 65536)
+        self.cache_size = config.get("cache_size", 16)
+        self._text_cache: "OrderedDict[str, str]" = OrderedDict()
+        os.makedirs(self.storage_dir, exist_ok=True)
+
+    def check_size(self, size: int, overhead: int = 0):
+        """
+        检查上传大小
+        Args:
+            size: 已接收的字节数
+            overhead: 请求体中文件内容之外的余量（multipart 分隔符和字段头）
+        Raises:
+            DocumentTooLargeError: 超出大小上限
+        """
+        if size > self.max_upload_bytes + overhead:
+            raise DocumentTooLargeError(f"文档超过大小上限 {self.max_upload_bytes // (1024 * 1024)}MB")
+
+    def _path(self, doc_id: str, suffix: str) -> str:
+        if not _DOCUMENT_ID.match(doc_id or ""):
+            raise DocumentNotFoundError(f"无效的文档ID: {doc_id}")
+        return os.path.join(self.storage_dir, f"{doc_id}{suffix}")
+
+    @staticmethod
+    def _remove(*paths: str):
+        for path in paths:
+            if path and os.path.exists(path):
+                os.remove(path)
+
+    async def save_upload(self, upload, filename: Optional[str] = None,
+                          content_type: Optional[str] = None) -> Dict[str, Any]:
+        """
+        流式保存上传文件并提取文本
+        Args:
+            upload: 支持 async read(size) 的上传文件对象（如 fastapi.UploadFile）
+            filename: 原始文件名
+            content_type: 文件类型
+        Returns:
+            文档元数据，deduplicated 表示内容已存在、未重复解析
+        Raises:
+            UnsupportedDocumentError: 无法识别的文档格式
+            DocumentTooLargeError: 超出大小上限
+            DocumentParseError: 文档内容损坏或无法解析
+        """
+        doc_format = detect_format(filename, content_type)
+        if doc_format is None:
+            raise UnsupportedDocumentError(f"不支持的文档格式: {filename or content_type}")
+
+        # txt/html 在接收过程中同步提取；docx/pdf 需要完整文件，接收后再解析
+        extractor_class = {"txt": TextExtractor, "html": HTMLExtractor}.get(doc_format)
+        extractor = extractor_class() if extractor_class else None
+        normalizer = WhitespaceNormalizer()
+        token = uuid.uuid4().hex
+        raw_tmp = os.path.join(self.storage_dir, f".{token}.upload")
+        text_tmp = os.path.join(self.storage_dir, f".{token}.txt")
+        digest = hashlib.sha256()
+        size = 0
+        chars = 0
+
+        try:
+            async with aiofiles.open(raw_tmp, "wb") as raw_file, aiofiles.open(text_tmp, "w", encoding="utf-8") as text_file:
+                while True:
+                    chunk = await upload.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    self.check_size(size)
+                    digest.update(chunk)
+                    await raw_file.write(chunk)
+                    if extractor is not None:
+                        text = normalizer.feed(extractor.feed(chunk))
+                        chars += len(text)
+                        await text_file.write(text)
+                if extractor is not None:
+                    text = normalizer.feed(extractor.close()) + normalizer.close()
+                    chars += len(text)
+                    await text_file.write(text)
+
+            doc_id = digest.hexdigest()[:16]
+            existing = await self.get_metadata(doc_id, missing_ok=True)
+            if existing is not None:
+                self._remove(raw_tmp, text_tmp)
+                logger.info(f"文档已存在，跳过解析: {doc_id}")
+                return {**existing, "deduplicated": True}
+
+            raw_path = self._path(doc_id, f".{doc_format}")
+            os.replace(raw_tmp, raw_path)
+            if extractor is None:
+                try:
+                    chars = await asyncio.to_thread(self._extract_file, raw_path, doc_format, text_tmp)
+                except BaseException:
+                    self._remove(raw_path)
+                    raise
+            os.replace(text_tmp, self._path(doc_id, ".txt"))
+        except BaseException:
+            self._remove(raw_tmp, text_tmp)
+            raise
+
+        metadata = {
+            "document_id": doc_id,
+            "filename": filename,
+            "format": doc_format,
+            "size": size,
+            "chars": chars,
+            "created_at": time.time()
+        }
+        async with aiofiles.open(self._path(doc_id, ".json"), "w", encoding="utf-8") as f:
+            await f.write(json.dumps(metadata, ensure_ascii=False))
+        logger.info(f"文档解析完成: {doc_id} ({doc_format}, {size} 字节, {chars} 字符)")
+        return {**metadata, "deduplicated": False}
+
+    @staticmethod
+    def _extract_file(path: str, doc_format: str, text_path: str) -> int:
+        """
+        在线程中逐段解析DOCX/PDF并写入文本文件，返回字符数
+        Raises:
+            UnsupportedDocumentError: 缺少该格式的解析依赖
+            DocumentParseError: 文件损坏或不是声明的格式
+        """
+        normalizer = WhitespaceNormalizer()
+        chars = 0
+        with open(text_path, "w", encoding="utf-8") as f:
+            try:
+                pages = iter_docx_text(path) if doc_format == "docx" else iter_pdf_text(path)
+                for page in pages:
+                    text = normalizer.feed(page)
+                    chars += len(text)
+                    f.write(text)
+            except RuntimeError as e:
+                raise UnsupportedDocumentError(str(e))
+            except OSError:
+                raise
+            except Exception as e:
+                # 解析库对损坏文件抛出的异常类型各异（BadZipFile、XML解析错误、pypdf错误等）
+                raise DocumentParseError(f"{doc_format.upper()} 文档无法解析: {str(e)}")
+            text = normalizer.close()
+            chars += len(text)
+            f.write(text)
+        return chars
+
+    async def get_metadata(self, doc_id: str, missing_ok: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        获取文档元数据
+        Args:
+            doc_id: 文档ID
+            missing_ok: 文档不存在时返回None而不是抛出异常
+        Raises:
+            DocumentNotFoundError: 文档不存在
+        """
+        path = self._path(doc_id, ".json")
+        if not os.path.exists(path):
+            if missing_ok:
+                return None
+            raise DocumentNotFoundError(f"文档不存在: {doc_id}")
+        async with aiofiles.open(path, "r", encoding="utf-8") as f:
+            return json.loads(await f.read())
+
+    async def get_text(self, doc_id: str) -> str:
+        """
+        获取文档规范化后的文本（带LRU缓存）
+        Args:
+            doc_id: 文档ID
+        Raises:
+            DocumentNotFoundError: 文档不存在
+        """
+        if doc_id in self._text_cache:
+            self._text_cache.move_to_end(doc_id)
+            return self._text_cache[doc_id]
+        path = self._path(doc_id, ".txt")
+        if not os.path.exists(path):
+            raise DocumentNotFoundError(f"文档不存在: {doc_id}")
+        async with aiofiles.open(path, "r", encoding="utf-8") as f:
+            text = await f.read()
+        self._text_cache[doc_id] = text
+        while len(self._text_cache) > self.cache_size:
+            self._text_cache.popitem(last=False)
+        return text
+
+
+# 全局文档存储实例
+_document_store: Optional[DocumentStore] = None
+
+
+def get_document_store() -> DocumentStore:
+    """获取文档存储实例"""
+    global _document_store
+    if _document_store is None:
+        _document_store = DocumentStore()
+    return _document_store
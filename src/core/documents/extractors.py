@@ -0,0 +1,218 @@
+"""
+文档文本提取器
+按块增量解析上传内容并规范化空白，避免整份文档多次驻留内存
+"""
+
+import codecs
+import re
+import zipfile
+from html.parser import HTMLParser
+from typing import Iterator, Optional
+from xml.etree.ElementTree import iterparse
+
+# 支持的文档格式（按扩展名）
+SUPPORTED_FORMATS = {
+    ".txt": "txt",
+    ".md": "txt",
+    ".html": "html",
+    ".htm": "html",
+    ".docx": "docx",
+    ".pdf": "pdf",
+}
+
+# 按Content-Type识别格式（扩展名缺失时使用）
+CONTENT_TYPE_FORMATS = {
+    "text/plain": "txt",
+    "text/markdown": "txt",
+    "text/html": "html",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": "docx",
+    "application/pdf": "pdf",
+}
+
+_INLINE_SPACE = re.compile(r"[ \t\f\v 　]+")
+
+
+class WhitespaceNormalizer:
+    """增量空白规范化：行内连续空白合并为一个空格，连续空行合并为一个"""
+
+    def __init__(self):
+        self._pending = ""  # 尚未结束的末行
+        self._started = False
+        self._blank = False
+
+    def _emit(self, lines) -> str:
+        output = []
+        for line in lines:
+            normalized = _INLINE_SPACE.sub(" ", line).strip()
+            if not normalized:
+                self._blank = True
+                continue
+            if self._blank and self._started:
+                output.append("\n")
+            output.append(normalized + "\n")
+            self._started = True
+            self._blank = False
+        return "".join(output)
+
+    def feed(self, text: str) -> str:
+        """
+        追加文本
+        Args:
+            text: 新提取的文本
+        Returns:
+            已完整的规范化文本行
+        """
+        text = (self._pending + text).replace("\r\n", "\n")
+        if text.endswith("\r"):
+            # \r\n 可能被分在两个块中
+            text, self._pending = text[:-1], "\r"
+        else:
+            self._pending = ""
+        lines = text.replace("\r", "\n").split("\n")
+        self._pending = lines.pop() + self._pending
+        return self._emit(lines)
+
+    def close(self) -> str:
+        """输出剩余文本"""
+        tail = self._emit([self._pending.replace("\r", "")])
+        self._pending = ""
+        return tail
+
+
+class TextExtractor:
+    """纯文本提取器，自动识别UTF-8/GB18030编码"""
+
+    def __init__(self):
+        self._decoder: Optional[codecs.IncrementalDecoder] = None
+
+    def _detect(self, data: bytes) -> codecs.IncrementalDecoder:
+        if data.startswith(codecs.BOM_UTF8):
+            return codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+        try:
+            # 忽略末尾可能被截断的多字节字符
+            codecs.getincrementaldecoder("utf-8")(errors="strict").decode(data, final=False)
+            return codecs.getincrementaldecoder("utf-8")(errors="replace")
+        except UnicodeDecodeError:
+            return codecs.getincrementaldecoder("gb18030")(errors="replace")
+
+    def feed(self, data: bytes) -> str:
+        if self._decoder is None:
+            self._decoder = self._detect(data)
+        return self._decoder.decode(data, final=False)
+
+    def close(self) -> str:
+        return self._decoder.decode(b"", final=True) if self._decoder else ""
+
+
+class _BoilerplateStrippingParser(HTMLParser):
+    """去除脚本、样式和导航等页面模板内容的HTML解析器"""
+
+    SKIP_TAGS = {"script", "style", "noscript", "nav", "header", "footer", "aside",
+                 "form", "iframe", "svg", "template", "head", "button"}
+    BLOCK_TAGS = {"p", "div", "br", "li", "tr", "section", "article", "table", "ul", "ol",
+                  "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "pre", "hr", "dd", "dt"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self._skip_depth = 0
+        self._parts = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in self.BLOCK_TAGS and not self._skip_depth:
+            self._parts.append("\n\n" if tag.startswith("h") or tag == "p" else "\n")
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in self.BLOCK_TAGS and not self._skip_depth:
+            self._parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in self.BLOCK_TAGS and not self._skip_depth:
+            self._parts.append("\n\n" if tag.startswith("h") or tag == "p" else "\n")
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self._parts.append(data)
+
+    def drain(self) -> str:
+        text = "".join(self._parts)
+        self._parts = []
+        return text
+
+
+class HTMLExtractor:
+    """HTML正文提取器"""
+
+    def __init__(self):
+        self._decoder = TextExtractor()
+        self._parser = _BoilerplateStrippingParser()
+
+    def feed(self, data: bytes) -> str:
+        self._parser.feed(self._decoder.feed(data))
+        return self._parser.drain()
+
+    def close(self) -> str:
+        self._parser.feed(self._decoder.close())
+        self._parser.close()
+        return self._parser.drain()
+
+
+def iter_docx_text(path: str) -> Iterator[str]:
+    """
+    流式提取DOCX正文（逐段落解析 word/document.xml）
+    Args:
+        path: 文件路径
+    Returns:
+        段落文本迭代器
+    """
+    namespace = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+    with zipfile.ZipFile(path) as archive:
+        with archive.open("word/document.xml") as document:
+            parts = []
+            for event, element in iterparse(document, events=("end",)):
+                if element.tag == f"{namespace}t" and element.text:
+                    parts.append(element.text)
+                elif element.tag == f"{namespace}tab":
+                    parts.append(" ")
+                elif element.tag == f"{namespace}p":
+                    yield "".join(parts) + "\n\n"
+                    parts = []
+                    element.clear()
+
+
+def iter_pdf_text(path: str) -> Iterator[str]:
+    """
+    逐页提取PDF文本
+    Args:
+        path: 文件路径
+    Returns:
+        页面文本迭代器
+    Raises:
+        RuntimeError: 未安装pypdf
+    """
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise RuntimeError("解析PDF需要安装pypdf: pip install pypdf")
+    reader = PdfReader(path)
+    for page in reader.pages:
+        yield (page.extract_text() or "") + "\n\n"
+
+
+def detect_format(filename: Optional[str], content_type: Optional[str]) -> Optional[str]:
+    """
+    根据文件名和Content-Type识别文档格式
+    Returns:
+        txt/html/docx/pdf，无法识别时返回None
+    """
+    if filename:
+        lowered = filename.lower()
+        for extension, doc_format in SUPPORTED_FORMATS.items():
+            if lowered.endswith(extension):
+                return doc_format
+    if content_type:
+        return CONTENT_TYPE_FORMATS.get(content_type.split(";")[0].strip().lower())
+    return None
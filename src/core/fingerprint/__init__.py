@@ -0,0 +1,11 @@
+"""
+近似重复检测包初始化文件
+"""
+
+from .index import Fingerprint, FingerprintIndex, get_fingerprint_index
+from .minhash import MinHasher, estimate_similarity, normalize_text, shingles
+
+__all__ = [
+    "Fingerprint", "FingerprintIndex", "get_fingerprint_index",
+    "MinHasher", "estimate_similarity", "normalize_text", "shingles"
+]
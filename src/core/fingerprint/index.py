@@ -0,0 +1,297 @@
+"""
+近似重复文档索引
+对提交给检测Agent的隐私政策建立MinHash/LSH索引，查找模板相同、仅少量改动的历史文档及其检测结果
+"""
+
+import asyncio
+import difflib
+import hashlib
+import json
+import os
+import time
+from array import array
+from typing import Any, Dict, List, NamedTuple, Optional, Set
+
+import aiofiles
+from loguru import logger
+
+try:
+    from src.utils.utils import get_config, get_data_dir
+except ImportError:
+    from ppgllm.src.utils import get_config, get_data_dir
+from .minhash import MinHasher, estimate_similarity, normalize_text, shingles
+
+
+class Fingerprint(NamedTuple):
+    """文档指纹"""
+    fingerprint_id: str  # 规范化文本的哈希，内容相同则ID相同
+    signature: array
+    length: int
+
+
+class FingerprintIndex:
+    """MinHash/LSH近似重复索引"""
+
+    def __init__(self, storage_dir: Optional[str] = None):
+        config = get_config().get("fingerprint", {})
+        self.storage_dir = storage_dir or config.get("storage_dir") or os.path.join(get_data_dir(), "fingerprints")
+        self.hasher = MinHasher(config.get("num_perm", 128), config.get("shingle_size", 4))
+        self.bands = config.get("bands", 16)
+        self.rows = self.hasher.num_perm // self.bands
+        self.match_threshold = config.get("match_threshold", 0.8)
+        self.reuse_threshold = config.get("reuse_threshold", 0.95)
+        # 索引文档数上限，超出时淘汰最早加入的文档
+        self.max_documents = config.get("max_documents", 10000)
+        self.index_file = os.path.join(self.storage_dir, "index.jsonl")
+        self.text_dir = os.path.join(self.storage_dir, "texts")
+        # {指纹ID: {"signature", "length", "created_at", "results": {结果键: 检测结果}}}
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._buckets: List[Dict[int, Set[str]]] = [{} for _ in range(self.bands)]
+        self._lock = asyncio.Lock()
+        self._stats = {"queries": 0, "matches": 0, "reused": 0, "query_ms": 0.0, "evicted": 0, "compactions": 0}
+        # 索引文件中的记录数与仍有效的记录数（每个 文档×结果键 一条），相差过大时压缩索引文件
+        self._file_records = 0
+        self._live_records = 0
+        os.makedirs(self.text_dir, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        """加载已持久化的索引（同一指纹的多条记录依次合并），超出上限或冗余记录过多时在启动时压缩"""
+        if not os.path.exists(self.index_file):
+            return
+        try:
+            with open(self.index_file, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        self._merge(record["fingerprint_id"], array("Q", record["signature"]), record["length"],
+                                    record["result_key"], record["result"], record["created_at"])
+                        self._file_records += 1
+            evicted = self._evict()
+            if self._needs_compaction(evicted):
+                self._write_compacted(self._snapshot(), evicted)
+            logger.info(f"近似重复索引加载完成: {len(self._entries)} 篇文档")
+        except Exception as e:
+            logger.error(f"读取近似重复索引失败: {str(e)}")
+
+    def _band_keys(self, signature: array):
+        for band in range(self.bands):
+            yield band, hash(tuple(signature[band * self.rows:(band + 1) * self.rows]))
+
+    def _merge(self, fingerprint_id: str, signature: array, length: int,
+               result_key: str, result: Dict[str, Any], created_at: float):
+        entry = self._entries.get(fingerprint_id)
+        if entry is None:
+            entry = {"signature": signature, "length": length, "created_at": created_at, "results": {}}
+            self._entries[fingerprint_id] = entry
+            for band, key in self._band_keys(signature):
+                self._buckets[band].setdefault(key, set()).add(fingerprint_id)
+        if result_key not in entry["results"]:
+            self._live_records += 1
+        entry["results"][result_key] = {**result, "created_at": created_at}
+
+    def _evict(self) -> List[str]:
+        """超出上限时淘汰最早加入的文档至上限的90%（批量淘汰，避免每次写入都压缩索引文件），返回被淘汰的指纹ID"""
+        evicted = []
+        if len(self._entries) <= self.max_documents:
+            return evicted
+        while len(self._entries) > int(self.max_documents * 0.9):
+            fingerprint_id = next(iter(self._entries))
+            entry = self._entries.pop(fingerprint_id)
+            for band, key in self._band_keys(entry["signature"]):
+                bucket = self._buckets[band].get(key)
+                if bucket is not None:
+                    bucket.discard(fingerprint_id)
+                    if not bucket:
+                        del self._buckets[band][key]
+            self._live_records -= len(entry["results"])
+            evicted.append(fingerprint_id)
+        self._stats["evicted"] += len(evicted)
+        return evicted
+
+    def _needs_compaction(self, evicted: List[str]) -> bool:
+        """有文档被淘汰，或索引文件中被覆盖的旧记录超过有效记录数时需要压缩"""
+        return bool(evicted) or self._file_records > 2 * self._live_records + 100
+
+    def _snapshot(self) -> List[tuple]:
+        """当前有效记录的浅拷贝，序列化在线程中进行"""
+        return [(fingerprint_id, entry["signature"], entry["length"], dict(entry["results"]))
+                for fingerprint_id, entry in self._entries.items()]
+
+    def _write_compacted(self, snapshot: List[tuple], evicted: List[str]):
+        """重写索引文件（每个 文档×结果键 一行）并删除被淘汰文档的原文"""
+        temp_file = self.index_file + ".tmp"
+        records = 0
+        with open(temp_file, "w", encoding="utf-8") as f:
+            for fingerprint_id, signature, length, results in snapshot:
+                for result_key, result in results.items():
+                    f.write(json.dumps({
+                        "fingerprint_id": fingerprint_id,
+                        "signature": list(signature),
+                        "length": length,
+                        "result_key": result_key,
+                        "result": {key: value for key, value in result.items() if key != "created_at"},
+                        "created_at": result["created_at"]
+                    }, ensure_ascii=False) + "\n")
+                    records += 1
+        os.replace(temp_file, self.index_file)
+        self._file_records = records
+        self._stats["compactions"] += 1
+        for fingerprint_id in evicted:
+            try:
+                os.remove(self._text_path(fingerprint_id))
+            except FileNotFoundError:
+                pass
+
+    def fingerprint(self, text: str) -> Fingerprint:
+        """
+        计算文本指纹
+        Args:
+            text: 隐私政策文本
+        Returns:
+            文档指纹
+        """
+        normalized = normalize_text(text)
+        fingerprint_id = hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:16]
+        signature = self.hasher.signature_from_shingles(shingles(normalized, self.hasher.shingle_size))
+        return Fingerprint(fingerprint_id, signature, len(normalized))
+
+    async def fingerprint_async(self, text: str) -> Fingerprint:
+        """在线程中计算文本指纹，长文档的MinHash计算不阻塞事件循环"""
+        return await asyncio.to_thread(self.fingerprint, text)
+
+    def query(self, fingerprint: Fingerprint, result_key: Optional[str] = None,
+              top_k: int = 5, threshold: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        查找近似重复文档
+        Args:
+            fingerprint: 待查询文档的指纹
+            result_key: 仅返回包含该检测结果的文档（如 compliance_checker）
+            top_k: 返回数量
+            threshold: 相似度阈值，默认使用配置值
+        Returns:
+            按相似度降序排列的匹配列表
+        """
+        start = time.perf_counter()
+        threshold = self.match_threshold if threshold is None else threshold
+        candidates: Set[str] = set()
+        if fingerprint.fingerprint_id in self._entries:
+            candidates.add(fingerprint.fingerprint_id)
+        for band, key in self._band_keys(fingerprint.signature):
+            candidates.update(self._buckets[band].get(key, ()))
+
+        matches = []
+        for candidate in candidates:
+            entry = self._entries[candidate]
+            if result_key and result_key not in entry["results"]:
+                continue
+            exact = candidate == fingerprint.fingerprint_id
+            similarity = 1.0 if exact else estimate_similarity(fingerprint.signature, entry["signature"])
+            if similarity >= threshold:
+                matches.append({
+                    "fingerprint_id": candidate,
+                    "similarity": round(similarity, 4),
+                    "exact": exact,
+                    "results": entry["results"]
+                })
+        matches.sort(key=lambda match: match["similarity"], reverse=True)
+
+        self._stats["queries"] += 1
+        self._stats["matches"] += int(bool(matches))
+        self._stats["query_ms"] += (time.perf_counter() - start) * 1000
+        return matches[:top_k]
+
+    def best_match(self, fingerprint: Fingerprint, result_key: str) -> Optional[Dict[str, Any]]:
+        """查找包含指定检测结果的最相似文档"""
+        matches = self.query(fingerprint, result_key=result_key, top_k=1)
+        return matches[0] if matches else None
+
+    def record_reuse(self):
+        """记录一次复用历史检测结果"""
+        self._stats["reused"] += 1
+
+    async def add(self, fingerprint: Fingerprint, text: str, result_key: str, result: Dict[str, Any]):
+        """
+        将文档及其检测结果加入索引
+        Args:
+            fingerprint: 文档指纹
+            text: 原文，用于后续与新文档对比差异
+            result_key: 检测结果键
+            result: 检测结果
+        """
+        created_at = time.time()
+        is_new = fingerprint.fingerprint_id not in self._entries
+        self._merge(fingerprint.fingerprint_id, fingerprint.signature, fingerprint.length,
+                    result_key, result, created_at)
+        evicted = self._evict()
+        record = {
+            "fingerprint_id": fingerprint.fingerprint_id,
+            "signature": list(fingerprint.signature),
+            "length": fingerprint.length,
+            "result_key": result_key,
+            "result": result,
+            "created_at": created_at
+        }
+        try:
+            async with self._lock:
+                if is_new:
+                    async with aiofiles.open(self._text_path(fingerprint.fingerprint_id), "w", encoding="utf-8") as f:
+                        await f.write(text)
+                async with aiofiles.open(self.index_file, "a", encoding="utf-8") as f:
+                    await f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                self._file_records += 1
+                if self._needs_compaction(evicted):
+                    await asyncio.to_thread(self._write_compacted, self._snapshot(), evicted)
+        except Exception as e:
+            logger.error(f"写入近似重复索引失败: {str(e)}")
+
+    def _text_path(self, fingerprint_id: str) -> str:
+        return os.path.join(self.text_dir, f"{fingerprint_id}.txt")
+
+    async def diff(self, fingerprint_id: str, text: str, max_lines: int = 200) -> Optional[str]:
+        """
+        生成新文档与已索引文档的差异（unified diff）
+        Args:
+            fingerprint_id: 已索引文档的指纹ID
+            text: 新文档文本
+            max_lines: 差异最大行数
+        Returns:
+            差异文本，原文不存在时返回None
+        """
+        path = self._text_path(fingerprint_id)
+        if fingerprint_id not in self._entries or not os.path.exists(path):
+            return None
+        async with aiofiles.open(path, "r", encoding="utf-8") as f:
+            previous = await f.read()
+
+        def build_diff() -> str:
+            lines = difflib.unified_diff(previous.splitlines(), text.splitlines(),
+                                         fromfile=fingerprint_id, tofile="current", lineterm="")
+            return "\n".join(line for _, line in zip(range(max_lines), lines))
+
+        return await asyncio.to_thread(build_diff)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取索引统计信息"""
+        queries = self._stats["queries"]
+        return {
+            "documents": len(self._entries),
+            "queries": queries,
+            "matches": self._stats["matches"],
+            "reused": self._stats["reused"],
+            "evicted": self._stats["evicted"],
+            "compactions": self._stats["compactions"],
+            "avg_query_ms": round(self._stats["query_ms"] / queries, 4) if queries else 0.0
+        }
+
+
+# 全局近似重复索引实例
+_fingerprint_index: Optional[FingerprintIndex] = None
+
+
+def get_fingerprint_index() -> FingerprintIndex:
+    """获取近似重复索引实例"""
+    global _fingerprint_index
+    if _fingerprint_index is None:
+        _fingerprint_index = FingerprintIndex()
+    return _fingerprint_index
@@ -0,0 +1,87 @@
+"""
+MinHash指纹
+基于字符shingle的MinHash签名，适用于不分词的中文文本；
+采用单次哈希分桶（one permutation hashing）加空桶填充，每个shingle只计算一次哈希
+"""
+
+import hashlib
+import re
+import unicodedata
+from array import array
+from typing import Iterable, Set
+
+# 去除空白和标点，仅保留文字、字母和数字
+_NON_WORD = re.compile(r"[\W_]+", re.UNICODE)
+_EMPTY = (1 << 64) - 1
+
+
+def normalize_text(text: str) -> str:
+    """
+    规范化文本：全角转半角、转小写、去除空白和标点
+    模板化隐私政策之间的差异多为排版和标点，规范化后再计算指纹
+    """
+    return _NON_WORD.sub("", unicodedata.normalize("NFKC", text).lower())
+
+
+def shingles(text: str, size: int = 4) -> Set[str]:
+    """
+    提取字符shingle
+    Args:
+        text: 规范化后的文本
+        size: shingle长度（字符数）
+    Returns:
+        shingle集合
+    """
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[index:index + size] for index in range(len(text) - size + 1)}
+
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class MinHasher:
+    """MinHash签名生成器"""
+
+    def __init__(self, num_perm: int = 128, shingle_size: int = 4):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+
+    def signature_from_shingles(self, items: Iterable[str]) -> array:
+        """
+        由shingle集合计算签名
+        Returns:
+            长度为num_perm的无符号64位整数数组
+        """
+        num_perm = self.num_perm
+        bins = [_EMPTY] * num_perm
+        for item in items:
+            value = _hash64(item)
+            index = value % num_perm
+            value //= num_perm
+            if value < bins[index]:
+                bins[index] = value
+        # 空桶按循环顺序借用下一个非空桶的值（带偏移区分），保持估计无偏
+        if any(value == _EMPTY for value in bins) and any(value != _EMPTY for value in bins):
+            filled = list(bins)
+            for index in range(num_perm):
+                if bins[index] != _EMPTY:
+                    continue
+                step = 1
+                while bins[(index + step) % num_perm] == _EMPTY:
+                    step += 1
+                filled[index] = (bins[(index + step) % num_perm] + step * 0x9E3779B97F4A7C15) & _EMPTY
+            bins = filled
+        return array("Q", bins)
+
+    def signature(self, text: str) -> array:
+        """计算文本的MinHash签名"""
+        return self.signature_from_shingles(shingles(normalize_text(text), self.shingle_size))
+
+
+def estimate_similarity(first: array, second: array) -> float:
+    """由两个签名估计Jaccard相似度"""
+    if not first or len(first) != len(second):
+        return 0.0
+    return sum(1 for a, b in zip(first, second) if a == b) / len(first)
@@ -0,0 +1,7 @@
+"""
+向量库写入队列包初始化文件
+"""
+
+from .vector_queue import IngestionBackpressureError, VectorStoreQueue, get_vector_store_queue
+
+__all__ = ["IngestionBackpressureError", "VectorStoreQueue", "get_vector_store_queue"]
@@ -0,0 +1,349 @@
+"""
+向量库写入队列
+调用方写入本地持久化队列后立即返回，后台任务按批发送到向量库，失败时指数退避重试；
+队列文件记录已确认的偏移量，服务重启后从未确认的位置继续发送。队列已满时对调用方施加背压
+"""
+
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+import httpx
+from loguru import logger
+
+try:
+    from src.utils.utils import get_config, get_data_dir, parse_vector_store_result
+except ImportError:
+    from ppgllm.src.utils import get_config, get_data_dir, parse_vector_store_result
+
+
+class IngestionBackpressureError(Exception):
+    """写入队列已满，调用方应稍后重试"""
+
+    def __init__(self, pending: int, max_pending: int):
+        self.pending = pending
+        self.max_pending = max_pending
+        super().__init__(f"向量库写入队列已满（{pending}/{max_pending}）")
+
+
+class _TransientError(Exception):
+    """可重试的发送失败（网络错误、超时、5xx、429）"""
+
+
+class VectorStoreQueue:
+    """向量库写入队列（至少一次投递）"""
+
+    SPOOL_FILE = "spool.jsonl"
+    OFFSET_FILE = "spool.offset"
+    DEAD_LETTER_FILE = "dead_letter.jsonl"
+
+    def __init__(self, spool_dir: Optional[str] = None):
+        config = get_config()
+        queue_config = config.get("vector_ingestion", {})
+        self.url = (config.get("learning", {}).get("write_vector_store", {}) or {}).get("url") or ""
+        self.spool_dir = spool_dir or queue_config.get("spool_dir") or os.path.join(get_data_dir(), "vector_spool")
+        self.batch_size = queue_config.get("batch_size", 32)
+        self.flush_interval = queue_config.get("flush_interval", 1.0)
+        self.max_pending = queue_config.get("max_pending", 10000)
+        self.enqueue_timeout = queue_config.get("enqueue_timeout", 5.0)
+        self.max_attempts = queue_config.get("max_attempts", 5)
+        self.backoff_base = queue_config.get("backoff_base", 0.5)
+        self.backoff_max = queue_config.get("backoff_max", 30.0)
+        self.request_timeout = queue_config.get("request_timeout", 10.0)
+        self.concurrency = queue_config.get("concurrency", 8)
+        self.fsync = queue_config.get("fsync", False)
+        self.compact_bytes = queue_config.get("compact_bytes", 1024 * 1024)
+
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self._spool_path = os.path.join(self.spool_dir, self.SPOOL_FILE)
+        self._offset_path = os.path.join(self.spool_dir, self.OFFSET_FILE)
+        self._file_lock = threading.Lock()
+        # 写入队列文件和加入 _pending 在同一把锁内完成，保证 _pending 与文件顺序一致，
+        # 否则先完成的确认可能越过仍在写入的较早条目，重启后该条目丢失
+        self._append_lock = asyncio.Lock()
+        # 未确认的条目 {"id", "end": 结束偏移, "enqueued_at", "data", "attempts", "done"}
+        # 偏移量为逻辑偏移：队列文件中的位置加上已压缩掉的字节数，压缩时无需修改条目
+        self._pending: Deque[Dict[str, Any]] = deque()
+        self._acked_offset = 0
+        self._compacted = 0
+        self._load()
+
+        self._has_items = asyncio.Event()
+        self._has_space = asyncio.Event()
+        self._has_space.set()
+        self._worker: Optional[asyncio.Task] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._stopping = False
+        self._failures = 0
+        self._stats = {
+            "enqueued": 0, "sent": 0, "batches": 0, "retries": 0, "dead_lettered": 0,
+            "backpressure_waits": 0, "backpressure_rejections": 0, "recovered": len(self._pending)
+        }
+        self._last_error: Optional[str] = None
+        self._last_success_at: Optional[float] = None
+        self._batch_ms: Deque[float] = deque(maxlen=200)
+
+    def _load(self):
+        """从队列文件恢复未确认的条目"""
+        if os.path.exists(self._offset_path):
+            with open(self._offset_path, "r", encoding="utf-8") as f:
+                self._acked_offset = int(f.read().strip() or 0)
+        if not os.path.exists(self._spool_path):
+            return
+        with open(self._spool_path, "rb") as f:
+            f.seek(self._acked_offset)
+            offset = self._acked_offset
+            for line in f:
+                offset += len(line)
+                if not line.endswith(b"\n"):
+                    # 写入中断的不完整行
+                    break
+                record = json.loads(line)
+                self._pending.append({**record, "end": offset, "attempts": 0, "done": False})
+        if self._pending:
+            logger.info(f"向量库写入队列恢复 {len(self._pending)} 条未发送数据")
+
+    def _append(self, record: Dict[str, Any]) -> int:
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._file_lock:
+            with open(self._spool_path, "ab") as f:
+                f.write(line)
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+                return f.tell() + self._compacted
+
+    def _write_offset(self, offset: int):
+        temp_path = self._offset_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(str(offset))
+        os.replace(temp_path, self._offset_path)
+
+    def _compact(self, position: int):
+        """丢弃队列文件中已确认的部分"""
+        with self._file_lock:
+            with open(self._spool_path, "rb") as f:
+                f.seek(position)
+                remaining = f.read()
+            temp_path = self._spool_path + ".tmp"
+            with open(temp_path, "wb") as f:
+                f.write(remaining)
+            # 先将偏移量归零再替换队列文件：两步之间崩溃只会重发已确认的数据，不会跳过未发送的数据
+            self._write_offset(0)
+            os.replace(temp_path, self._spool_path)
+            self._compacted += position
+
+    async def _persist(self, record: Dict[str, Any]):
+        async with self._append_lock:
+            end = await asyncio.to_thread(self._append, record)
+            self._pending.append({**record, "end": end, "attempts": 0, "done": False})
+
+    async def enqueue(self, vector_data: Dict[str, Any], wait: bool = True) -> str:
+        """
+        写入一条向量数据，持久化到本地队列后返回，不等待远程服务
+        Args:
+            vector_data: 要存储的向量数据
+            wait: 队列已满时是否等待空间（最长 enqueue_timeout 秒）
+        Returns:
+            条目ID
+        Raises:
+            IngestionBackpressureError: 队列已满且等待超时（或不等待）
+        """
+        if len(self._pending) >= self.max_pending:
+            if not wait:
+                self._stats["backpressure_rejections"] += 1
+                raise IngestionBackpressureError(len(self._pending), self.max_pending)
+            self._stats["backpressure_waits"] += 1
+            deadline = time.monotonic() + self.enqueue_timeout
+            while len(self._pending) >= self.max_pending:
+                self._has_space.clear()
+                try:
+                    await asyncio.wait_for(self._has_space.wait(), max(deadline - time.monotonic(), 0))
+                except asyncio.TimeoutError:
+                    self._stats["backpressure_rejections"] += 1
+                    raise IngestionBackpressureError(len(self._pending), self.max_pending)
+
+        record = {"id": uuid.uuid4().hex, "enqueued_at": time.time(), "data": vector_data}
+        # 调用方取消时写入仍需完成并加入 _pending，否则已写入文件的条目会被后续确认越过
+        await asyncio.shield(self._persist(record))
+        self._stats["enqueued"] += 1
+        self._has_items.set()
+        return record["id"]
+
+    async def _send(self, entry: Dict[str, Any]) -> Optional[str]:
+        """
+        发送一条数据
+        Returns:
+            None表示成功，否则为服务端拒绝的原因
+        Raises:
+            _TransientError: 可重试的失败
+        """
+        try:
+            response = await self._client.post(self.url, json=entry["data"])
+        except httpx.HTTPError as e:
+            raise _TransientError(f"{type(e).__name__}: {str(e)}")
+        if response.status_code == 429 or response.status_code >= 500:
+            raise _TransientError(f"HTTP {response.status_code}")
+        if response.status_code >= 400:
+            return f"HTTP {response.status_code}: {response.text[:200]}"
+        try:
+            success, reason = parse_vector_store_result(response.json())
+        except ValueError:
+            return f"返回内容不是JSON: {response.text[:200]}"
+        return None if success else reason
+
+    def _dead_letter(self, entry: Dict[str, Any], reason: str):
+        record = {"id": entry["id"], "enqueued_at": entry["enqueued_at"], "reason": reason, "data": entry["data"]}
+        with open(os.path.join(self.spool_dir, self.DEAD_LETTER_FILE), "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    async def _process_batch(self, batch: List[Dict[str, Any]]) -> bool:
+        """并发发送一批数据，返回是否出现可重试的失败"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        transient = False
+
+        async def process(entry: Dict[str, Any]):
+            nonlocal transient
+            async with semaphore:
+                try:
+                    reason = await self._send(entry)
+                except _TransientError as e:
+                    transient = True
+                    self._last_error = str(e)
+                    return
+            entry["attempts"] += 1
+            if reason is None:
+                entry["done"] = True
+                self._stats["sent"] += 1
+                self._last_success_at = time.time()
+            elif entry["attempts"] >= self.max_attempts:
+                # 服务端多次拒绝的数据转入死信文件，避免阻塞后续数据
+                logger.error(f"向量数据写入被拒绝 {entry['attempts']} 次，转入死信文件: {reason}")
+                await asyncio.to_thread(self._dead_letter, entry, reason)
+                entry["done"] = True
+                self._stats["dead_lettered"] += 1
+            else:
+                self._last_error = reason
+                self._stats["retries"] += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*[process(entry) for entry in batch])
+        self._batch_ms.append((time.perf_counter() - start) * 1000)
+        self._stats["batches"] += 1
+        await self._ack()
+        return transient or any(not entry["done"] for entry in batch)
+
+    async def _ack(self):
+        """确认队首连续已完成的条目，更新持久化偏移量"""
+        acked = None
+        while self._pending and self._pending[0]["done"]:
+            acked = self._pending.popleft()["end"]
+        if acked is None:
+            return
+        self._acked_offset = acked
+        position = acked - self._compacted
+        if position >= self.compact_bytes:
+            await asyncio.to_thread(self._compact, position)
+        else:
+            await asyncio.to_thread(self._write_offset, position)
+        if len(self._pending) < self.max_pending:
+            self._has_space.set()
+
+    def _next_batch(self) -> List[Dict[str, Any]]:
+        batch = []
+        for entry in self._pending:
+            if not entry["done"]:
+                batch.append(entry)
+                if len(batch) >= self.batch_size:
+                    break
+        return batch
+
+    async def _run(self):
+        while not self._stopping:
+            batch = self._next_batch()
+            if not batch:
+                self._has_items.clear()
+                await self._has_items.wait()
+                continue
+            # 凑满一批或最早的数据已等待 flush_interval 后发送
+            if len(batch) < self.batch_size:
+                wait = self.flush_interval - (time.time() - batch[0]["enqueued_at"])
+                if wait > 0:
+                    self._has_items.clear()
+                    try:
+                        await asyncio.wait_for(self._has_items.wait(), wait)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+            if await self._process_batch(batch):
+                self._failures += 1
+                delay = min(self.backoff_max, self.backoff_base * 2 ** (self._failures - 1))
+                delay *= random.uniform(0.5, 1.0)
+                logger.warning(f"向量库写入失败，{delay:.1f} 秒后重试: {self._last_error}")
+                await asyncio.sleep(delay)
+            else:
+                self._failures = 0
+
+    async def start(self):
+        """启动后台发送任务；未配置向量库地址时只入队不发送"""
+        if self._worker is not None:
+            return
+        if not self.url:
+            logger.warning("未配置 learning.write_vector_store.url，向量数据只写入本地队列")
+            return
+        self._stopping = False
+        self._client = httpx.AsyncClient(timeout=self.request_timeout)
+        self._worker = asyncio.create_task(self._run())
+        if self._pending:
+            self._has_items.set()
+
+    async def stop(self, timeout: float = 5.0):
+        """停止后台任务，最多等待 timeout 秒发送剩余数据；未发送的数据保留在队列文件中"""
+        if self._worker is None:
+            return
+        deadline = time.monotonic() + timeout
+        while self._next_batch() and time.monotonic() < deadline and not self._failures:
+            await asyncio.sleep(0.05)
+        self._stopping = True
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+        await self._client.aclose()
+        logger.info(f"向量库写入队列已停止，剩余 {len(self._pending)} 条数据将在下次启动时发送")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取队列积压、延迟和发送统计"""
+        oldest = self._pending[0]["enqueued_at"] if self._pending else None
+        ordered = sorted(self._batch_ms)
+        return {
+            "running": self._worker is not None,
+            "pending": len(self._pending),
+            "max_pending": self.max_pending,
+            "lag_seconds": round(time.time() - oldest, 3) if oldest else 0.0,
+            "consecutive_failures": self._failures,
+            "last_error": self._last_error,
+            "last_success_at": self._last_success_at,
+            "batch_ms_p50": round(ordered[len(ordered) // 2], 3) if ordered else 0.0,
+            **self._stats
+        }
+
+
+# 全局向量库写入队列实例
+_vector_store_queue: Optional[VectorStoreQueue] = None
+
+
+def get_vector_store_queue() -> VectorStoreQueue:
+    """获取向量库写入队列实例"""
+    global _vector_store_queue
+    if _vector_store_queue is None:
+        _vector_store_queue = VectorStoreQueue()
+    return _vector_store_queue
@@ -0,0 +1,7 @@
+"""
+意图分类包初始化文件
+"""
+
+from .classifier import IntentClassifier, get_intent_classifier
+
+__all__ = ["IntentClassifier", "get_intent_classifier"]
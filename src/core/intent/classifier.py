@@ -0,0 +1,138 @@
+"""
+意图分类器
+基于字符n-gram特征的多分类逻辑回归，启动时从标注文件训练，纯Python实现
+"""
+
+import json
+import math
+import os
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+
+try:
+    from src.utils.utils import get_config, get_resource_dir
+except ImportError:
+    from ppgllm.src.utils import get_config, get_resource_dir
+
+
+class IntentClassifier:
+    """字符n-gram线性意图分类器"""
+
+    def __init__(self, ngram_range: Tuple[int, int] = (1, 3), head_chars: int = 200, tail_chars: int = 200):
+        self.ngram_range = ngram_range
+        self.head_chars = head_chars
+        self.tail_chars = tail_chars
+        self.labels: List[str] = []
+        self.weights: Dict[str, List[float]] = {}
+        self.bias: List[float] = []
+
+    def _features(self, text: str) -> List[str]:
+        """
+        提取字符n-gram特征
+        超长文本只取首尾片段，用户指令通常出现在开头或结尾
+        """
+        text = "".join(text.lower().split())
+        if len(text) > self.head_chars + self.tail_chars:
+            text = text[:self.head_chars] + "|" + text[-self.tail_chars:]
+        features = set()
+        low, high = self.ngram_range
+        for n in range(low, high + 1):
+            for index in range(len(text) - n + 1):
+                features.add(text[index:index + n])
+        return list(features)
+
+    def _scores(self, features: List[str]) -> List[float]:
+        scores = list(self.bias)
+        for feature in features:
+            row = self.weights.get(feature)
+            if row is not None:
+                for index, value in enumerate(row):
+                    scores[index] += value
+        return scores
+
+    @staticmethod
+    def _softmax(scores: List[float]) -> List[float]:
+        peak = max(scores)
+        exps = [math.exp(score - peak) for score in scores]
+        total = sum(exps)
+        return [value / total for value in exps]
+
+    def train(self, samples: List[Dict[str, str]], epochs: int = 30, learning_rate: float = 0.1,
+              l2: float = 0.03, seed: int = 42):
+        """
+        训练模型（随机梯度下降）
+        Args:
+            samples: 标注样本，每项包含 text 和 label
+            epochs: 训练轮数
+            learning_rate: 学习率
+            l2: L2正则系数
+            seed: 随机种子，保证每次启动结果一致
+        """
+        self.labels = sorted({sample["label"] for sample in samples})
+        label_index = {label: index for index, label in enumerate(self.labels)}
+        size = len(self.labels)
+        self.bias = [0.0] * size
+        self.weights = {}
+        data = [(self._features(sample["text"]), label_index[sample["label"]]) for sample in samples]
+        rng = random.Random(seed)
+
+        for epoch in range(epochs):
+            rng.shuffle(data)
+            rate = learning_rate / (1 + epoch * 0.1)
+            for features, target in data:
+                probs = self._softmax(self._scores(features))
+                gradient = [probs[index] - (1.0 if index == target else 0.0) for index in range(size)]
+                for index in range(size):
+                    self.bias[index] -= rate * gradient[index]
+                for feature in features:
+                    row = self.weights.setdefault(feature, [0.0] * size)
+                    for index in range(size):
+                        row[index] -= rate * (gradient[index] + l2 * row[index])
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """
+        预测意图
+        Args:
+            text: 用户消息
+        Returns:
+            (标签, 置信度)
+        """
+        if not self.labels:
+            raise RuntimeError("意图分类器尚未训练")
+        probs = self._softmax(self._scores(self._features(text)))
+        best = max(range(len(probs)), key=probs.__getitem__)
+        return self.labels[best], probs[best]
+
+    @classmethod
+    def from_file(cls, path: str) -> "IntentClassifier":
+        """
+        从JSONL标注文件训练分类器
+        Args:
+            path: 标注文件路径，每行 {"text": ..., "label": ...}
+        Returns:
+            训练好的分类器
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            samples = [json.loads(line) for line in f if line.strip()]
+        classifier = cls()
+        start = time.perf_counter()
+        classifier.train(samples)
+        logger.info(f"意图分类器训练完成: {len(samples)} 条样本, 耗时 {(time.perf_counter() - start) * 1000:.1f}ms")
+        return classifier
+
+
+# 全局意图分类器实例
+_intent_classifier: Optional[IntentClassifier] = None
+
+
+def get_intent_classifier() -> IntentClassifier:
+    """获取意图分类器实例（首次调用时训练）"""
+    global _intent_classifier
+    if _intent_classifier is None:
+        intent_config = get_config().get("intent", {})
+        samples_file = intent_config.get("samples_file") or os.path.join(get_resource_dir(), "intent_samples.jsonl")
+        _intent_classifier = IntentClassifier.from_file(samples_file)
+    return _intent_classifier
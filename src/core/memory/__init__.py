@@ -3,5 +3,6 @@
 """
 
 from .list_memory import ListMemoryManager
+from .memory_store import MemoryStore, get_memory_store
 
-__all__ = ["ListMemoryManager"]
\ No newline at end of file
+__all__ = ["ListMemoryManager", "MemoryStore", "get_memory_store"]
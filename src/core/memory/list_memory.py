@@ -9,6 +9,11 @@ import aiofiles
 from typing import List, Dict, Any
 from loguru import logger
 
+try:
+    from src.core.telemetry import trace_stage
+except ImportError:
+    from ..telemetry import trace_stage
+
 
 class ListMemoryManager:
     """列表内存管理器"""
@@ -24,8 +29,10 @@ class ListMemoryManager:
     async def get_memory(self) -> List[Dict[str, Any]]:
         """获取内存数据"""
         try:
-            async with aiofiles.open(self.memory_file_path, 'r', encoding='utf-8') as f:
-                content = await f.read()
+            with trace_stage("ListMemoryManager.get_memory", timing="memory_io", path=self.memory_file_path) as span:
+                async with aiofiles.open(self.memory_file_path, 'r', encoding='utf-8') as f:
+                    content = await f.read()
+                span.set_attribute("bytes", len(content))
                 return json.loads(content) if content.strip() else []
         except Exception as e:
             logger.error(f"读取内存文件失败: {str(e)}")
@@ -35,16 +42,18 @@ class ListMemoryManager:
         try:
             memories = await self.get_memory()
             memories.append(memory_item)
-            async with aiofiles.open(self.memory_file_path, 'w', encoding='utf-8') as f:
-                await f.write(json.dumps(memories, ensure_ascii=False, indent=2))
+            with trace_stage("ListMemoryManager.add_memory", timing="memory_io", path=self.memory_file_path):
+                async with aiofiles.open(self.memory_file_path, 'w', encoding='utf-8') as f:
+                    await f.write(json.dumps(memories, ensure_ascii=False, indent=2))
             logger.info(f"添加内存项成功: {memory_item.get('type', 'unknown')}")
         except Exception as e:
             logger.error(f"添加内存项失败: {str(e)}")
     async def clear_memory(self):
         """清空内存"""
         try:
-            async with aiofiles.open(self.memory_file_path, 'w', encoding='utf-8') as f:
-                await f.write(json.dumps([], ensure_ascii=False))
+            with trace_stage("ListMemoryManager.clear_memory", timing="memory_io", path=self.memory_file_path):
+                async with aiofiles.open(self.memory_file_path, 'w', encoding='utf-8') as f:
+                    await f.write(json.dumps([], ensure_ascii=False))
             logger.info("内存清空成功")
         except Exception as e:
             logger.error(f"清空内存失败: {str(e)}")
@@ -0,0 +1,138 @@
+"""
+记忆选择
+缓存已加载的记忆文件，按与当前消息的相关性排序记忆条目，并在每个Agent的token预算内注入提示词
+"""
+
+import json
+import math
+import os
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+try:
+    from src.utils.utils import get_config, get_memory_dir, count_tokens
+    from src.core.fingerprint import normalize_text
+except ImportError:
+    from ppgllm.src.utils import get_config, get_memory_dir, count_tokens
+    from ..fingerprint import normalize_text
+from .list_memory import ListMemoryManager
+
+
+def _bigrams(text: str) -> set:
+    normalized = normalize_text(text)
+    return {normalized[index:index + 2] for index in range(len(normalized) - 1)}
+
+
+class MemoryStore:
+    """记忆加载缓存与相关性选择"""
+
+    def __init__(self, memory_dir: Optional[str] = None):
+        config = get_config().get("memory", {})
+        self.memory_dir = memory_dir or config.get("memory_dir") or get_memory_dir()
+        self.token_budget = config.get("token_budget", 1000)
+        self.min_score = config.get("min_score", 0.0)
+        self.agent_budgets = {
+            agent_type: agent_config["memory_tokens"]
+            for agent_type, agent_config in get_config().get("agents", {}).items()
+            if isinstance(agent_config, dict) and "memory_tokens" in agent_config
+        }
+        # {文件路径: {"version": (mtime_ns, size), "items": [{"text", "tokens", "bigrams"}]}}
+        self._files: Dict[str, Dict[str, Any]] = {}
+        self._stats = {"loads": 0, "cache_hits": 0, "selections": 0, "selected_items": 0, "injected_tokens": 0}
+
+    @staticmethod
+    def _item_text(item: Any) -> str:
+        """记忆条目的文本，优先使用 content 字段"""
+        if isinstance(item, dict) and isinstance(item.get("content"), str):
+            return item["content"]
+        return item if isinstance(item, str) else json.dumps(item, ensure_ascii=False)
+
+    async def load(self, name: str) -> List[Dict[str, Any]]:
+        """
+        加载记忆文件，文件未修改时直接使用缓存
+        Args:
+            name: 记忆文件名（相对记忆目录）
+        Returns:
+            预处理后的记忆条目（文本、token数、字符二元组）
+        """
+        path = os.path.join(self.memory_dir, name)
+        try:
+            stat = os.stat(path)
+            version = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            version = None
+        cached = self._files.get(path)
+        if cached is not None and version is not None and cached["version"] == version:
+            self._stats["cache_hits"] += 1
+            return cached["items"]
+
+        raw_items = await ListMemoryManager(path).get_memory()
+        items = []
+        for item in raw_items if isinstance(raw_items, list) else []:
+            text = self._item_text(item).strip()
+            if text:
+                items.append({"text": text, "tokens": count_tokens(text), "bigrams": _bigrams(text)})
+        stat = os.stat(path)
+        self._files[path] = {"version": (stat.st_mtime_ns, stat.st_size), "items": items}
+        self._stats["loads"] += 1
+        return items
+
+    def get_budget(self, agent_type: Optional[str]) -> int:
+        """获取Agent的记忆token预算"""
+        return self.agent_budgets.get(agent_type, self.token_budget)
+
+    async def select(self, message: str, memory_files: List[str], budget: int) -> List[str]:
+        """
+        选择与消息最相关的记忆条目
+        相关性为字符二元组重合度（按条目长度归一化），同分时较新的条目优先；按得分依次装入预算，放不下的条目跳过
+        Args:
+            message: 当前消息
+            memory_files: 记忆文件名列表
+            budget: token预算
+        Returns:
+            选中的记忆文本，按相关性降序
+        """
+        candidates = []
+        for name in memory_files:
+            for position, item in enumerate(await self.load(name)):
+                candidates.append((item, position))
+        if not candidates or budget <= 0:
+            return []
+
+        query = _bigrams(message)
+        scored = []
+        for item, position in candidates:
+            overlap = len(query & item["bigrams"])
+            score = overlap / math.sqrt(len(item["bigrams"]) or 1)
+            if score > self.min_score:
+                scored.append((score, position, item))
+        scored.sort(key=lambda entry: (entry[0], entry[1]), reverse=True)
+
+        selected, used = [], 0
+        for _, _, item in scored:
+            if used + item["tokens"] > budget:
+                continue
+            selected.append(item["text"])
+            used += item["tokens"]
+        self._stats["selections"] += 1
+        self._stats["selected_items"] += len(selected)
+        self._stats["injected_tokens"] += used
+        logger.debug(f"记忆选择: 候选 {len(candidates)} 条, 相关 {len(scored)} 条, 注入 {len(selected)} 条 / {used} tokens")
+        return selected
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取记忆缓存与注入统计"""
+        return {"cached_files": len(self._files), **self._stats}
+
+
+# 全局记忆选择实例
+_memory_store: Optional[MemoryStore] = None
+
+
+def get_memory_store() -> MemoryStore:
+    """获取记忆选择实例"""
+    global _memory_store
+    if _memory_store is None:
+        _memory_store = MemoryStore()
+    return _memory_store
@@ -0,0 +1,279 @@
+"""
+上游流量录制与回放
+在上游HTTP传输层录制请求/响应及其时序（流式响应记录每个数据块的到达时间）到压缩的磁带文件，
+回放模式按原始时序在本地返回录制的响应，用于离线重放真实流量、对比新版本的吞吐量和延迟
+"""
+
+import asyncio
+import codecs
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+import httpx
+from loguru import logger
+
+try:
+    from src.utils.utils import get_config, get_data_dir
+except ImportError:
+    from ppgllm.src.utils import get_config, get_data_dir
+
+CASSETTE_MODES = ("off", "record", "replay")
+
+
+def request_key(body: Dict[str, Any]) -> str:
+    """按请求体（模型、消息、工具及采样参数）计算匹配键，录制时在脱敏前计算"""
+    canonical = json.dumps(body, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def request_signature(body: Dict[str, Any]) -> Tuple[bool, bool]:
+    """请求形态（是否流式、是否携带工具），精确匹配失败时按形态顺序回放"""
+    return bool(body.get("stream")), bool(body.get("tools"))
+
+
+def _redact_text(text: Any) -> str:
+    return f"[redacted {len(str(text))} chars]"
+
+
+def _redact_content(content: Any) -> Any:
+    """正文可能是字符串或多段内容列表（文本/图片等），每段只保留类型和长度"""
+    if isinstance(content, str):
+        return _redact_text(content)
+    if isinstance(content, list):
+        parts = []
+        for part in content:
+            if not isinstance(part, dict):
+                parts.append(_redact_text(part))
+                continue
+            kind = part.get("type", "text")
+            value = part.get(kind, part.get("text", ""))
+            parts.append({"type": kind, kind: _redact_text(value if isinstance(value, str) else json.dumps(value, ensure_ascii=False))})
+        return parts
+    return content
+
+
+def redact_messages(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """消息正文和工具调用参数替换为长度说明，保留角色和工具调用结构"""
+    redacted = []
+    for message in messages:
+        item = dict(message)
+        if item.get("content") is not None:
+            item["content"] = _redact_content(item["content"])
+        if item.get("tool_calls"):
+            calls = []
+            for call in item["tool_calls"]:
+                call = dict(call)
+                function = dict(call.get("function") or {})
+                if "arguments" in function:
+                    function["arguments"] = _redact_text(function["arguments"])
+                call["function"] = function
+                calls.append(call)
+            item["tool_calls"] = calls
+        redacted.append(item)
+    return redacted
+
+
+class CassetteWriter:
+    """磁带文件写入：每次交互追加一行JSON（gzip多成员格式，可直接追加）"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.entries = 0
+
+    def _append(self, entry: Dict[str, Any]):
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n"
+        with self._lock, gzip.open(self.path, "at", encoding="utf-8") as f:
+            f.write(line)
+        self.entries += 1
+
+    async def append(self, entry: Dict[str, Any]):
+        await asyncio.to_thread(self._append, entry)
+
+
+def load_cassette(path: str) -> List[Dict[str, Any]]:
+    """读取磁带文件中的全部交互"""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class _RecordingStream(httpx.AsyncByteStream):
+    """透传上游响应，同时记录每个数据块相对请求开始的到达时间"""
+
+    def __init__(self, stream: httpx.AsyncByteStream, entry: Dict[str, Any], start: float, writer: CassetteWriter):
+        self._stream = stream
+        self._entry = entry
+        self._start = start
+        self._writer = writer
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._chunks: List[Tuple[float, str]] = []
+        self._finished = False
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for data in self._stream:
+            text = self._decoder.decode(data)
+            if text:
+                self._chunks.append((round((time.perf_counter() - self._start) * 1000, 3), text))
+            yield data
+        self._finished = True
+
+    async def aclose(self):
+        await self._stream.aclose()
+        # 提前关闭（调用方取消、对冲落败）的响应不完整，回放时跳过
+        self._entry["complete"] = self._finished
+        self._entry["chunks"] = self._chunks
+        await self._writer.append(self._entry)
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """录制模式：转发到真实上游并写入磁带，不记录认证头"""
+
+    def __init__(self, writer: CassetteWriter, redact: bool = True, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.writer = writer
+        self.redact = redact
+        self._transport = transport or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        start = time.perf_counter()
+        body = json.loads(request.content or b"{}")
+        # 要求上游返回未压缩的响应，磁带中保存的是原始文本
+        request.headers["Accept-Encoding"] = "identity"
+        response = await self._transport.handle_async_request(request)
+        entry = {
+            "key": request_key(body),
+            "recorded_at": datetime.now().isoformat(),
+            "path": request.url.path,
+            "model": body.get("model"),
+            "stream": bool(body.get("stream")),
+            "tools": bool(body.get("tools")),
+            "request_chars": sum(len(str(item.get("content") or "")) for item in body.get("messages", [])),
+            "messages": redact_messages(body.get("messages", [])) if self.redact else body.get("messages", []),
+            "status": response.status_code,
+            "content_type": response.headers.get("content-type", "application/json"),
+            "headers_ms": round((time.perf_counter() - start) * 1000, 3)
+        }
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_RecordingStream(response.stream, entry, start, self.writer),
+            extensions=response.extensions
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"mode": "record", "path": self.writer.path, "recorded": self.writer.entries}
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+class _ReplayStream(httpx.AsyncByteStream):
+    """按录制的时序产出响应数据块"""
+
+    def __init__(self, chunks: List[List[Any]], start: float, speed: float):
+        self._chunks = chunks
+        self._start = start
+        self._speed = speed
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        for offset_ms, text in self._chunks:
+            delay = offset_ms / 1000 / self._speed - (time.perf_counter() - self._start)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield text.encode("utf-8")
+
+    async def aclose(self):
+        pass
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """
+    回放模式：不访问网络，按请求匹配录制的交互并按原始时序返回
+    先按请求体精确匹配（同一请求多次录制时依次返回），未命中时按请求形态（流式/工具）依次循环回放，
+    使修改过提示词的新版本仍能获得与生产一致的响应大小和时延分布
+    """
+
+    def __init__(self, entries: List[Dict[str, Any]], speed: float = 1.0, strict: bool = False):
+        self.speed = speed
+        self.strict = strict
+        self._by_key: Dict[str, Deque[Dict[str, Any]]] = defaultdict(deque)
+        self._by_signature: Dict[Tuple[bool, bool], Deque[Dict[str, Any]]] = defaultdict(deque)
+        for entry in entries:
+            if not entry.get("complete", True):
+                continue
+            self._by_key[entry["key"]].append(entry)
+            self._by_signature[(entry["stream"], entry["tools"])].append(entry)
+        self.stats = {"entries": sum(len(items) for items in self._by_key.values()),
+                      "exact_hits": 0, "signature_hits": 0, "misses": 0}
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"mode": "replay", "speed": self.speed, **self.stats}
+
+    def _match(self, body: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        exact = self._by_key.get(request_key(body))
+        if exact:
+            entry = exact.popleft()
+            exact.append(entry)
+            self.stats["exact_hits"] += 1
+            return entry
+        candidates = self._by_signature.get(request_signature(body))
+        if self.strict or not candidates:
+            return None
+        entry = candidates.popleft()
+        candidates.append(entry)
+        self.stats["signature_hits"] += 1
+        return entry
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        start = time.perf_counter()
+        entry = self._match(json.loads(request.content or b"{}"))
+        if entry is None:
+            self.stats["misses"] += 1
+            # 未命中是确定性的，返回4xx并禁止重试，避免SDK按5xx重复请求并放大未命中计数
+            return httpx.Response(
+                status_code=404,
+                headers={"x-should-retry": "false"},
+                json={"error": {"message": "磁带中没有匹配的录制响应", "type": "cassette_miss"}}
+            )
+        delay = entry["headers_ms"] / 1000 / self.speed
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return httpx.Response(
+            status_code=entry["status"],
+            headers={"content-type": entry["content_type"]},
+            stream=_ReplayStream(entry["chunks"], start, self.speed)
+        )
+
+
+def build_http_client() -> Tuple[Optional[httpx.AsyncClient], Optional[httpx.AsyncBaseTransport]]:
+    """
+    按配置创建录制或回放用的HTTP客户端
+    环境变量 UPSTREAM_CASSETTE_MODE / UPSTREAM_CASSETTE 可覆盖配置中的模式和磁带路径
+    Returns:
+        (HTTP客户端, 磁带传输层)，未启用时均为None，使用默认客户端
+    """
+    config = get_config().get("cassette", {})
+    mode = os.environ.get("UPSTREAM_CASSETTE_MODE") or config.get("mode", "off")
+    if mode not in CASSETTE_MODES:
+        raise ValueError(f"不支持的磁带模式: {mode}")
+    if mode == "off":
+        return None, None
+    path = (os.environ.get("UPSTREAM_CASSETTE") or config.get("path")
+            or os.path.join(get_data_dir(), "cassettes", "upstream.jsonl.gz"))
+    timeout = httpx.Timeout(config.get("timeout", 600.0), connect=10.0)
+    if mode == "record":
+        logger.info(f"上游流量录制中: {path}")
+        transport = RecordingTransport(CassetteWriter(path), redact=config.get("redact_messages", True))
+    else:
+        entries = load_cassette(path)
+        logger.info(f"上游流量回放: {path}（{len(entries)} 条交互）")
+        speed = float(os.environ.get("UPSTREAM_CASSETTE_SPEED") or config.get("speed", 1.0))
+        transport = ReplayTransport(entries, speed=speed, strict=config.get("strict", False))
+    return httpx.AsyncClient(transport=transport, timeout=timeout), transport
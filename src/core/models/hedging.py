@@ -0,0 +1,87 @@
+"""
+上游对冲请求策略
+按Agent类型统计首token延迟，首token超过自适应阈值（默认p90）仍未到达时发起备用请求，
+先返回者胜出，另一个请求被取消。对冲比例有上限，避免上游抖动时请求量成倍放大
+"""
+
+from collections import deque
+from typing import Any, Deque, Dict, List
+
+try:
+    from src.utils.utils import get_config
+except ImportError:
+    from ppgllm.src.utils import get_config
+
+
+class HedgePolicy:
+    """对冲阈值与对冲比例控制"""
+
+    def __init__(self):
+        config = get_config().get("hedging", {})
+        self.enabled = config.get("enabled", False)
+        self.percentile = config.get("percentile", 0.9)
+        self.initial_threshold_ms = config.get("initial_threshold_ms", 2000.0)
+        self.min_threshold_ms = config.get("min_threshold_ms", 100.0)
+        self.min_samples = config.get("min_samples", 20)
+        self.max_hedge_rate = config.get("max_hedge_rate", 0.1)
+        # 备用端点 [{"base_url", "api_key", "model"}]，未配置时备用请求发往主端点
+        self.endpoints: List[Dict[str, Any]] = config.get("endpoints") or []
+        self.window = config.get("window", 500)
+        self._ttft: Dict[str, Deque[float]] = {}
+        self._stats = {"requests": 0, "hedged": 0, "backup_wins": 0, "skipped_by_rate_limit": 0}
+
+    def threshold_ms(self, agent_type: str) -> float:
+        """
+        获取Agent类型的对冲阈值
+        样本不足时使用初始阈值，否则为最近首token延迟的指定分位数
+        """
+        samples = self._ttft.get(agent_type)
+        if not samples or len(samples) < self.min_samples:
+            return self.initial_threshold_ms
+        ordered = sorted(samples)
+        value = ordered[min(len(ordered) - 1, int(len(ordered) * self.percentile))]
+        return max(self.min_threshold_ms, value)
+
+    def observe(self, agent_type: str, ttft_ms: float):
+        """记录一次首token延迟"""
+        self._ttft.setdefault(agent_type, deque(maxlen=self.window)).append(ttft_ms)
+
+    def begin(self):
+        """记录一次可对冲的请求"""
+        self._stats["requests"] += 1
+
+    def try_acquire(self) -> bool:
+        """对冲比例未超过上限时占用一次对冲"""
+        if self._stats["hedged"] + 1 > self.max_hedge_rate * self._stats["requests"]:
+            self._stats["skipped_by_rate_limit"] += 1
+            return False
+        self._stats["hedged"] += 1
+        return True
+
+    def record_winner(self, backup: bool):
+        if backup:
+            self._stats["backup_wins"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取对冲次数、对冲比例及各Agent类型的首token延迟和当前阈值"""
+        requests = self._stats["requests"]
+        agents = {}
+        for agent_type, samples in self._ttft.items():
+            ordered = sorted(samples)
+
+            def percentile(value: float) -> float:
+                return round(ordered[min(len(ordered) - 1, int(len(ordered) * value))], 3)
+
+            agents[agent_type] = {
+                "samples": len(ordered),
+                "ttft_ms": {"p50": percentile(0.5), "p90": percentile(0.9), "p99": percentile(0.99)},
+                "threshold_ms": round(self.threshold_ms(agent_type), 3)
+            }
+        return {
+            "enabled": self.enabled,
+            "max_hedge_rate": self.max_hedge_rate,
+            "hedge_rate": round(self._stats["hedged"] / requests, 4) if requests else 0.0,
+            "backup_endpoints": [endpoint.get("base_url") for endpoint in self.endpoints],
+            **self._stats,
+            "agents": agents
+        }
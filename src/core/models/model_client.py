@@ -12,6 +12,49 @@ except ImportError:
 
 class ModelClientFactory:
     """模型客户端工厂"""
+    _selection_config = None
+
+    @classmethod
+    def _get_selection_config(cls) -> dict:
+        """读取并缓存模型选择策略配置"""
+        if cls._selection_config is None:
+            cls._selection_config = get_config().get("model_selection", {})
+        return cls._selection_config
+
+    @classmethod
+    def select_model(cls, agent_type: str, input_tokens: int, check_scope: int = None) -> dict:
+        """
+        根据Agent类型、输入长度和检测范围选择模型档位与输出预算
+
+        Args:
+            agent_type: Agent类型
+            input_tokens: 用户消息token数
+            check_scope: 请求的检测要点/维度数量，None表示全部
+
+        Returns:
+            包含 tier、model、max_tokens 的字典；未启用或无匹配规则时 model 和 max_tokens 为 None
+        """
+        config = cls._get_selection_config()
+        selection = {"tier": None, "model": None, "max_tokens": None}
+        if not config.get("enabled", False):
+            return selection
+
+        for rule in config.get("rules", {}).get(agent_type, []):
+            max_input = rule.get("max_input_tokens")
+            if max_input is None or input_tokens <= max_input:
+                tier = rule.get("tier")
+                selection["tier"] = tier
+                selection["model"] = config.get("tiers", {}).get(tier, {}).get("model")
+                selection["max_tokens"] = rule.get("max_tokens")
+                break
+
+        # 检测范围缩小时按要点数量收紧输出预算
+        per_item = config.get("scope_tokens_per_item", {}).get(agent_type)
+        if check_scope and per_item:
+            scoped = config.get("scope_base_tokens", 300) + check_scope * per_item
+            selection["max_tokens"] = min(selection["max_tokens"] or scoped, scoped)
+        return selection
+
     @staticmethod
     def create_client(model_name: str):
         """
@@ -42,7 +85,7 @@ class ModelClientFactory:
                 model_info={
                     "vision": False,
                     "function_calling": True,
-                    "json_output": False,
+                    "json_output": True,
                     "structured_output": True,
                     "family": ModelFamily.UNKNOWN
                 },
@@ -57,7 +100,7 @@ class ModelClientFactory:
                 model_info={
                     "vision": False,
                     "function_calling": True,
-                    "json_output": False,
+                    "json_output": True,
                     "structured_output": True,
                     "family": ModelFamily.UNKNOWN
                 },
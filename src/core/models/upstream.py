@@ -0,0 +1,371 @@
+"""
+上游模型调用模块
+复用连接的异步OpenAI兼容客户端，避免每次请求新建客户端并阻塞事件循环
+"""
+
+import asyncio
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from loguru import logger
+from openai import AsyncOpenAI
+from opentelemetry import trace
+
+try:
+    from src.utils.utils import get_config, count_tokens
+except ImportError:
+    from ppgllm.src.utils import get_config, count_tokens
+try:
+    from src.core.accounting import get_token_accountant
+    from src.core.request_context import get_request_context
+    from src.core.tools import get_tool_registry
+    from src.core.scheduling import get_admission_controller
+except ImportError:
+    from ..accounting import get_token_accountant
+    from ..request_context import get_request_context
+    from ..tools import get_tool_registry
+    from ..scheduling import get_admission_controller
+try:
+    from src.core.telemetry import record_timing, trace_stage
+except ImportError:
+    from ..telemetry import record_timing, trace_stage
+from .cassette import build_http_client
+from .hedging import HedgePolicy
+
+
+async def _prepend(first: Any, chunks: AsyncIterator[Any]) -> AsyncIterator[Any]:
+    """在流式响应前补回已读取的首个数据块"""
+    if first is None:
+        return
+    yield first
+    async for chunk in chunks:
+        yield chunk
+
+
+class UpstreamClient:
+    """上游模型调用客户端"""
+
+    def __init__(self):
+        qwen_config = get_config().get("qwen_client", {})
+        self.model = qwen_config.get("model", "qwen-turbo")
+        self.max_tokens = qwen_config.get("max_tokens", 8000)
+        self.base_url = qwen_config.get("base_url", "https://dashscope.aliyuncs.com/compatible-mode/v1")
+        # 录制/回放模式下使用带磁带传输层的HTTP客户端，所有端点共用
+        self._http_client, self._cassette = build_http_client()
+        self._client = AsyncOpenAI(
+            api_key=qwen_config.get("api_key", ""),
+            base_url=self.base_url,
+            http_client=self._http_client
+        )
+        self.accountant = get_token_accountant()
+        self.admission = get_admission_controller()
+        self.hedging = HedgePolicy()
+        # 对冲备用端点的客户端，未配置备用端点时使用主端点
+        self._backup_clients = [
+            (AsyncOpenAI(api_key=endpoint.get("api_key", ""), base_url=endpoint["base_url"], http_client=self._http_client),
+             endpoint.get("model"))
+            for endpoint in self.hedging.endpoints
+        ] or [(self._client, None)]
+        self._backup_index = 0
+        # 各Agent类型输出token数的滑动平均，用于估算取消调用节省的token
+        self._completion_ewma: Dict[str, float] = {}
+
+    def _build_params(self, system_message: str, message: str,
+                      model: Optional[str], max_tokens: Optional[int],
+                      temperature: float, extra: Dict[str, Any]) -> Dict[str, Any]:
+        """组装请求参数"""
+        messages: List[Dict[str, str]] = [
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": message}
+        ]
+        params = {
+            "model": model or self.model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens or self.max_tokens
+        }
+        params.update(extra)
+        return params
+
+    def _before_dispatch(self, system_message: str, message: str) -> int:
+        """派发前估算输入token并检查调用方预算"""
+        prompt_tokens = count_tokens(system_message) + count_tokens(message)
+        self.accountant.check_budget(get_request_context().client_id, prompt_tokens)
+        return prompt_tokens
+
+    def _record_usage(self, agent_type: str, model: str, usage: Any,
+                      estimated_prompt_tokens: int, completion_text: str) -> Tuple[int, int]:
+        """记录token用量，上游未返回usage时使用估算值；返回 (输入token数, 输出token数)"""
+        context = get_request_context()
+        if usage is not None:
+            prompt_tokens, completion_tokens, estimated = usage.prompt_tokens, usage.completion_tokens, False
+        else:
+            prompt_tokens, completion_tokens, estimated = estimated_prompt_tokens, count_tokens(completion_text), True
+        self.accountant.record(
+            request_id=context.request_id,
+            agent_type=agent_type,
+            client_id=context.client_id,
+            model=model,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            estimated=estimated
+        )
+        return prompt_tokens, completion_tokens
+
+    def _observe_completion(self, agent_type: str, completion_tokens: int):
+        previous = self._completion_ewma.get(agent_type)
+        self._completion_ewma[agent_type] = (
+            completion_tokens if previous is None else 0.8 * previous + 0.2 * completion_tokens
+        )
+
+    def _record_cancellation(self, agent_type: str, completion_text: str):
+        """记录被取消的调用：已生成的token照常计费，节省量按该Agent的平均输出长度估算"""
+        generated = count_tokens(completion_text)
+        saved = max(0, round(self._completion_ewma.get(agent_type, 0.0)) - generated)
+        self.accountant.record_cancellation(agent_type, generated, saved)
+        logger.info(f"上游调用已取消 {agent_type} [{get_request_context().request_id}]: "
+                    f"已生成 {generated} tokens, 估算节省 {saved} tokens")
+
+    async def complete(self, system_message: str, message: str,
+                       agent_type: str = "default",
+                       model: Optional[str] = None,
+                       max_tokens: Optional[int] = None,
+                       temperature: float = 0.1,
+                       tools: Optional[List[str]] = None,
+                       **extra) -> str:
+        """
+        发送一次完整的对话请求
+        Args:
+            system_message: 系统提示词
+            message: 用户消息
+            agent_type: 发起请求的Agent类型，用于用量统计
+            model: 模型名称，默认使用配置中的模型
+            max_tokens: 最大输出token数
+            temperature: 采样温度
+            tools: 允许模型调用的本地工具名称，模型发起的工具调用在本地执行后继续对话
+        Returns:
+            模型回复内容
+        """
+        prompt_tokens = self._before_dispatch(system_message, message)
+        params = self._build_params(system_message, message, model, max_tokens, temperature, extra)
+        with trace_stage("upstream.complete", timing="upstream", agent_type=agent_type,
+                         **{"gen_ai.request.model": params["model"], "tools": ",".join(tools or [])}) as span:
+            try:
+                if not tools:
+                    response = await self._create(params, agent_type, prompt_tokens)
+                    content = response.choices[0].message.content or ""
+                    usage = self._record_usage(agent_type, params["model"], response.usage, prompt_tokens, content)
+                    span.set_attributes({"gen_ai.usage.input_tokens": usage[0], "gen_ai.usage.output_tokens": usage[1]})
+                else:
+                    content = await self._complete_with_tools(params, tools, agent_type, prompt_tokens)
+            except asyncio.CancelledError:
+                # 非流式请求被取消时连接随之关闭，未收到的输出不计费（已发送的输入token在 _create 中计费）
+                self._record_cancellation(agent_type, "")
+                raise
+        self._observe_completion(agent_type, count_tokens(content))
+        return content
+
+    async def _create(self, params: Dict[str, Any], agent_type: str, prompt_tokens: int) -> Any:
+        """在准入名额内发起非流式请求，请求发出后被取消时输入token按估算值照常计费"""
+        async with self.admission.slot(prompt_tokens):
+            try:
+                return await self._client.chat.completions.create(**params)
+            except asyncio.CancelledError:
+                self._record_usage(agent_type, params["model"], None, prompt_tokens, "")
+                raise
+
+    async def _complete_with_tools(self, params: Dict[str, Any], tools: List[str],
+                                   agent_type: str, prompt_tokens: int) -> str:
+        """
+        工具调用循环：执行模型请求的工具并回传结果，直到模型给出回复或达到最大轮数
+        达到最大轮数时不再提供工具，要求模型直接回复
+        """
+        registry = get_tool_registry()
+        params["tools"] = registry.schemas(tools)
+        span = trace.get_current_span()
+        input_tokens = output_tokens = 0
+        for round_index in range(registry.max_rounds + 1):
+            if round_index == registry.max_rounds:
+                params.pop("tools")
+            response = await self._create(params, agent_type, prompt_tokens)
+            reply = response.choices[0].message
+            usage = self._record_usage(agent_type, params["model"], response.usage, prompt_tokens, reply.content or "")
+            input_tokens, output_tokens = input_tokens + usage[0], output_tokens + usage[1]
+            span.set_attributes({
+                "gen_ai.usage.input_tokens": input_tokens,
+                "gen_ai.usage.output_tokens": output_tokens,
+                "tool_rounds": round_index + 1
+            })
+            if not reply.tool_calls or "tools" not in params:
+                return reply.content or ""
+            logger.debug(f"模型请求调用工具 {agent_type}: {[call.function.name for call in reply.tool_calls]}")
+            params["messages"].append(reply.model_dump(exclude_none=True))
+            tool_messages = await registry.execute_calls(reply.tool_calls)
+            params["messages"].extend(tool_messages)
+            prompt_tokens += sum(count_tokens(item["content"]) for item in tool_messages)
+        return ""
+
+    @staticmethod
+    async def _open_stream(client: AsyncOpenAI, params: Dict[str, Any]) -> Tuple[Any, Any]:
+        """发起流式请求并等待首个数据块"""
+        response = await client.chat.completions.create(stream=True, **params)
+        try:
+            return response, await anext(response, None)
+        except BaseException:
+            await response.close()
+            raise
+
+    @staticmethod
+    async def _discard(task: asyncio.Task):
+        """取消落败的请求，已建立的流随即关闭"""
+        if not task.done():
+            task.cancel()
+        try:
+            response, _ = await task
+            await response.close()
+        except BaseException:
+            pass
+
+    async def _open_hedged_stream(self, params: Dict[str, Any], agent_type: str,
+                                  prompt_tokens: int) -> Tuple[Any, Any, str]:
+        """
+        发起流式请求，首个数据块超过对冲阈值仍未到达时向备用端点发起相同请求，采用先返回者
+        Returns:
+            (流式响应, 首个数据块, 实际使用的模型)
+        """
+        start = time.perf_counter()
+        primary = asyncio.ensure_future(self._open_stream(self._client, params))
+        if not self.hedging.enabled:
+            response, first = await primary
+            self.hedging.observe(agent_type, (time.perf_counter() - start) * 1000)
+            return response, first, params["model"]
+
+        self.hedging.begin()
+        backup = None
+        try:
+            threshold = self.hedging.threshold_ms(agent_type)
+            done, _ = await asyncio.wait({primary}, timeout=threshold / 1000)
+            if done or not self.hedging.try_acquire():
+                response, first = await primary
+                self.hedging.observe(agent_type, (time.perf_counter() - start) * 1000)
+                return response, first, params["model"]
+
+            client, backup_model = self._backup_clients[self._backup_index % len(self._backup_clients)]
+            self._backup_index += 1
+            backup_params = {**params, "model": backup_model or params["model"]}
+            logger.debug(f"首token超过 {threshold:.0f}ms，发起对冲请求 {agent_type}")
+            backup = asyncio.ensure_future(self._open_stream(client, backup_params))
+            pending = {primary, backup}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((task for task in done if not task.exception()), None)
+                if winner is None and pending:
+                    continue
+                if winner is None:
+                    # 两个请求均失败，抛出主请求的异常
+                    return (*primary.result(), params["model"])
+                loser = backup if winner is primary else primary
+                await self._discard(loser)
+                # 落败请求的输入token同样计费
+                self._record_usage(agent_type, params["model"], None, prompt_tokens, "")
+                self.hedging.record_winner(winner is backup)
+                self.hedging.observe(agent_type, (time.perf_counter() - start) * 1000)
+                response, first = winner.result()
+                return response, first, (backup_params if winner is backup else params)["model"]
+        except BaseException:
+            for task in (primary, backup):
+                if task is not None:
+                    await self._discard(task)
+            raise
+
+    async def stream(self, system_message: str, message: str,
+                     agent_type: str = "default",
+                     model: Optional[str] = None,
+                     max_tokens: Optional[int] = None,
+                     temperature: float = 0.1,
+                     **extra) -> AsyncIterator[str]:
+        """
+        以流式方式发送对话请求
+        Args:
+            system_message: 系统提示词
+            message: 用户消息
+            agent_type: 发起请求的Agent类型，用于用量统计
+            model: 模型名称，默认使用配置中的模型
+            max_tokens: 最大输出token数
+            temperature: 采样温度
+        Returns:
+            逐段产出的回复内容
+        """
+        prompt_tokens = self._before_dispatch(system_message, message)
+        params = self._build_params(system_message, message, model, max_tokens, temperature, extra)
+        params["stream_options"] = {"include_usage": True}
+        # 流式请求在整个输出期间占用准入名额（对冲的备用请求共用同一名额）
+        # 生成器跨yield执行，span不设为当前span
+        with trace_stage("upstream.stream", timing="upstream", current=False, agent_type=agent_type,
+                         **{"gen_ai.request.model": params["model"]}) as span:
+            async with self.admission.slot(prompt_tokens):
+                start = time.perf_counter()
+                try:
+                    response, first, model = await self._open_hedged_stream(params, agent_type, prompt_tokens)
+                except asyncio.CancelledError:
+                    # 请求已发出，输入token照常计费
+                    self._record_usage(agent_type, params["model"], None, prompt_tokens, "")
+                    self._record_cancellation(agent_type, "")
+                    raise
+                ttft_ms = (time.perf_counter() - start) * 1000
+                record_timing("ttft", ttft_ms)
+                span.set_attributes({"ttft_ms": round(ttft_ms, 3), "gen_ai.response.model": model})
+                usage = None
+                parts: List[str] = []
+                finished = cancelled = False
+                try:
+                    async for chunk in _prepend(first, response):
+                        if chunk.usage is not None:
+                            usage = chunk.usage
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            parts.append(chunk.choices[0].delta.content)
+                            yield chunk.choices[0].delta.content
+                    finished = True
+                except (asyncio.CancelledError, GeneratorExit):
+                    # 只有调用方取消或提前关闭才计为取消，上游异常照常计费但不计入节省量
+                    cancelled = True
+                    raise
+                finally:
+                    # 调用方取消或提前关闭时关闭连接，上游随即停止生成
+                    await response.close()
+                    content = "".join(parts)
+                    tokens = self._record_usage(agent_type, model, usage, prompt_tokens, content)
+                    span.set_attributes({"gen_ai.usage.input_tokens": tokens[0], "gen_ai.usage.output_tokens": tokens[1]})
+                    if finished:
+                        self._observe_completion(agent_type, count_tokens(content))
+                    elif cancelled:
+                        self._record_cancellation(agent_type, content)
+
+    def get_cassette_stats(self) -> Dict[str, Any]:
+        """获取上游流量录制/回放统计"""
+        if self._cassette is None:
+            return {"mode": "off"}
+        return self._cassette.get_stats()
+
+    async def close(self):
+        """关闭底层连接池并持久化用量数据"""
+        await self._client.close()
+        for client, _ in self._backup_clients:
+            if client is not self._client:
+                await client.close()
+        if self._http_client is not None:
+            await self._http_client.aclose()
+        await self.accountant.flush()
+        logger.info("上游模型客户端已关闭")
+
+
+# 全局上游客户端实例
+_upstream_client: Optional[UpstreamClient] = None
+
+
+def get_upstream_client() -> UpstreamClient:
+    """获取上游模型客户端实例"""
+    global _upstream_client
+    if _upstream_client is None:
+        _upstream_client = UpstreamClient()
+    return _upstream_client
@@ -0,0 +1,8 @@
+"""
+请求剖析包初始化文件
+"""
+
+from .profiler import PROFILE_MODES, RequestProfiler, get_request_profiler
+from .middleware import ProfilingMiddleware
+
+__all__ = ["PROFILE_MODES", "ProfilingMiddleware", "RequestProfiler", "get_request_profiler"]
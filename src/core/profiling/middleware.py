@@ -0,0 +1,40 @@
+"""
+请求剖析中间件
+仅在 profiling.enabled 时注册；请求头 X-Profile 或管理接口预约触发剖析，响应头 X-Profile-Id 返回剖析ID
+"""
+
+from typing import Any, Callable, Dict, Optional
+
+from .profiler import get_request_profiler
+
+
+class ProfilingMiddleware:
+    """ASGI中间件：对选中的请求执行剖析"""
+
+    def __init__(self, app: Callable):
+        self.app = app
+        self.profiler = get_request_profiler()
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        mode = self.profiler.resolve_mode(scope["path"], scope["headers"])
+        if mode is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = self.profiler.start(mode)
+        status: Optional[int] = None
+
+        async def send_with_profile_id(message: Dict[str, Any]):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message.setdefault("headers", []).append((b"x-profile-id", profile_id.encode("latin-1")))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            await self.profiler.finish(scope["method"], scope["path"], status)
@@ -0,0 +1,297 @@
+"""
+按需请求性能剖析
+对单个请求启用采样剖析（定时采集事件循环线程的调用栈，输出火焰图可用的折叠栈格式）或确定性剖析（cProfile），
+同时检测事件循环阻塞：心跳协程延迟超过阈值期间采集到的调用栈即为阻塞事件循环的同步调用
+"""
+
+import asyncio
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+try:
+    from src.utils.utils import get_config, get_log_dir
+except ImportError:
+    from ppgllm.src.utils import get_config, get_log_dir
+
+PROFILE_MODES = ("sample", "cprofile")
+
+
+def _folded_stack(frame) -> str:
+    """将调用栈转换为折叠格式（根在前，以分号分隔）"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class _Session:
+    """一次剖析：采样线程、事件循环心跳和可选的cProfile"""
+
+    def __init__(self, profile_id: str, mode: str, path: str, interval: float, block_threshold: float):
+        self.profile_id = profile_id
+        self.mode = mode
+        self.path = path
+        self.interval = interval
+        self.block_threshold = block_threshold
+        self.samples: Counter = Counter()
+        self.blocked_samples: Counter = Counter()
+        self.blocks: List[float] = []
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.perf_counter()
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._profile: Optional[cProfile.Profile] = None
+        self.started_at = time.perf_counter()
+        self.elapsed_ms = 0.0
+
+    async def _beat(self):
+        """心跳协程：两次心跳的间隔超过阈值说明事件循环被同步调用阻塞"""
+        while True:
+            await asyncio.sleep(self.interval)
+            now = time.perf_counter()
+            lag = now - self._last_beat - self.interval
+            if lag >= self.block_threshold:
+                self.blocks.append(lag * 1000)
+            self._last_beat = now
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stack = _folded_stack(frame)
+            self.samples[stack] += 1
+            if time.perf_counter() - self._last_beat > self.interval + self.block_threshold:
+                self.blocked_samples[stack] += 1
+
+    def start(self):
+        self._heartbeat = asyncio.get_running_loop().create_task(self._beat())
+        if self.mode == "cprofile":
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._sampler = threading.Thread(target=self._sample, name=f"profiler-{self.profile_id}", daemon=True)
+            self._sampler.start()
+
+    def stop(self):
+        """停止剖析（cProfile 需在启用它的事件循环线程上停止）"""
+        self.elapsed_ms = (time.perf_counter() - self.started_at) * 1000
+        if self._profile is not None:
+            self._profile.disable()
+        self._stop.set()
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+
+    def save(self) -> Dict[str, Any]:
+        """等待采样线程退出并写入剖析文件，返回剖析摘要；包含阻塞调用，需在线程池中执行"""
+        if self._sampler is not None:
+            self._sampler.join()
+        files = {}
+        if self._profile is not None:
+            files["prof"] = f"{self.profile_id}.prof"
+            self._profile.dump_stats(os.path.join(self.path, files["prof"]))
+        else:
+            files["folded"] = f"{self.profile_id}.folded"
+            with open(os.path.join(self.path, files["folded"]), "w", encoding="utf-8") as f:
+                f.writelines(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+            if self.blocked_samples:
+                files["blocked"] = f"{self.profile_id}.blocked.folded"
+                with open(os.path.join(self.path, files["blocked"]), "w", encoding="utf-8") as f:
+                    f.writelines(f"{stack} {count}\n" for stack, count in self.blocked_samples.most_common())
+        return {
+            "elapsed_ms": round(self.elapsed_ms, 3),
+            "samples": sum(self.samples.values()),
+            "loop_blocking": {
+                "count": len(self.blocks),
+                "total_ms": round(sum(self.blocks), 3),
+                "max_ms": round(max(self.blocks), 3) if self.blocks else 0.0,
+                "top_stacks": [
+                    {"stack": stack.split(";")[-3:], "samples": count}
+                    for stack, count in self.blocked_samples.most_common(5)
+                ]
+            },
+            "files": files
+        }
+
+
+class RequestProfiler:
+    """按需请求剖析：请求头触发或由管理接口预约，剖析结果保存在 logs/profiles"""
+
+    def __init__(self):
+        config = get_config().get("profiling", {})
+        self.enabled = config.get("enabled", False)
+        self.header = config.get("header", "X-Profile").lower().encode("latin-1")
+        self.admin_token = config.get("admin_token") or None
+        self.default_mode = config.get("mode", "sample")
+        self.interval = config.get("interval_ms", 5) / 1000
+        self.block_threshold = config.get("block_threshold_ms", 20) / 1000
+        self.max_profiles = config.get("max_profiles", 50)
+        self.path = config.get("path") or os.path.join(get_log_dir(), "profiles")
+        # 预约剖析 [{"path": 路径前缀, "remaining": 剩余次数, "mode": 模式}]
+        self._armed: List[Dict[str, Any]] = []
+        self._active: Optional[_Session] = None
+
+    def check_token(self, token: Optional[str]) -> bool:
+        """配置了管理令牌时校验令牌"""
+        return self.admin_token is None or token == self.admin_token
+
+    def arm(self, path_prefix: str, count: int = 1, mode: Optional[str] = None) -> Dict[str, Any]:
+        """
+        预约剖析接下来匹配路径前缀的若干个请求
+        Args:
+            path_prefix: 请求路径前缀，如 /api/v1/chat
+            count: 剖析的请求数
+            mode: sample（采样，默认）或 cprofile（确定性）
+        Returns:
+            预约信息
+        """
+        mode = mode or self.default_mode
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"不支持的剖析模式: {mode}")
+        entry = {"path": path_prefix, "remaining": count, "mode": mode}
+        self._armed.append(entry)
+        return dict(entry)
+
+    def _take_armed(self, path: str) -> Optional[str]:
+        for entry in self._armed:
+            if path.startswith(entry["path"]):
+                entry["remaining"] -= 1
+                if entry["remaining"] <= 0:
+                    self._armed.remove(entry)
+                return entry["mode"]
+        return None
+
+    def resolve_mode(self, path: str, headers: List[tuple]) -> Optional[str]:
+        """
+        判断请求是否需要剖析
+        Args:
+            path: 请求路径
+            headers: ASGI原始请求头
+        Returns:
+            剖析模式，不剖析时返回None
+        """
+        if self._active is not None:
+            return None
+        if self._armed:
+            mode = self._take_armed(path)
+            if mode:
+                return mode
+        for name, value in headers:
+            if name == self.header:
+                value = value.decode("latin-1").strip().lower()
+                token = next((v.decode("latin-1") for n, v in headers if n == b"x-admin-token"), None)
+                if value in ("0", "false", "") or not self.check_token(token):
+                    return None
+                return value if value in PROFILE_MODES else self.default_mode
+        return None
+
+    def start(self, mode: str) -> str:
+        """开始剖析当前请求，同一时间只剖析一个请求"""
+        os.makedirs(self.path, exist_ok=True)
+        profile_id = datetime.now().strftime("%Y%m%d%H%M%S") + "-" + uuid.uuid4().hex[:8]
+        self._active = _Session(profile_id, mode, self.path, self.interval, self.block_threshold)
+        self._active.start()
+        return profile_id
+
+    async def finish(self, method: str, path: str, status: Optional[int]) -> Dict[str, Any]:
+        """结束剖析，保存摘要并清理超出数量上限的旧结果；文件读写和等待采样线程在线程池中执行"""
+        session, self._active = self._active, None
+        session.stop()
+        summary = await asyncio.to_thread(self._save, session, {
+            "profile_id": session.profile_id,
+            "mode": session.mode,
+            "method": method,
+            "path": path,
+            "status": status,
+            "created_at": datetime.now().isoformat()
+        })
+        logger.info(f"请求剖析完成 {method} {path}: {summary['profile_id']}，"
+                    f"事件循环阻塞 {summary['loop_blocking']['total_ms']}ms")
+        return summary
+
+    def _save(self, session: _Session, summary: Dict[str, Any]) -> Dict[str, Any]:
+        summary.update(session.save())
+        with open(os.path.join(self.path, f"{session.profile_id}.json"), "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        self._prune()
+        return summary
+
+    def _prune(self):
+        profiles = self.list_profiles()
+        for summary in profiles[self.max_profiles:]:
+            for name in [f"{summary['profile_id']}.json", *summary["files"].values()]:
+                try:
+                    os.remove(os.path.join(self.path, name))
+                except FileNotFoundError:
+                    pass
+
+    def list_profiles(self) -> List[Dict[str, Any]]:
+        """列出已保存的剖析结果，最新的在前"""
+        if not os.path.isdir(self.path):
+            return []
+        profiles = []
+        for name in sorted(os.listdir(self.path), reverse=True):
+            if name.endswith(".json"):
+                with open(os.path.join(self.path, name), "r", encoding="utf-8") as f:
+                    profiles.append(json.load(f))
+        return profiles
+
+    def get_file(self, profile_id: str, kind: str) -> Optional[str]:
+        """
+        获取剖析结果文件路径
+        Args:
+            profile_id: 剖析ID
+            kind: json（摘要）、folded（折叠栈）、blocked（阻塞期间的折叠栈）或 prof（cProfile）
+        Returns:
+            文件路径，不存在时返回None
+        """
+        summary_path = os.path.join(self.path, f"{os.path.basename(profile_id)}.json")
+        if not os.path.exists(summary_path):
+            return None
+        if kind == "json":
+            return summary_path
+        with open(summary_path, "r", encoding="utf-8") as f:
+            name = json.load(f)["files"].get(kind)
+        return os.path.join(self.path, name) if name else None
+
+    def get_stats(self, include_items: bool = False) -> Dict[str, Any]:
+        """
+        获取剖析状态，读取剖析目录，需在线程池中调用
+        Args:
+            include_items: 是否附带已保存的剖析摘要列表
+        """
+        profiles = self.list_profiles()
+        stats = {
+            "enabled": self.enabled,
+            "active": self._active.profile_id if self._active else None,
+            "armed": [dict(entry) for entry in self._armed],
+            "profiles": len(profiles)
+        }
+        if include_items:
+            stats["items"] = profiles
+        return stats
+
+
+# 全局请求剖析实例
+_request_profiler: Optional[RequestProfiler] = None
+
+
+def get_request_profiler() -> RequestProfiler:
+    """获取请求剖析实例"""
+    global _request_profiler
+    if _request_profiler is None:
+        _request_profiler = RequestProfiler()
+    return _request_profiler
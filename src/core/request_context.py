@@ -0,0 +1,66 @@
+"""
+请求上下文
+在一次HTTP请求的协程链路中传递调用方信息，供上游调用计费、调度等使用
+"""
+
+import uuid
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+# 标识API调用方的请求头
+CLIENT_HEADER = "X-API-Client"
+DEFAULT_CLIENT = "anonymous"
+# 标识租户和调度优先级（如 interactive、batch）的请求头
+TENANT_HEADER = "X-Tenant-ID"
+PRIORITY_HEADER = "X-Priority"
+# 标识被检测应用的请求头，检测结果按应用归档
+APP_HEADER = "X-App-ID"
+
+
+class RequestContext:
+    """请求上下文"""
+
+    def __init__(self, request_id: Optional[str] = None, client_id: str = DEFAULT_CLIENT,
+                 tenant_id: Optional[str] = None, priority: Optional[str] = None,
+                 app_id: Optional[str] = None):
+        self.request_id = request_id or uuid.uuid4().hex
+        self.client_id = client_id or DEFAULT_CLIENT
+        # 未指定租户时按调用方公平排队
+        self.tenant_id = tenant_id or self.client_id
+        self.priority = priority.strip().lower() if priority else None
+        self.app_id = app_id.strip() if app_id else None
+        self.extra: Dict[str, Any] = {}
+
+
+_current_context: ContextVar[Optional[RequestContext]] = ContextVar("request_context", default=None)
+
+
+def get_request_context() -> RequestContext:
+    """获取当前请求上下文，不在请求中时返回默认上下文"""
+    context = _current_context.get()
+    if context is None:
+        context = RequestContext()
+        _current_context.set(context)
+    return context
+
+
+def set_request_context(context: RequestContext):
+    """设置当前请求上下文"""
+    return _current_context.set(context)
+
+
+def context_from_headers(headers) -> RequestContext:
+    """
+    根据请求头构造请求上下文
+    Args:
+        headers: HTTP请求头
+    Returns:
+        请求上下文
+    """
+    return RequestContext(
+        request_id=headers.get("X-Request-ID"),
+        client_id=headers.get(CLIENT_HEADER, DEFAULT_CLIENT),
+        tenant_id=headers.get(TENANT_HEADER),
+        priority=headers.get(PRIORITY_HEADER),
+        app_id=headers.get(APP_HEADER)
+    )
@@ -0,0 +1,7 @@
+"""
+地区合规规则包初始化文件
+"""
+
+from .rule_packs import RulePackLibrary, get_rule_pack_library
+
+__all__ = ["RulePackLibrary", "get_rule_pack_library"]
@@ -0,0 +1,177 @@
+"""
+地区合规规则包
+按法域组织检测要点（中国沿用合规检测Agent内置的评估框架，欧盟、美国等使用独立规则包），
+各地区的检测要点归入统一的检测主题，用于将多地区检测结果合并为 主题×地区 矩阵
+"""
+
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+try:
+    from src.utils.utils import get_config, get_resource_dir
+except ImportError:
+    from ppgllm.src.utils import get_config, get_resource_dir
+try:
+    from prompt.compliance_checker_prompt import CHECKPOINTS
+except ImportError:
+    from ....prompt.compliance_checker_prompt import CHECKPOINTS
+
+
+class RulePackLibrary:
+    """地区合规规则包库"""
+
+    def __init__(self, pack_file: Optional[str] = None):
+        config = get_config().get("regional_compliance", {})
+        pack_file = pack_file or config.get("rule_pack_file") or os.path.join(get_resource_dir(), "region_rule_packs.json")
+        with open(pack_file, "r", encoding="utf-8") as f:
+            library = json.load(f)
+        self.topics: List[Dict[str, str]] = library["topics"]
+        self._topic_titles = {topic["id"]: topic["title"] for topic in self.topics}
+        self.regions: Dict[str, Dict[str, Any]] = library["regions"]
+        self._catalogs = {name: self._build_catalog(name, pack) for name, pack in self.regions.items()}
+        # 名称和别名精确匹配（忽略大小写和空白），不做子串匹配以免把港澳台等地区误配到其他法域
+        self._aliases = {
+            self._normalize(alias): name
+            for name, pack in self.regions.items() for alias in [name] + pack.get("aliases", [])
+        }
+        logger.info(f"地区规则包加载完成: {', '.join(f'{name}({len(items)})' for name, items in self._catalogs.items())}")
+
+    def _build_catalog(self, name: str, pack: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """生成地区检测要点目录，每个要点带有所属主题"""
+        if pack.get("builtin"):
+            topic_of = {item_id: topic for topic, ids in pack["checkpoint_topics"].items() for item_id in ids}
+            return [{**entry, "topic": topic_of.get(entry["id"], "other")} for entry in CHECKPOINTS]
+        catalog = []
+        for entry in pack["checkpoints"]:
+            if entry["topic"] not in self._topic_titles:
+                raise ValueError(f"规则包 {name} 的检测要点 {entry['id']} 使用了未定义的主题: {entry['topic']}")
+            catalog.append({**entry, "section": self._topic_titles[entry["topic"]]})
+        return catalog
+
+    @staticmethod
+    def _normalize(value: str) -> str:
+        return "".join(value.split()).lower()
+
+    def is_builtin(self, region: str) -> bool:
+        """是否使用合规检测Agent内置的评估框架"""
+        return bool(self.regions[region].get("builtin"))
+
+    def resolve_regions(self, regions: Optional[List[str]] = None) -> Tuple[List[str], List[str]]:
+        """
+        按名称或别名精确匹配规则包
+        Args:
+            regions: 目标地区，为空时为中国
+        Returns:
+            (匹配到的地区名称，按请求顺序去重；没有规则包的地区)
+        """
+        matched: List[str] = []
+        unknown: List[str] = []
+        for item in regions or ["中国"]:
+            name = self._aliases.get(self._normalize(item))
+            if name is None:
+                unknown.append(item)
+            elif name not in matched:
+                matched.append(name)
+        return matched, unknown
+
+    def resolve_topics(self, check_points: Optional[List[str]] = None) -> Optional[List[str]]:
+        """
+        将检测范围解析为检测主题
+        Args:
+            check_points: 主题id或名称（如 cross_border、跨境），为空表示全部主题
+        Returns:
+            主题id列表，全部主题时返回None
+        Raises:
+            ValueError: 无法识别的检测范围
+        """
+        if not check_points:
+            return None
+        topics = []
+        for item in check_points:
+            value = str(item).strip()
+            topic = next((topic["id"] for topic in self.topics
+                          if value == topic["id"] or (value and value in topic["title"])), None)
+            if topic is None:
+                raise ValueError(f"未知的检测主题: {value}，可选: {', '.join(self._topic_titles)}")
+            if topic not in topics:
+                topics.append(topic)
+        return topics
+
+    def catalog(self, region: str, topics: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """获取地区的检测要点目录，可按主题筛选"""
+        catalog = self._catalogs[region]
+        if topics is None:
+            return list(catalog)
+        return [entry for entry in catalog if entry["topic"] in topics]
+
+    @staticmethod
+    def render_framework(catalog: List[Dict[str, Any]]) -> str:
+        """将规则包检测要点渲染为提示词中的评估框架"""
+        blocks = []
+        section = None
+        for entry in catalog:
+            if entry["section"] != section:
+                section = entry["section"]
+                blocks.append(f"## {section}")
+            basis = "、".join(f"`{code}`" for code in entry["legal_basis"]) or "/"
+            blocks.append(f"### {entry['id']}. {entry['title']}\n\n* ✅ {entry.get('check', entry['title'])}\n"
+                          f"* 🧾 输出：“是/否”，并引用原文中相关段落。\n* ⚖️ 法律依据：{basis}")
+        return "\n\n".join(blocks)
+
+    def build_matrix(self, reports: Dict[str, Dict[str, Any]],
+                     topics: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        将各地区的检测报告合并为 主题×地区 矩阵
+        Args:
+            reports: {地区: ComplianceReport 字典}
+            topics: 检测范围内的主题，为空表示全部
+        Returns:
+            按主题顺序排列的行，每行 cells 为 {地区: 单元格}，地区没有该主题的要点时单元格为None；
+            单元格 status 为 pass（全部满足）、partial、fail（全部未满足）或 missing（模型未返回）
+        """
+        rows = []
+        for topic in self.topics:
+            if topics is not None and topic["id"] not in topics:
+                continue
+            cells: Dict[str, Optional[Dict[str, Any]]] = {}
+            for region, report in reports.items():
+                entries = [entry for entry in self._catalogs[region] if entry["topic"] == topic["id"]]
+                if not entries:
+                    cells[region] = None
+                    continue
+                results = {item["id"]: item["passed"] for item in report.get("checkpoints", [])}
+                answered = [entry["id"] for entry in entries if entry["id"] in results]
+                passed = sum(1 for item_id in answered if results[item_id])
+                if not answered:
+                    status = "missing"
+                elif passed == len(entries):
+                    status = "pass"
+                elif passed == 0 and len(answered) == len(entries):
+                    status = "fail"
+                else:
+                    status = "partial"
+                cells[region] = {
+                    "status": status,
+                    "total": len(entries),
+                    "passed": passed,
+                    "failed_ids": [item_id for item_id in answered if not results[item_id]],
+                    "missing_ids": [entry["id"] for entry in entries if entry["id"] not in results]
+                }
+            if any(cell is not None for cell in cells.values()):
+                rows.append({"topic": topic["id"], "title": topic["title"], "cells": cells})
+        return rows
+
+
+# 全局规则包实例
+_rule_pack_library: Optional[RulePackLibrary] = None
+
+
+def get_rule_pack_library() -> RulePackLibrary:
+    """获取地区合规规则包实例"""
+    global _rule_pack_library
+    if _rule_pack_library is None:
+        _rule_pack_library = RulePackLibrary()
+    return _rule_pack_library
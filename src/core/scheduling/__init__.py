@@ -0,0 +1,7 @@
+"""
+上游调用调度包初始化文件
+"""
+
+from .admission import AdmissionController, AdmissionRejectedError, get_admission_controller
+
+__all__ = ["AdmissionController", "AdmissionRejectedError", "get_admission_controller"]
@@ -0,0 +1,251 @@
+"""
+上游调用准入控制与调度
+限制同时进行的上游调用数量，超出时按优先级通道排队：高优先级通道优先获得名额，更高优先级通道有请求排队时低优先级通道最多占用配置的并发份额；
+同一通道内按调用方加权公平排队（按请求的输入token计费）。队列已满或排队超时立即拒绝，由API返回503及Retry-After
+"""
+
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional
+
+from loguru import logger
+
+try:
+    from src.utils.utils import get_config
+    from src.core.request_context import get_request_context
+    from src.core.telemetry import trace_stage
+except ImportError:
+    from ppgllm.src.utils import get_config
+    from ..request_context import get_request_context
+    from ..telemetry import trace_stage
+
+
+class AdmissionRejectedError(Exception):
+    """上游调用容量已满，请求未被准入"""
+
+    def __init__(self, reason: str, retry_after: int):
+        self.reason = reason
+        self.retry_after = retry_after
+        super().__init__(f"服务繁忙（{reason}），请 {retry_after} 秒后重试")
+
+
+class _Lane:
+    """优先级通道：通道内按调用方加权公平排队"""
+
+    def __init__(self, name: str, priority: int, max_in_flight: int, max_queue: int,
+                 queue_timeout: float, metrics_window: int):
+        self.name = name
+        self.priority = priority
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.queued = 0
+        # (虚拟完成时间, 序号, 虚拟开始时间, future)
+        self.heap: List[tuple] = []
+        self.virtual_time = 0.0
+        self.tenant_finish: Dict[str, float] = {}
+        self.waits: Deque[float] = deque(maxlen=metrics_window)
+        self.stats = {"admitted": 0, "queued": 0, "rejected_full": 0, "rejected_timeout": 0, "max_queue_depth": 0}
+
+    def has_capacity(self) -> bool:
+        return self.in_flight < self.max_in_flight
+
+    def push(self, future: asyncio.Future, tenant: str, cost: float, weight: float, sequence: int):
+        """按开始时间公平排队（SFQ）计算虚拟完成时间"""
+        start = max(self.virtual_time, self.tenant_finish.get(tenant, 0.0))
+        finish = start + cost / weight
+        self.tenant_finish[tenant] = finish
+        heapq.heappush(self.heap, (finish, sequence, start, future))
+        self.queued += 1
+        self.stats["queued"] += 1
+        self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], self.queued)
+
+    def pop(self) -> Optional[asyncio.Future]:
+        """取出虚拟完成时间最小且仍在等待的请求"""
+        while self.heap:
+            _, _, start, future = heapq.heappop(self.heap)
+            if future.done():
+                continue
+            self.queued -= 1
+            self.virtual_time = start
+            return future
+        return None
+
+
+class AdmissionController:
+    """上游调用准入控制器"""
+
+    def __init__(self):
+        config = get_config().get("admission", {})
+        self.enabled = config.get("enabled", True)
+        self.max_in_flight = config.get("max_in_flight", 16)
+        self.max_queue = config.get("max_queue", 64)
+        self.queue_timeout = config.get("queue_timeout", 10.0)
+        self.min_retry_after = config.get("retry_after", 1)
+        self.default_lane = config.get("default_lane", "interactive")
+        self.tenant_weights: Dict[str, float] = config.get("tenant_weights", {})
+        metrics_window = config.get("metrics_window", 1000)
+        lanes = config.get("lanes") or {"interactive": {"priority": 0, "share": 1.0}}
+        self.lanes: Dict[str, _Lane] = {
+            name: _Lane(
+                name=name,
+                priority=lane.get("priority", 0),
+                max_in_flight=max(1, math.floor(self.max_in_flight * lane.get("share", 1.0))),
+                max_queue=lane.get("max_queue", self.max_queue),
+                queue_timeout=lane.get("queue_timeout", self.queue_timeout),
+                metrics_window=metrics_window
+            )
+            for name, lane in lanes.items()
+        }
+        if self.default_lane not in self.lanes:
+            self.default_lane = next(iter(self.lanes))
+        # 按优先级排列（数值越小优先级越高）
+        self._ordered = sorted(self.lanes.values(), key=lambda lane: lane.priority)
+        self._in_flight = 0
+        self._sequence = itertools.count()
+        self._avg_hold = 0.0
+        self._tenants: Dict[str, int] = {}
+
+    def resolve_lane(self, priority: Optional[str] = None) -> _Lane:
+        """按请求的优先级选择通道，未知或未指定时使用默认通道"""
+        return self.lanes.get(priority or self.default_lane) or self.lanes[self.default_lane]
+
+    def retry_after(self, lane: _Lane) -> int:
+        """按通道队列深度和平均占用时长估算重试等待秒数"""
+        backlog = (lane.queued + 1) / max(lane.max_in_flight, 1)
+        return max(self.min_retry_after, math.ceil(backlog * self._avg_hold))
+
+    def _reject(self, lane: _Lane, reason: str, stat: str):
+        lane.stats[stat] += 1
+        logger.warning(f"上游调用未准入 [{lane.name}]: {reason}（并发 {self._in_flight}, 通道排队 {lane.queued}）")
+        raise AdmissionRejectedError(reason, self.retry_after(lane))
+
+    def _within_share(self, lane: _Lane) -> bool:
+        """通道份额只在更高优先级通道有请求排队时生效，否则空闲名额可全部由该通道使用"""
+        return lane.has_capacity() or not any(other.queued for other in self._ordered if other.priority < lane.priority)
+
+    def _can_start(self, lane: _Lane) -> bool:
+        """有空闲名额、通道未超出份额，且没有更高或同等优先级的请求在等待"""
+        if self._in_flight >= self.max_in_flight or not self._within_share(lane):
+            return False
+        return not any(other.queued and self._within_share(other)
+                       for other in self._ordered if other.priority <= lane.priority)
+
+    async def _acquire(self, lane: _Lane, tenant: str, cost: float):
+        if self._can_start(lane):
+            self._in_flight += 1
+            lane.in_flight += 1
+            lane.waits.append(0.0)
+            return
+        if lane.queued >= lane.max_queue:
+            self._reject(lane, "等待队列已满", "rejected_full")
+
+        start = time.perf_counter()
+        future = asyncio.get_running_loop().create_future()
+        lane.push(future, tenant, max(cost, 1.0), self.tenant_weights.get(tenant, 1.0), next(self._sequence))
+        try:
+            await asyncio.wait_for(future, lane.queue_timeout)
+        except asyncio.TimeoutError:
+            # 超时与分配名额同时发生时名额已归该请求（queued 已在分配时扣减），直接接受
+            if not (future.done() and not future.cancelled()):
+                lane.queued -= 1
+                self._reject(lane, "排队超时", "rejected_timeout")
+        except asyncio.CancelledError:
+            # 取消时名额可能已经分配给该请求，需要归还
+            if future.done() and not future.cancelled():
+                self._release(lane)
+            else:
+                lane.queued -= 1
+            raise
+        lane.waits.append((time.perf_counter() - start) * 1000)
+
+    def _release(self, lane: _Lane):
+        """释放名额，并按优先级和通道份额将空闲名额分配给排队请求"""
+        self._in_flight -= 1
+        lane.in_flight -= 1
+        for candidate in self._ordered:
+            if self._in_flight >= self.max_in_flight:
+                break
+            while candidate.queued and self._within_share(candidate) and self._in_flight < self.max_in_flight:
+                future = candidate.pop()
+                if future is None:
+                    break
+                self._in_flight += 1
+                candidate.in_flight += 1
+                future.set_result(True)
+
+    @asynccontextmanager
+    async def slot(self, cost: float = 1.0) -> AsyncIterator[None]:
+        """
+        占用一个上游调用名额，优先级通道和调用方取自当前请求上下文
+        Args:
+            cost: 请求开销（输入token数），用于调用方之间的公平排队
+        Raises:
+            AdmissionRejectedError: 队列已满或排队超时
+        """
+        if not self.enabled:
+            yield
+            return
+        context = get_request_context()
+        lane = self.resolve_lane(context.priority)
+        tenant = context.tenant_id
+        with trace_stage("admission.acquire", timing="queue", lane=lane.name, tenant=tenant, cost=cost):
+            await self._acquire(lane, tenant, cost)
+        lane.stats["admitted"] += 1
+        self._tenants[tenant] = self._tenants.get(tenant, 0) + 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            hold = time.perf_counter() - start
+            self._avg_hold = hold if self._avg_hold == 0 else 0.9 * self._avg_hold + 0.1 * hold
+            self._release(lane)
+
+    @staticmethod
+    def _percentiles(values) -> Dict[str, float]:
+        ordered = sorted(values)
+
+        def percentile(value: float) -> float:
+            return round(ordered[min(len(ordered) - 1, int(len(ordered) * value))], 3) if ordered else 0.0
+
+        return {"p50": percentile(0.5), "p90": percentile(0.9), "p99": percentile(0.99)}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取并发、各通道队列深度和排队耗时统计"""
+        return {
+            "enabled": self.enabled,
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self._in_flight,
+            "queue_depth": sum(lane.queued for lane in self._ordered),
+            "avg_hold_seconds": round(self._avg_hold, 3),
+            "lanes": {
+                lane.name: {
+                    "priority": lane.priority,
+                    "max_in_flight": lane.max_in_flight,
+                    "in_flight": lane.in_flight,
+                    "queue_depth": lane.queued,
+                    "wait_ms": self._percentiles(lane.waits),
+                    **lane.stats
+                }
+                for lane in self._ordered
+            },
+            "admitted_by_tenant": dict(self._tenants)
+        }
+
+
+# 全局准入控制器实例
+_admission_controller: Optional[AdmissionController] = None
+
+
+def get_admission_controller() -> AdmissionController:
+    """获取准入控制器实例"""
+    global _admission_controller
+    if _admission_controller is None:
+        _admission_controller = AdmissionController()
+    return _admission_controller
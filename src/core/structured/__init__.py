@@ -0,0 +1,22 @@
+"""
+结构化输出包初始化文件
+"""
+
+from .schemas import (
+    ComplianceCheckpointResult, ComplianceSectionSummary, ComplianceReport,
+    ReadabilityIssue, ReadabilityDimensionResult, ReadabilityReport
+)
+from .parser import STRUCTURED_SPECS, IncrementalJSONArrayParser, StructuredReportParser, parse_json_text
+
+__all__ = [
+    "ComplianceCheckpointResult",
+    "ComplianceSectionSummary",
+    "ComplianceReport",
+    "ReadabilityIssue",
+    "ReadabilityDimensionResult",
+    "ReadabilityReport",
+    "STRUCTURED_SPECS",
+    "IncrementalJSONArrayParser",
+    "StructuredReportParser",
+    "parse_json_text"
+]
@@ -0,0 +1,235 @@
+"""
+结构化输出解析器
+增量解析流式返回的JSON，并校验为强类型检测报告
+"""
+
+import json
+import re
+from typing import Any, Dict, List, Optional, Set
+
+from loguru import logger
+from pydantic import ValidationError
+
+from .schemas import (
+    ComplianceCheckpointResult, ComplianceReport,
+    ReadabilityDimensionResult, ReadabilityReport,
+    build_section_summaries
+)
+
+try:
+    from prompt.compliance_checker_prompt import CHECKPOINTS, STRUCTURED_OUTPUT_PROMPT as CC_STRUCTURED_PROMPT
+    from prompt.compliance_checker_prompt import CLAUSE_ANNOTATION_PROMPT as CC_CLAUSE_PROMPT
+    from prompt.readability_checker_prompt import DIMENSIONS, STRUCTURED_OUTPUT_PROMPT as RC_STRUCTURED_PROMPT
+    from prompt.readability_checker_prompt import CLAUSE_ANNOTATION_PROMPT as RC_CLAUSE_PROMPT
+except ImportError:
+    from ....prompt.compliance_checker_prompt import CHECKPOINTS, STRUCTURED_OUTPUT_PROMPT as CC_STRUCTURED_PROMPT
+    from ....prompt.compliance_checker_prompt import CLAUSE_ANNOTATION_PROMPT as CC_CLAUSE_PROMPT
+    from ....prompt.readability_checker_prompt import DIMENSIONS, STRUCTURED_OUTPUT_PROMPT as RC_STRUCTURED_PROMPT
+    from ....prompt.readability_checker_prompt import CLAUSE_ANNOTATION_PROMPT as RC_CLAUSE_PROMPT
+
+
+# 支持结构化输出的Agent及其解析规则
+STRUCTURED_SPECS: Dict[str, Dict[str, Any]] = {
+    "compliance_checker": {
+        "array_key": "checkpoints",
+        "item_model": ComplianceCheckpointResult,
+        "report_model": ComplianceReport,
+        "catalog": CHECKPOINTS,
+        "prompt": CC_STRUCTURED_PROMPT,
+        "clause_prompt": CC_CLAUSE_PROMPT
+    },
+    "readability_checker": {
+        "array_key": "dimensions",
+        "item_model": ReadabilityDimensionResult,
+        "report_model": ReadabilityReport,
+        "catalog": DIMENSIONS,
+        "prompt": RC_STRUCTURED_PROMPT,
+        "clause_prompt": RC_CLAUSE_PROMPT
+    }
+}
+
+_FENCE_PATTERN = re.compile(r"^```(?:json)?\s*|\s*```$")
+
+
+def parse_json_text(text: str) -> Optional[Dict[str, Any]]:
+    """
+    解析模型返回的JSON文本，兼容Markdown代码块包裹
+    Args:
+        text: 模型返回的文本
+    Returns:
+        解析得到的字典，失败时返回None
+    """
+    cleaned = _FENCE_PATTERN.sub("", text.strip())
+    start, end = cleaned.find("{"), cleaned.rfind("}")
+    if start < 0 or end <= start:
+        return None
+    try:
+        data = json.loads(cleaned[start:end + 1])
+    except json.JSONDecodeError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+class IncrementalJSONArrayParser:
+    """流式JSON数组增量解析器，数组中每个对象闭合后立即产出"""
+
+    def __init__(self, array_key: str):
+        self._key_pattern = re.compile(r'"%s"\s*:\s*\[' % re.escape(array_key))
+        self._text = ""
+        self._pos = 0  # 已扫描到的位置
+        self._in_array = False
+        self._done = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._element_start = -1
+
+    @property
+    def text(self) -> str:
+        """已接收的完整文本"""
+        return self._text
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """
+        追加一段流式文本
+        Args:
+            chunk: 新到达的文本
+        Returns:
+            本次新闭合的数组元素
+        """
+        self._text += chunk
+        if self._done:
+            return []
+        if not self._in_array:
+            match = self._key_pattern.search(self._text, max(0, self._pos - 64))
+            if match is None:
+                self._pos = len(self._text)
+                return []
+            self._in_array = True
+            self._pos = match.end()
+        return self._scan()
+
+    def _scan(self) -> List[Dict[str, Any]]:
+        """从上次位置继续扫描，每个字符只处理一次"""
+        elements = []
+        text = self._text
+        for index in range(self._pos, len(text)):
+            char = text[index]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if self._depth == 0:
+                    self._element_start = index
+                self._depth += 1
+            elif char in "}]":
+                if self._depth == 0:
+                    # 数组本身结束
+                    self._done = True
+                    self._pos = index + 1
+                    return elements
+                self._depth -= 1
+                if self._depth == 0:
+                    raw = text[self._element_start:index + 1]
+                    try:
+                        element = json.loads(raw)
+                        if isinstance(element, dict):
+                            elements.append(element)
+                    except json.JSONDecodeError:
+                        logger.warning(f"结构化输出元素解析失败: {raw[:100]}")
+        self._pos = len(text)
+        return elements
+
+
+class StructuredReportParser:
+    """检测报告解析器"""
+
+    def __init__(self, agent_type: str, catalog: Optional[List[Dict[str, Any]]] = None):
+        """
+        Args:
+            agent_type: 检测类Agent类型
+            catalog: 检测要点目录，默认使用该Agent的评估框架（分地区检测时传入地区规则包）
+        """
+        if agent_type not in STRUCTURED_SPECS:
+            raise ValueError(f"Agent类型不支持结构化输出: {agent_type}")
+        self.agent_type = agent_type
+        self.spec = STRUCTURED_SPECS[agent_type]
+        self.catalog = catalog if catalog is not None else self.spec["catalog"]
+        self._stream_parser = IncrementalJSONArrayParser(self.spec["array_key"])
+        self._items: Dict[int, Any] = {}
+        # 已校验过的数组元素，完整解析时不再重复校验（避免同一校验错误报告两次）
+        self._validated: Set[str] = set()
+        self.errors: List[str] = []
+
+    def _validate_item(self, raw: Dict[str, Any]):
+        """校验单个数组元素，同一元素只校验一次"""
+        key = json.dumps(raw, ensure_ascii=False, sort_keys=True)
+        if key in self._validated:
+            return None
+        self._validated.add(key)
+        try:
+            return self.spec["item_model"].model_validate(raw)
+        except ValidationError as e:
+            self.errors.append(str(e))
+            logger.warning(f"结构化输出元素校验失败 {self.agent_type}: {str(e)}")
+            return None
+
+    def feed(self, chunk: str) -> List[Any]:
+        """
+        追加一段流式文本
+        Args:
+            chunk: 新到达的文本
+        Returns:
+            本次新解析出的检测要点/维度结果
+        """
+        items = []
+        for raw in self._stream_parser.feed(chunk):
+            item = self._validate_item(raw)
+            if item is not None and item.id not in self._items:
+                self._items[item.id] = item
+                items.append(item)
+        return items
+
+    def finalize(self):
+        """
+        结束解析并生成完整报告
+        Returns:
+            ComplianceReport 或 ReadabilityReport
+        """
+        data = parse_json_text(self._stream_parser.text) or {}
+        for raw in data.get(self.spec["array_key"]) or []:
+            if isinstance(raw, dict):
+                item = self._validate_item(raw)
+                if item is not None:
+                    self._items.setdefault(item.id, item)
+
+        catalog = self.catalog
+        catalog_ids = {entry["id"]: entry for entry in catalog}
+        items = [self._items[item_id] for item_id in sorted(self._items) if item_id in catalog_ids]
+        missing_ids = [entry["id"] for entry in catalog if entry["id"] not in self._items]
+
+        fields: Dict[str, Any] = {
+            self.spec["array_key"]: items,
+            "summary": data.get("summary"),
+            "missing_ids": missing_ids
+        }
+        if self.agent_type == "compliance_checker":
+            for item in items:
+                if not item.legal_basis:
+                    item.legal_basis = list(catalog_ids[item.id]["legal_basis"])
+            fields["sections"] = build_section_summaries(items, catalog)
+        else:
+            fields["overall_score"] = data.get("overall_score")
+        try:
+            return self.spec["report_model"].model_validate(fields)
+        except ValidationError as e:
+            self.errors.append(str(e))
+            fields.pop("overall_score", None)
+            return self.spec["report_model"].model_validate(fields)
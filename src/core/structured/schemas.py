@@ -0,0 +1,119 @@
+"""
+结构化检测结果模型
+合规性检测按检测要点、可读性检测按检测维度输出强类型结果
+"""
+
+from typing import Any, Dict, List, Optional
+
+from pydantic import AliasChoices, BaseModel, Field, field_validator
+
+_TRUE_VALUES = {"是", "yes", "true", "y", "1", "通过", "符合"}
+_FALSE_VALUES = {"否", "no", "false", "n", "0", "不通过", "不符合"}
+
+
+class ComplianceCheckpointResult(BaseModel):
+    """单个合规检测要点结果"""
+    id: int = Field(..., description="检测要点编号")
+    passed: bool = Field(..., validation_alias=AliasChoices("passed", "result"), description="是否满足")
+    quotes: List[str] = Field(default_factory=list, description="引用的原文段落")
+    legal_basis: List[str] = Field(default_factory=list, description="法律依据编号")
+    suggestion: Optional[str] = Field(None, description="改进建议")
+
+    @field_validator("passed", mode="before")
+    @classmethod
+    def _parse_passed(cls, value: Any) -> Any:
+        """将“是/否”等文本结论转换为布尔值"""
+        if isinstance(value, str):
+            normalized = value.strip().lower()
+            if normalized in _TRUE_VALUES:
+                return True
+            if normalized in _FALSE_VALUES:
+                return False
+        return value
+
+    @field_validator("quotes", "legal_basis", mode="before")
+    @classmethod
+    def _ensure_list(cls, value: Any) -> Any:
+        """兼容模型输出单个字符串的情况"""
+        if value is None:
+            return []
+        if isinstance(value, str):
+            return [value] if value else []
+        return value
+
+
+class ComplianceSectionSummary(BaseModel):
+    """合规检测维度（评估框架章节）汇总"""
+    section: str = Field(..., description="评估框架章节")
+    total: int = Field(..., description="检测要点数量")
+    passed: int = Field(..., description="满足的检测要点数量")
+    failed_ids: List[int] = Field(default_factory=list, description="未满足的检测要点编号")
+
+
+class ComplianceReport(BaseModel):
+    """合规性检测结构化报告"""
+    checkpoints: List[ComplianceCheckpointResult] = Field(default_factory=list, description="检测要点结果")
+    sections: List[ComplianceSectionSummary] = Field(default_factory=list, description="章节汇总")
+    summary: Optional[str] = Field(None, description="整体评估意见")
+    missing_ids: List[int] = Field(default_factory=list, description="模型未返回的检测要点编号")
+
+
+class ReadabilityIssue(BaseModel):
+    """单个可读性问题"""
+    violation_type: str = Field(..., description="违规点类型")
+    description: str = Field("", description="具体问题及引用原文")
+    advice: Optional[str] = Field(None, description="评估建议")
+    suggestion: Optional[str] = Field(None, description="优化方案")
+    legal_basis: List[str] = Field(default_factory=list, description="参考的法规编号")
+
+    @field_validator("legal_basis", mode="before")
+    @classmethod
+    def _ensure_list(cls, value: Any) -> Any:
+        """兼容模型输出单个字符串的情况"""
+        if value is None:
+            return []
+        if isinstance(value, str):
+            return [item.strip() for item in value.replace("、", ",").split(",") if item.strip()]
+        return value
+
+
+class ReadabilityDimensionResult(BaseModel):
+    """单个可读性检测维度结果"""
+    id: int = Field(..., description="检测维度编号")
+    score: Optional[int] = Field(None, ge=0, le=100, description="维度得分")
+    issues: List[ReadabilityIssue] = Field(default_factory=list, description="发现的问题")
+
+
+class ReadabilityReport(BaseModel):
+    """可读性检测结构化报告"""
+    dimensions: List[ReadabilityDimensionResult] = Field(default_factory=list, description="检测维度结果")
+    overall_score: Optional[int] = Field(None, ge=0, le=100, description="总体得分")
+    summary: Optional[str] = Field(None, description="整体评估意见")
+    missing_ids: List[int] = Field(default_factory=list, description="模型未返回的检测维度编号")
+
+
+def build_section_summaries(checkpoints: List[ComplianceCheckpointResult],
+                            catalog: List[Dict[str, Any]]) -> List[ComplianceSectionSummary]:
+    """
+    按评估框架章节汇总检测要点结果
+    Args:
+        checkpoints: 检测要点结果
+        catalog: 检测要点目录（含id和section）
+    Returns:
+        章节汇总列表，按目录顺序排列
+    """
+    results = {item.id: item for item in checkpoints}
+    summaries: Dict[str, ComplianceSectionSummary] = {}
+    for entry in catalog:
+        result = results.get(entry["id"])
+        if result is None:
+            continue
+        summary = summaries.setdefault(
+            entry["section"], ComplianceSectionSummary(section=entry["section"], total=0, passed=0)
+        )
+        summary.total += 1
+        if result.passed:
+            summary.passed += 1
+        else:
+            summary.failed_ids.append(entry["id"])
+    return list(summaries.values())
@@ -0,0 +1,13 @@
+"""
+链路追踪包初始化文件
+"""
+
+from .tracing import (
+    format_server_timing, get_tracer, record_timing, setup_tracing, shutdown_tracing, trace_stage
+)
+from .middleware import ServerTimingMiddleware
+
+__all__ = [
+    "ServerTimingMiddleware", "format_server_timing", "get_tracer", "record_timing",
+    "setup_tracing", "shutdown_tracing", "trace_stage"
+]
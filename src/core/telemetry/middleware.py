@@ -0,0 +1,42 @@
+"""
+Server-Timing 中间件
+为每个HTTP请求创建根span并收集阶段耗时，在响应头中返回；流式响应只包含响应头发出前已完成的阶段
+"""
+
+import time
+from typing import Any, Callable, Dict
+
+from opentelemetry.trace import SpanKind
+
+try:
+    from src.utils.utils import get_config
+except ImportError:
+    from ppgllm.src.utils import get_config
+from .tracing import begin_timings, format_server_timing, trace_stage
+
+
+class ServerTimingMiddleware:
+    """ASGI中间件：请求级span与 Server-Timing 响应头"""
+
+    def __init__(self, app: Callable):
+        self.app = app
+        self.server_timing = get_config().get("telemetry", {}).get("server_timing", True)
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        timings = begin_timings()
+
+        async def send_with_timing(message: Dict[str, Any]):
+            if message["type"] == "http.response.start" and self.server_timing:
+                value = format_server_timing(timings, (time.perf_counter() - start) * 1000)
+                message.setdefault("headers", []).append((b"server-timing", value.encode("latin-1")))
+                span.set_attribute("http.status_code", message["status"])
+            await send(message)
+
+        with trace_stage(f"{scope['method']} {scope['path']}", kind=SpanKind.SERVER,
+                         **{"http.method": scope["method"], "http.target": scope["path"]}) as span:
+            await self.app(scope, receive, send_with_timing)
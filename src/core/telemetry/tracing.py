@@ -0,0 +1,192 @@
+"""
+链路追踪
+基于 OpenTelemetry API 为路由、Agent构建、记忆读写和上游调用创建span，
+同时按请求汇总各阶段耗时，写入 Server-Timing 响应头。未安装 opentelemetry-sdk 或未启用时span为空操作
+"""
+
+import json
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from loguru import logger
+from opentelemetry import trace
+from opentelemetry.trace import Span, SpanKind, Status, StatusCode
+
+try:
+    from src.utils.utils import get_config
+except ImportError:
+    from ppgllm.src.utils import get_config
+
+TRACER_NAME = "ppgllm"
+
+# 当前请求的阶段耗时 {阶段: [次数, 累计毫秒]}，由 ServerTimingMiddleware 在请求开始时设置
+_timings: ContextVar[Optional[Dict[str, List[float]]]] = ContextVar("server_timings", default=None)
+
+_configured = False
+
+
+def _clean(attributes: Dict[str, Any]) -> Dict[str, Any]:
+    """OpenTelemetry属性只接受基本类型，忽略空值"""
+    return {
+        key: value if isinstance(value, (str, bool, int, float)) else str(value)
+        for key, value in attributes.items() if value is not None
+    }
+
+
+def get_tracer() -> trace.Tracer:
+    """获取链路追踪tracer"""
+    return trace.get_tracer(TRACER_NAME)
+
+
+def begin_timings() -> Dict[str, List[float]]:
+    """为当前请求开始收集阶段耗时"""
+    timings: Dict[str, List[float]] = {}
+    _timings.set(timings)
+    return timings
+
+
+def record_timing(name: str, elapsed_ms: float):
+    """累计当前请求某个阶段的耗时，不在请求上下文中时忽略"""
+    timings = _timings.get()
+    if timings is None:
+        return
+    item = timings.setdefault(name, [0, 0.0])
+    item[0] += 1
+    item[1] += elapsed_ms
+
+
+def format_server_timing(timings: Dict[str, List[float]], total_ms: Optional[float] = None) -> str:
+    """
+    生成 Server-Timing 响应头
+    Args:
+        timings: 阶段耗时
+        total_ms: 请求总耗时
+    Returns:
+        如 build_agent;dur=1.2, upstream;dur=812.4;desc="x2"
+    """
+    entries = []
+    for name, (count, elapsed_ms) in timings.items():
+        entry = f"{name};dur={elapsed_ms:.1f}"
+        if count > 1:
+            entry += f';desc="x{int(count)}"'
+        entries.append(entry)
+    if total_ms is not None:
+        entries.append(f"total;dur={total_ms:.1f}")
+    return ", ".join(entries)
+
+
+@contextmanager
+def trace_stage(span_name: str, timing: Optional[str] = None, current: bool = True,
+                kind: SpanKind = SpanKind.INTERNAL, **attributes) -> Iterator[Span]:
+    """
+    追踪一个处理阶段
+    Args:
+        span_name: span名称
+        timing: 计入 Server-Timing 的阶段名，为空时不计入
+        current: 是否设为当前span；在异步生成器中跨yield使用时应为False，避免上下文泄漏给调用方
+        kind: span类型
+        attributes: span属性
+    Returns:
+        span，可在阶段内追加属性
+    """
+    tracer = get_tracer()
+    start = time.perf_counter()
+    span = tracer.start_span(span_name, kind=kind, attributes=_clean(attributes))
+    try:
+        if current:
+            with trace.use_span(span, record_exception=False, set_status_on_exception=False):
+                yield span
+        else:
+            yield span
+    except Exception as e:
+        span.record_exception(e)
+        span.set_status(Status(StatusCode.ERROR, str(e)))
+        raise
+    except BaseException:
+        # 取消（客户端断开、超时、对冲落败）不视为错误
+        span.set_attribute("cancelled", True)
+        raise
+    finally:
+        span.end()
+        if timing:
+            record_timing(timing, (time.perf_counter() - start) * 1000)
+
+
+class JsonLinesSpanExporter:
+    """将span以JSON行写入本地文件，离线环境下查看链路"""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def export(self, spans: Sequence[Any]):
+        from opentelemetry.sdk.trace.export import SpanExportResult
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                for span in spans:
+                    f.write(json.dumps(json.loads(span.to_json()), ensure_ascii=False) + "\n")
+            return SpanExportResult.SUCCESS
+        except OSError as e:
+            logger.warning(f"写入链路追踪文件失败: {str(e)}")
+            return SpanExportResult.FAILURE
+
+    def shutdown(self):
+        pass
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return True
+
+
+def setup_tracing() -> bool:
+    """
+    按配置初始化链路追踪导出
+    exporter 可选 console（标准输出）、file（JSON行文件）、otlp（需安装 opentelemetry-exporter-otlp-proto-http）
+    Returns:
+        是否已启用span导出
+    """
+    global _configured
+    if _configured:
+        return True
+    config = get_config().get("telemetry", {})
+    exporter_name = config.get("exporter", "none")
+    if not config.get("enabled", False) or exporter_name == "none":
+        return False
+    try:
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+    except ImportError:
+        logger.warning("未安装 opentelemetry-sdk，链路追踪仅输出 Server-Timing 响应头")
+        return False
+
+    if exporter_name == "console":
+        exporter = ConsoleSpanExporter()
+    elif exporter_name == "file":
+        exporter = JsonLinesSpanExporter(config.get("file", "logs/traces.jsonl"))
+    elif exporter_name == "otlp":
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        except ImportError:
+            logger.warning("未安装 opentelemetry-exporter-otlp-proto-http，无法使用OTLP导出")
+            return False
+        exporter = OTLPSpanExporter(endpoint=config.get("otlp_endpoint"))
+    else:
+        logger.warning(f"未知的链路追踪导出方式: {exporter_name}")
+        return False
+
+    provider = TracerProvider(resource=Resource.create({"service.name": config.get("service_name", TRACER_NAME)}))
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    _configured = True
+    logger.info(f"链路追踪已启用: {exporter_name}")
+    return True
+
+
+def shutdown_tracing():
+    """导出剩余span"""
+    provider = trace.get_tracer_provider()
+    if _configured and hasattr(provider, "shutdown"):
+        provider.shutdown()
@@ -0,0 +1,7 @@
+"""
+隐私政策模板包初始化文件
+"""
+
+from .template_engine import PolicyTemplateEngine, get_template_engine
+
+__all__ = ["PolicyTemplateEngine", "get_template_engine"]
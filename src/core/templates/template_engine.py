@@ -0,0 +1,181 @@
+"""
+隐私政策模板引擎
+基于本地条款库按数据类型和地区组装基线隐私政策，条款库无法覆盖的内容标记为缺口交由模型补充
+"""
+
+import json
+import os
+import time
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+try:
+    from src.utils.utils import get_config, get_resource_dir
+except ImportError:
+    from ppgllm.src.utils import get_config, get_resource_dir
+
+
+class _SlotValues(dict):
+    """模板槽位取值，缺失的槽位输出待填写占位符并记录"""
+
+    def __init__(self, values: Dict[str, str], labels: Dict[str, str]):
+        super().__init__(values)
+        self.labels = labels
+        self.missing: List[str] = []
+
+    def __missing__(self, key: str) -> str:
+        label = self.labels.get(key, key)
+        if label not in self.missing:
+            self.missing.append(label)
+        return f"【请填写：{label}】"
+
+
+class PolicyTemplateEngine:
+    """条款库模板引擎"""
+
+    def __init__(self, library_file: Optional[str] = None):
+        config = get_config().get("templates", {})
+        library_file = library_file or config.get("library_file") or os.path.join(get_resource_dir(), "clause_library.json")
+        with open(library_file, "r", encoding="utf-8") as f:
+            self.library = json.load(f)
+        self.data_types: Dict[str, Dict[str, Any]] = self.library["data_types"]
+        self.regions: Dict[str, Dict[str, Any]] = self.library["regions"]
+        # 名称和别名精确匹配（忽略大小写和空白），不做子串匹配以免误配到其他条目
+        self._data_aliases = self._build_aliases(self.data_types)
+        self._region_aliases = self._build_aliases(self.regions)
+        logger.info(f"条款库加载完成: {len(self.data_types)} 种数据类型, {len(self.regions)} 个地区")
+
+    @staticmethod
+    def _normalize(value: str) -> str:
+        return "".join(value.split()).lower()
+
+    @classmethod
+    def _build_aliases(cls, entries: Dict[str, Dict[str, Any]]) -> Dict[str, str]:
+        aliases = {}
+        for name, entry in entries.items():
+            for alias in [name] + list(entry.get("aliases", [])):
+                aliases[cls._normalize(alias)] = name
+        return aliases
+
+    @classmethod
+    def _match(cls, value: str, aliases: Dict[str, str]) -> Optional[str]:
+        """按名称或别名匹配条款库条目，未收录的输入返回None（交由模型补充）"""
+        return aliases.get(cls._normalize(value))
+
+    def _data_clause(self, name: str) -> str:
+        entry = self.data_types[name]
+        clause = f"- {name}：{entry['purpose']}。"
+        if entry.get("impact"):
+            clause += f"{entry['impact']}。"
+        return clause
+
+    def _applies(self, condition: Optional[str], flags: Dict[str, Any]) -> bool:
+        if not condition:
+            return True
+        if condition.startswith("has_region:"):
+            return condition.split(":", 1)[1] in flags["regions"]
+        return bool(flags.get(condition))
+
+    def assemble(self, app_info: Dict[str, Any], outline: List[Dict[str, Any]],
+                 slots: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """
+        组装基线隐私政策
+        Args:
+            app_info: 应用信息（app_name、app_type、data_types、regions、requirements）
+            outline: 章节大纲（POLICY_SECTIONS 中的条目）
+            slots: 模板槽位取值（如 operator、contact_email），缺失时保留待填写占位符
+        Returns:
+            sections: 各章节内容及需模型补充的缺口；placeholders: 待人工填写的槽位；
+            unknown_data_types/unknown_regions: 条款库未覆盖的数据类型和地区
+        """
+        start = time.perf_counter()
+        matched_types: List[str] = []
+        unknown_types: List[str] = []
+        for item in app_info.get("data_types") or []:
+            name = self._match(item, self._data_aliases)
+            if name is None:
+                unknown_types.append(item)
+            elif name not in matched_types:
+                matched_types.append(name)
+        regions: List[str] = []
+        unknown_regions: List[str] = []
+        for item in app_info.get("regions") or ["中国"]:
+            name = self._match(item, self._region_aliases)
+            if name is None:
+                unknown_regions.append(item)
+            elif name not in regions:
+                regions.append(name)
+
+        general = [name for name in matched_types if not self.data_types[name].get("sensitive")]
+        sensitive = [name for name in matched_types if self.data_types[name].get("sensitive")]
+        cross_border = any(region != "中国" for region in regions) or bool(unknown_regions)
+        flags = {
+            "has_sensitive": bool(sensitive),
+            "no_sensitive": not sensitive,
+            "cross_border": cross_border,
+            "no_cross_border": not cross_border,
+            "regions": regions
+        }
+        values = dict(self.library.get("slot_defaults", {}))
+        values.update({
+            "app_name": app_info["app_name"],
+            "app_type": app_info["app_type"],
+            "effective_date": date.today().strftime("%Y年%m月%d日"),
+            "laws": "、".join(self.regions[region]["laws"] for region in regions) or "相关法律法规",
+            "toc": "\n".join(f"{index}. {section['title']}" for index, section in enumerate(outline, 1)),
+            "general_data_clauses": "\n".join(self._data_clause(name) for name in general) or "- 本应用不收集其他个人信息。",
+            "sensitive_data_clauses": "\n".join(self._data_clause(name) for name in sensitive),
+            "region_storage_clauses": "\n".join(self.regions[region]["storage"] for region in regions)
+        })
+        values.update({key: value for key, value in (slots or {}).items() if value})
+        slot_values = _SlotValues(values, self.library.get("slot_labels", {}))
+
+        # 条款库无法覆盖、需要模型补充的内容
+        gaps: Dict[str, List[str]] = {}
+        for item in unknown_types:
+            gaps.setdefault("first_party", []).append(
+                f"补充收集“{item}”的目的、方式和范围；如属于敏感个人信息，还需在“敏感个人信息的处理”中说明必要性和对个人权益的影响"
+            )
+            gaps.setdefault("sensitive", []).append(f"判断“{item}”是否属于敏感个人信息，如是则补充相应说明")
+        for item in unknown_regions:
+            gaps.setdefault("storage", []).append(f"补充面向“{item}”用户的适用法律和跨境传输要求")
+        if app_info.get("requirements"):
+            gaps.setdefault("first_party", []).append(f"满足特殊要求：{app_info['requirements']}")
+
+        sections = []
+        for index, section in enumerate(outline, 1):
+            clauses = [
+                clause["text"].format_map(slot_values)
+                for clause in self.library["sections"].get(section["id"], [])
+                if self._applies(clause.get("when"), flags)
+            ]
+            if not clauses:
+                gaps.setdefault(section["id"], []).append("条款库中没有该章节的条款，请撰写完整章节")
+            sections.append({
+                "id": section["id"],
+                "title": section["title"],
+                "content": f"{index}. {section['title']}\n\n" + "\n\n".join(clause for clause in clauses if clause.strip()),
+                "gaps": gaps.get(section["id"], [])
+            })
+
+        return {
+            "sections": sections,
+            "placeholders": slot_values.missing,
+            "unknown_data_types": unknown_types,
+            "unknown_regions": unknown_regions,
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 3)
+        }
+
+
+# 全局模板引擎实例
+_template_engine: Optional[PolicyTemplateEngine] = None
+
+
+def get_template_engine() -> PolicyTemplateEngine:
+    """获取模板引擎实例"""
+    global _template_engine
+    if _template_engine is None:
+        _template_engine = PolicyTemplateEngine()
+    return _template_engine
@@ -0,0 +1,11 @@
+"""
+工具包初始化文件
+"""
+
+from .registry import Tool, ToolError, ToolRegistry, get_tool_registry
+from .builtin import citation_lookup, citation_search, text_statistics
+
+__all__ = [
+    "Tool", "ToolError", "ToolRegistry", "get_tool_registry",
+    "citation_lookup", "citation_search", "text_statistics"
+]
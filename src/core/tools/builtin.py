@@ -0,0 +1,105 @@
+"""
+内置工具
+可读性统计、法规条文查询等确定性计算，由本地完成，不消耗模型token
+"""
+
+import re
+from typing import Any, Dict, List
+
+try:
+    from src.core.citations import get_citation_index
+except ImportError:
+    from ..citations import get_citation_index
+from .registry import Tool, ToolRegistry
+
+# 可读性检测维度1-4对应的模糊用词
+VAGUE_TERMS = {
+    "可能性模糊用词": ("可能", "或许", "也许", "有时", "必要时"),
+    "条件约束性表述": ("如果", "除非", "在特定情况下", "在某些情况下"),
+    "泛化性表述": ("通常", "一般而言", "一般情况下", "大致", "大部分"),
+    "模糊量词": ("等", "一些", "相关", "部分", "类似", "包括但不限于")
+}
+
+_SENTENCE_END = re.compile(r"[。！？；!?;]+")
+_CJK = re.compile(r"[一-鿿]")
+
+
+def text_statistics(text: str, long_sentence_chars: int = 80) -> Dict[str, Any]:
+    """
+    统计文本的可读性指标
+    Args:
+        text: 待统计文本
+        long_sentence_chars: 视为长句的字符数
+    Returns:
+        字数、句数、平均句长、长句示例及各类模糊用词的出现次数
+    """
+    paragraphs = [line.strip() for line in text.splitlines() if line.strip()]
+    sentences = [item.strip() for paragraph in paragraphs for item in _SENTENCE_END.split(paragraph) if item.strip()]
+    long_sentences = [sentence for sentence in sentences if len(sentence) > long_sentence_chars]
+    vague = {
+        category: {term: text.count(term) for term in terms if term in text}
+        for category, terms in VAGUE_TERMS.items()
+    }
+    return {
+        "characters": len(text),
+        "cjk_characters": len(_CJK.findall(text)),
+        "paragraphs": len(paragraphs),
+        "sentences": len(sentences),
+        "avg_sentence_chars": round(sum(len(sentence) for sentence in sentences) / len(sentences), 1) if sentences else 0.0,
+        "long_sentences": len(long_sentences),
+        "long_sentence_examples": [sentence[:120] for sentence in long_sentences[:3]],
+        "vague_terms": {category: counts for category, counts in vague.items() if counts}
+    }
+
+
+def citation_lookup(codes: List[str]) -> List[Dict[str, Any]]:
+    """展开法规编号为条文原文"""
+    return get_citation_index().expand(codes)
+
+
+def citation_search(query: str, limit: int = 5) -> List[Dict[str, Any]]:
+    """按关键词检索法规条文"""
+    results = get_citation_index().search(query, limit)["results"]
+    return [{key: item[key] for key in ("key", "source", "title", "snippet")} for item in results]
+
+
+def register_builtin_tools(registry: ToolRegistry):
+    """注册内置工具"""
+    registry.register(Tool(
+        name="text_statistics",
+        description="统计隐私政策文本的字数、句数、平均句长、长句和模糊用词（可能/通常/等/相关等）出现次数，用于可读性评估",
+        parameters={
+            "type": "object",
+            "properties": {
+                "text": {"type": "string", "description": "待统计的文本"},
+                "long_sentence_chars": {"type": "integer", "description": "视为长句的字符数，默认80"}
+            },
+            "required": ["text"]
+        },
+        func=text_statistics
+    ))
+    registry.register(Tool(
+        name="citation_lookup",
+        description="根据评估框架中的法规编号（如 G17、Z1-5/7、G44-50）查询法规条文原文",
+        parameters={
+            "type": "object",
+            "properties": {
+                "codes": {"type": "array", "items": {"type": "string"}, "description": "法规编号列表"}
+            },
+            "required": ["codes"]
+        },
+        func=citation_lookup
+    ))
+    registry.register(Tool(
+        name="citation_search",
+        description="按关键词检索个人信息保护相关法规条文，返回条文编号、标题和命中片段",
+        parameters={
+            "type": "object",
+            "properties": {
+                "query": {"type": "string", "description": "检索关键词"},
+                "limit": {"type": "integer", "description": "返回数量，默认5"}
+            },
+            "required": ["query"]
+        },
+        func=citation_search
+    ))
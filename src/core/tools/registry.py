@@ -0,0 +1,248 @@
+"""
+工具注册表
+统一管理Agent可调用的本地工具：异步执行、单工具超时、同一轮多个工具调用并行执行、按参数缓存结果及延迟统计
+"""
+
+import asyncio
+import inspect
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from loguru import logger
+
+try:
+    from src.utils.utils import get_config
+except ImportError:
+    from ppgllm.src.utils import get_config
+
+
+class ToolError(Exception):
+    """工具调用失败"""
+
+
+class Tool:
+    """本地工具"""
+
+    def __init__(self, name: str, description: str, parameters: Dict[str, Any], func: Callable,
+                 timeout: Optional[float] = None, cacheable: bool = True):
+        """
+        Args:
+            name: 工具名称
+            description: 工具说明，提供给模型
+            parameters: 参数的JSON Schema
+            func: 同步或异步实现，同步实现在线程池中执行
+            timeout: 超时时间（秒），默认使用配置值
+            cacheable: 相同参数的结果是否可缓存（结果只取决于参数时为True）
+        """
+        self.name = name
+        self.description = description
+        self.parameters = parameters
+        self.func = func
+        self.timeout = timeout
+        self.cacheable = cacheable
+
+    def schema(self) -> Dict[str, Any]:
+        """OpenAI兼容的工具定义"""
+        return {
+            "type": "function",
+            "function": {"name": self.name, "description": self.description, "parameters": self.parameters}
+        }
+
+    async def invoke(self, arguments: Dict[str, Any]) -> Any:
+        if inspect.iscoroutinefunction(self.func):
+            return await self.func(**arguments)
+        return await asyncio.to_thread(self.func, **arguments)
+
+
+class ToolRegistry:
+    """工具注册表"""
+
+    def __init__(self):
+        config = get_config().get("tools", {})
+        self.default_timeout = config.get("timeout", 5.0)
+        self.cache_size = config.get("cache_size", 512)
+        self.max_rounds = config.get("max_rounds", 3)
+        self.max_result_chars = config.get("max_result_chars", 4000)
+        self.agent_tools: Dict[str, List[str]] = config.get("agent_tools", {})
+        self._tools: Dict[str, Tool] = {}
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def register(self, tool: Tool) -> Tool:
+        """注册工具，同名工具会被覆盖"""
+        self._tools[tool.name] = tool
+        return tool
+
+    def tool(self, name: str, description: str, parameters: Dict[str, Any],
+             timeout: Optional[float] = None, cacheable: bool = True) -> Callable:
+        """以装饰器方式注册工具"""
+        def decorator(func: Callable) -> Callable:
+            self.register(Tool(name, description, parameters, func, timeout, cacheable))
+            return func
+        return decorator
+
+    def get(self, name: str) -> Optional[Tool]:
+        return self._tools.get(name)
+
+    def list_tools(self) -> List[Dict[str, Any]]:
+        """列出已注册的工具定义"""
+        return [tool.schema()["function"] for tool in self._tools.values()]
+
+    def resolve(self, tools: Optional[Iterable[Any]] = None, agent_type: Optional[str] = None) -> List[str]:
+        """
+        解析请求中的工具列表
+        Args:
+            tools: 请求上下文中的工具名称列表（兼容 {"name": ...} 形式），为空时使用该Agent的默认工具
+            agent_type: Agent类型
+        Returns:
+            已注册的工具名称列表，未注册的工具被忽略
+        """
+        if tools is None:
+            tools = self.agent_tools.get(agent_type, []) if agent_type else []
+        names = []
+        for item in tools:
+            name = item.get("name") if isinstance(item, dict) else item
+            if not isinstance(name, str):
+                continue
+            if name not in self._tools:
+                logger.warning(f"忽略未注册的工具: {name}")
+            elif name not in names:
+                names.append(name)
+        return names
+
+    def schemas(self, names: Iterable[str]) -> List[Dict[str, Any]]:
+        """获取指定工具的定义"""
+        return [self._tools[name].schema() for name in names if name in self._tools]
+
+    @staticmethod
+    def _cache_key(name: str, arguments: Dict[str, Any]) -> str:
+        return f"{name}:{json.dumps(arguments, ensure_ascii=False, sort_keys=True)}"
+
+    def _truncate(self, result: Any, content: str) -> str:
+        """
+        超长结果按结构截断，保证回传给模型（及写入缓存）的仍是合法JSON
+        列表结果保留能放下的前若干项；其余结果将文本前缀放入带 truncated 标记的信封
+        """
+        if len(content) <= self.max_result_chars:
+            return content
+        if isinstance(result, list):
+            items = list(result)
+            while items:
+                items.pop()
+                envelope = json.dumps({"truncated": True, "total_items": len(result), "items": items}, ensure_ascii=False)
+                if len(envelope) <= self.max_result_chars:
+                    return envelope
+        envelope = {"truncated": True, "original_chars": len(content), "content": ""}
+        budget = max(self.max_result_chars - len(json.dumps(envelope, ensure_ascii=False)), 0)
+        prefix = content[:budget]
+        # 转义字符会使序列化后的长度超出预算，逐步缩短直到放得下
+        while prefix and len(json.dumps({**envelope, "content": prefix}, ensure_ascii=False)) > self.max_result_chars:
+            prefix = prefix[:len(prefix) * 9 // 10]
+        return json.dumps({**envelope, "content": prefix}, ensure_ascii=False)
+
+    def _record(self, name: str, elapsed_ms: float, status: str):
+        # 只统计已注册的工具，模型给出的任意工具名不会在统计中累积
+        if name not in self._tools:
+            return
+        stats = self._stats.setdefault(name, {
+            "calls": 0, "cache_hits": 0, "errors": 0, "timeouts": 0, "total_ms": 0.0, "max_ms": 0.0
+        })
+        stats["calls"] += 1
+        if status == "cached":
+            stats["cache_hits"] += 1
+            return
+        if status in ("error", "timeout"):
+            stats["errors" if status == "error" else "timeouts"] += 1
+        stats["total_ms"] += elapsed_ms
+        stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+
+    async def execute(self, name: str, arguments: Any) -> str:
+        """
+        执行一次工具调用
+        Args:
+            name: 工具名称
+            arguments: 参数字典或模型输出的JSON字符串
+        Returns:
+            序列化为文本的结果；调用失败时返回错误说明，由模型决定后续处理
+        """
+        start = time.perf_counter()
+        tool = self._tools.get(name)
+        try:
+            if tool is None:
+                raise ToolError(f"未注册的工具: {name}")
+            if isinstance(arguments, str):
+                try:
+                    arguments = json.loads(arguments) if arguments.strip() else {}
+                except json.JSONDecodeError as e:
+                    raise ToolError(f"工具参数不是合法的JSON: {str(e)}")
+            if not isinstance(arguments, dict):
+                raise ToolError("工具参数必须是JSON对象")
+
+            key = self._cache_key(name, arguments)
+            if tool.cacheable and key in self._cache:
+                self._cache.move_to_end(key)
+                self._record(name, 0.0, "cached")
+                return self._cache[key]
+
+            result = await asyncio.wait_for(tool.invoke(arguments), timeout=tool.timeout or self.default_timeout)
+            content = result if isinstance(result, str) else json.dumps(result, ensure_ascii=False)
+            content = self._truncate(result, content)
+            if tool.cacheable:
+                self._cache[key] = content
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            self._record(name, (time.perf_counter() - start) * 1000, "ok")
+            return content
+        except asyncio.TimeoutError:
+            self._record(name, (time.perf_counter() - start) * 1000, "timeout")
+            logger.warning(f"工具调用超时: {name}")
+            return json.dumps({"error": f"工具 {name} 执行超时"}, ensure_ascii=False)
+        except Exception as e:
+            self._record(name, (time.perf_counter() - start) * 1000, "error")
+            logger.warning(f"工具调用失败 {name}: {str(e)}")
+            return json.dumps({"error": str(e)}, ensure_ascii=False)
+
+    async def execute_calls(self, tool_calls: List[Any]) -> List[Dict[str, str]]:
+        """
+        并行执行模型在同一轮中发起的全部工具调用
+        Args:
+            tool_calls: 模型返回的 tool_calls
+        Returns:
+            按调用顺序排列的 tool 角色消息
+        """
+        results = await asyncio.gather(*[
+            self.execute(call.function.name, call.function.arguments) for call in tool_calls
+        ])
+        return [
+            {"role": "tool", "tool_call_id": call.id, "content": content}
+            for call, content in zip(tool_calls, results)
+        ]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取各工具的调用次数、缓存命中和延迟统计"""
+        tools = {}
+        for name, stats in self._stats.items():
+            executed = stats["calls"] - stats["cache_hits"]
+            tools[name] = {
+                **stats,
+                "total_ms": round(stats["total_ms"], 3),
+                "max_ms": round(stats["max_ms"], 3),
+                "avg_ms": round(stats["total_ms"] / executed, 3) if executed else 0.0
+            }
+        return {"registered": list(self._tools), "cache_entries": len(self._cache), "tools": tools}
+
+
+# 全局工具注册表实例
+_tool_registry: Optional[ToolRegistry] = None
+
+
+def get_tool_registry() -> ToolRegistry:
+    """获取工具注册表实例（首次获取时注册内置工具）"""
+    global _tool_registry
+    if _tool_registry is None:
+        _tool_registry = ToolRegistry()
+        from .builtin import register_builtin_tools
+        register_builtin_tools(_tool_registry)
+    return _tool_registry
@@ -1,8 +1,11 @@
 # 通用工具类
 import os
+import asyncio
 import yaml
 import requests, json
 import logging
+import weakref
+import httpx
 
 logger = logging.getLogger(__name__)
 
@@ -14,6 +17,26 @@ def get_memory_dir():
     return memory_dir
 
 
+def get_resource_dir():
+    """获取随代码发布的数据资源目录"""
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(base_dir, "../", "resources")
+
+
+def get_data_dir():
+    """获取运行时数据目录"""
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(base_dir, "../", "data")
+
+
+# 可通过环境变量覆盖的模型客户端配置（与.env中的变量名一致）
+ENV_OVERRIDES = {
+    "DASHSCOPE_API_KEY": "api_key",
+    "QWEN_BASE_URL": "base_url",
+    "QWEN_MODEL": "model",
+}
+
+
 def get_config():
     """获取配置"""
     base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -22,6 +45,10 @@ def get_config():
     try:
         with open(config_file, "r", encoding="utf-8") as f:
             config = yaml.safe_load(f)
+        qwen_config = config.setdefault("qwen_client", {})
+        for env_name, key in ENV_OVERRIDES.items():
+            if os.environ.get(env_name):
+                qwen_config[key] = os.environ[env_name]
         return config
     except Exception as e:
         logger.error(f"读取配置文件失败: {str(e)}")
@@ -33,77 +60,241 @@ def get_log_dir():
     return log_dir
 
 
-def request_qwen(model_name, system_instruction, prompt):
-    config = get_config()
-    qwen_config = config.get("qwen_client", {})
-    max_tokens = qwen_config.get("max_tokens", 8000)
+_token_encoding = None
+_token_encoding_failed = False
+
+
+def count_tokens(text):
+    """
+    计算文本的token数
+    优先使用tiktoken；编码文件不可用（如离线环境）时按字符数估算
+    """
+    global _token_encoding, _token_encoding_failed
+    if not text:
+        return 0
+    if _token_encoding is None and not _token_encoding_failed:
+        try:
+            import tiktoken
+            _token_encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            _token_encoding_failed = True
+            logger.warning(f"加载tiktoken编码失败，改用字符数估算: {str(e)}")
+    if _token_encoding is not None:
+        return len(_token_encoding.encode(text, disallowed_special=()))
+    # 中文约1字1token，其他字符约4字符1token
+    cjk = sum(1 for char in text if "\u4e00" <= char <= "\u9fff")
+    return cjk + (len(text) - cjk) // 4 + 1
+
+
+_qwen_settings = None
+_qwen_sync_client = None
+# 按事件循环区分的异步连接池，事件循环结束后自动释放
+_qwen_async_clients = weakref.WeakKeyDictionary()
+
+
+def _get_qwen_settings():
+    """
+    读取 request_qwen 的连接配置（只读取一次）
+    优先使用 friday_client，未配置时使用 qwen_client
+    """
+    global _qwen_settings
+    if _qwen_settings is None:
+        config = get_config()
+        qwen_config = config.get("qwen_client", {})
+        client_config = config.get("friday_client") or qwen_config
+        _qwen_settings = {
+            "url": client_config.get("base_url", "").rstrip("/") + "/chat/completions",
+            "api_key": client_config.get("api_key", ""),
+            "max_tokens": qwen_config.get("max_tokens", 8000),
+            "timeout": httpx.Timeout(qwen_config.get("read_timeout", 300.0),
+                                     connect=qwen_config.get("connect_timeout", 10.0)),
+            "limits": httpx.Limits(max_connections=qwen_config.get("max_connections", 32),
+                                   max_keepalive_connections=qwen_config.get("max_keepalive_connections", 16)),
+            "batch_concurrency": qwen_config.get("batch_concurrency", 8)
+        }
+    return _qwen_settings
+
+
+def _qwen_request(model_name, system_instruction, prompt, stream=False):
+    """组装 request_qwen 的请求体和请求头"""
+    settings = _get_qwen_settings()
     payload = {
         "model": model_name,
         "messages": [
-            {
-                "role": "system",
-                "content": system_instruction
-
-            },
-            {
-                "role": "user",
-                "content": prompt
-            }
+            {"role": "system", "content": system_instruction},
+            {"role": "user", "content": prompt}
         ],
-
-        "stream": "false",
+        "stream": stream,
         "temperature": 0,
-        # "top_p": 1,
-        "max_tokens": max_tokens
+        "max_tokens": settings["max_tokens"]
     }
-
     headers = {
-        'Content-Type': 'application/json',
-        'Authorization': f"Bearer {get_config()['friday_client']['api_key']}"
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {settings['api_key']}"
     }
-    response = requests.post(get_config()['friday_client']['base_url'] + '/chat/completions', json=payload,
-                             headers=headers, timeout=3600)
-    # print(response.text)
-    if response.status_code == 200:
-        result = response.json()
-        if result['choices']:
-            return (result['choices'][0]['message']['content'])
-        else:
-            return response.text
-    else:
-        return (f'Error: {response.text}')
+    return payload, headers
+
+
+def _qwen_result(response):
+    """解析非流式响应，失败时返回以 Error: 开头的说明（与原接口一致）"""
+    if response.status_code != 200:
+        return f"Error: {response.text}"
+    result = response.json()
+    if result.get("choices"):
+        return result["choices"][0]["message"]["content"]
+    return response.text
+
+
+def _get_async_qwen_client():
+    """获取当前事件循环的连接池客户端（连接不能跨事件循环复用）"""
+    loop = asyncio.get_running_loop()
+    client = _qwen_async_clients.get(loop)
+    if client is None or client.is_closed:
+        settings = _get_qwen_settings()
+        client = httpx.AsyncClient(timeout=settings["timeout"], limits=settings["limits"])
+        _qwen_async_clients[loop] = client
+    return client
+
+
+async def request_qwen_async(model_name, system_instruction, prompt):
+    """
+    异步调用模型，复用保持连接的连接池
+    Args:
+        model_name: 模型名称
+        system_instruction: 系统提示词
+        prompt: 用户消息
+    Returns:
+        str: 模型回复；请求失败时返回以 Error: 开头的说明
+    """
+    payload, headers = _qwen_request(model_name, system_instruction, prompt)
+    try:
+        response = await _get_async_qwen_client().post(_get_qwen_settings()["url"], json=payload, headers=headers)
+    except httpx.HTTPError as e:
+        return f"Error: {type(e).__name__}: {str(e)}"
+    return _qwen_result(response)
+
+
+async def stream_qwen(model_name, system_instruction, prompt):
+    """
+    以流式方式调用模型
+    Args:
+        model_name: 模型名称
+        system_instruction: 系统提示词
+        prompt: 用户消息
+    Returns:
+        逐段产出的回复内容
+    Raises:
+        httpx.HTTPStatusError: 上游返回错误状态码
+    """
+    payload, headers = _qwen_request(model_name, system_instruction, prompt, stream=True)
+    async with _get_async_qwen_client().stream("POST", _get_qwen_settings()["url"],
+                                               json=payload, headers=headers) as response:
+        if response.status_code != 200:
+            await response.aread()
+            response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                break
+            choices = json.loads(data).get("choices") or []
+            content = choices[0].get("delta", {}).get("content") if choices else None
+            if content:
+                yield content
+
+
+async def request_qwen_batch(model_name, system_instruction, prompts, concurrency=None):
+    """
+    并发调用模型处理多个提示词
+    Args:
+        model_name: 模型名称
+        system_instruction: 系统提示词
+        prompts (list): 用户消息列表
+        concurrency (int): 最大并发数，默认使用配置值
+    Returns:
+        list: 与 prompts 顺序一致的回复
+    """
+    semaphore = asyncio.Semaphore(concurrency or _get_qwen_settings()["batch_concurrency"])
+
+    async def run(prompt):
+        async with semaphore:
+            return await request_qwen_async(model_name, system_instruction, prompt)
+
+    return await asyncio.gather(*[run(prompt) for prompt in prompts])
+
+
+def request_qwen(model_name, system_instruction, prompt):
+    """
+    同步调用模型（供脚本使用），复用保持连接的连接池；在协程中请使用 request_qwen_async
+    Args:
+        model_name: 模型名称
+        system_instruction: 系统提示词
+        prompt: 用户消息
+    Returns:
+        str: 模型回复；请求失败时返回以 Error: 开头的说明
+    """
+    global _qwen_sync_client
+    settings = _get_qwen_settings()
+    if _qwen_sync_client is None:
+        _qwen_sync_client = httpx.Client(timeout=settings["timeout"], limits=settings["limits"])
+    payload, headers = _qwen_request(model_name, system_instruction, prompt)
+    try:
+        response = _qwen_sync_client.post(settings["url"], json=payload, headers=headers)
+    except httpx.HTTPError as e:
+        return f"Error: {type(e).__name__}: {str(e)}"
+    return _qwen_result(response)
+
+
+async def close_qwen_clients():
+    """关闭 request_qwen 的连接池"""
+    global _qwen_sync_client
+    for client in list(_qwen_async_clients.values()):
+        await client.aclose()
+    _qwen_async_clients.clear()
+    if _qwen_sync_client is not None:
+        _qwen_sync_client.close()
+        _qwen_sync_client = None
+
+
+def parse_vector_store_result(result):
+    """
+    解析向量数据库写入接口的返回
+    Args:
+        result (dict): 接口返回的JSON
+    Returns:
+        tuple: (是否写入成功, 失败原因)
+    """
+    if result.get('code') != 0:
+        return False, f"请求失败: {result.get('message', '未知错误')}"
+    # data 可能是字符串，需要先解析
+    data = result.get('data')
+    if isinstance(data, str):
+        try:
+            data = json.loads(data)
+        except Exception:
+            return False, f"返回的data字段无法解析为JSON: {data}"
+    if isinstance(data, dict) and data.get('success') is True:
+        return True, ""
+    return False, f"写入失败: {data.get('msg', '未知错误') if isinstance(data, dict) else data}"
 
 
 def store_to_vector_db(vector_data):
     """
-    存储数据到向量数据库
+    同步存储单条数据到向量数据库（供脚本使用）
+    服务内请使用 src.core.ingestion 的写入队列，失败的数据会持久化并重试
     Args:
         vector_data (dict): 要存储的向量数据
     Returns:
         bool: 是否存储成功
     """
     try:
-        print(f"向量数据库存储数据: {vector_data}")
-        response = requests.post(get_config()["learning"]["write_vector_store"]["url"], json=vector_data)
+        response = requests.post(get_config()["learning"]["write_vector_store"]["url"], json=vector_data, timeout=30)
         response.raise_for_status()
-        result = response.json()
-        if result.get('code') == 0:
-            # data 可能是字符串，需要先解析
-            data = result.get('data')
-            if isinstance(data, str):
-                try:
-                    data = json.loads(data)
-                except Exception:
-                    print(f"返回的data字段无法解析为JSON: {data}")
-                    return False
-            if data.get('success') is True:
-                return True
-            else:
-                print(f"写入失败: {data.get('msg', '未知错误')}")
-                return False
-        else:
-            print(f"请求失败: {result.get('message', '未知错误')}")
-            return False
+        success, reason = parse_vector_store_result(response.json())
+        if not success:
+            logger.error(f"向量数据库存储失败: {reason}")
+        return success
     except Exception as e:
-        print(f"向量数据库存储失败: {str(e)}")
+        logger.error(f"向量数据库存储失败: {str(e)}")
         return False